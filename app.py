@@ -36,6 +36,13 @@ load_dotenv(dotenv_path=os.path.join(_HERE, ".env"), override=True)
 
 # Now import db after env vars are loaded
 from utils.db import db   # initializes MongoDB connection
+from utils.indexes import ensure_indexes_in_background
+from utils.db_migrate import migrate_in_background
+
+# Create the declared MongoDB indexes and apply pending data migrations
+# (both idempotent; they run in the background so startup never waits on them)
+ensure_indexes_in_background()
+migrate_in_background()
 
 from flask import Flask, redirect, url_for  # Flask framework and redirect utilities
 
@@ -77,6 +84,10 @@ app.register_blueprint(accessories_bp)
 app.register_blueprint(plan_bp)
 app.register_blueprint(profile_bp)
 
+# Keep the weather of upcoming plans fresh in the background (PLAN_WEATHER_REFRESH_INTERVAL)
+from model.plan_weather_model import start_plan_weather_scheduler
+start_plan_weather_scheduler()
+
 # Root route – redirect to intro page
 @app.route("/")
 def index_redirect():
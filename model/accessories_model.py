@@ -13,6 +13,15 @@ from bson.objectid import ObjectId
 accessories = db["accessories"]
 
 
+def _invalidate_outfit_cache(user_email=None):
+    """
+    Drop cached LLM outfit results for this user after their accessories changed.
+    Imported lazily because get_outfit_model imports this module.
+    """
+    from model.get_outfit_model import invalidate_llm_cache
+    invalidate_llm_cache(user_email)
+
+
 def get_all_accessories(user_email=None):
     """
     Retrieve all accessories from the database for a specific user.
@@ -51,6 +60,7 @@ def add_accessory(name, type_, user_email=None):
     }
 
     result = accessories.insert_one(item)
+    _invalidate_outfit_cache(user_email)
 
     # Convert generated ObjectId to string for consistency
     item["_id"] = str(result.inserted_id)
@@ -67,7 +77,9 @@ def remove_accessory(accessory_id, user_email=None):
     if user_email:
         query["user_email"] = user_email
     
-    return accessories.delete_one(query)
+    result = accessories.delete_one(query)
+    _invalidate_outfit_cache(user_email)
+    return result
 
 
 def update_accessory(accessory_id, name=None, type_=None, user_email=None):
@@ -87,6 +99,7 @@ def update_accessory(accessory_id, name=None, type_=None, user_email=None):
         query['user_email'] = user_email
     
     accessories.update_one(query, {'$set': update})
+    _invalidate_outfit_cache(user_email)
     doc = accessories.find_one(query)
     if not doc:
         return None
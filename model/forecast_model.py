@@ -0,0 +1,266 @@
+"""
+forecast_model.py
+
+OpenWeather 5-day/3-hour forecast, fetched once per location and reused.
+
+The forecast is downloaded for a grid-snapped location (see utils.geo.snap_coords),
+turned into per-field columns and aggregated per local day in one pass (min/max/mean
+and daytime-weighted temperature, dominant condition, precipitation probability),
+and cached by (location, issue window):
+OpenWeather publishes a new forecast run every 3 hours, so an entry is only reused
+within the run it came from (and at most FORECAST_CACHE_TTL seconds).
+Every date of a trip is then a dict lookup into that single parsed forecast.
+
+Dates the forecast can't cover (more than FORECAST_HORIZON_DAYS ahead, or any date
+while OpenWeather is unreachable) are answered from the bundled climate normals
+(utils.climate_normals) and marked `source: "climatology"`.
+"""
+
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from utils.cache import TTLCache, MISS
+from utils.climate_normals import get_climate_normals
+from utils.geo import snap_coords
+from utils.weather_provider import get_weather_provider
+from utils.singleflight import SingleFlight
+
+# How long (seconds) a parsed forecast is reused within one issue window
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", "1800"))
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "256"))
+
+# OpenWeather issues a new 5-day/3-hour forecast every 3 hours
+_ISSUE_WINDOW_SECONDS = 3 * 3600
+# Last day (from today, UTC) the 5-day forecast can reach; later dates skip the download
+FORECAST_HORIZON_DAYS = 5
+
+_forecast_cache = TTLCache(maxsize=FORECAST_CACHE_SIZE, ttl=FORECAST_CACHE_TTL)
+_forecast_flight = SingleFlight("get_forecast")
+
+
+def _fetch_forecast(lat, lon):
+    """Download the raw forecast response (list + city) for a location, or return {'error': ...}."""
+    try:
+        data = get_weather_provider().forecast(lat, lon)
+        if "list" not in data:
+            return {"error": "Weather unavailable"}
+        return data
+    except Exception:
+        return {"error": "Weather unavailable"}
+
+
+# Weight of a 3-hour slot by local hour: people dress for the day, not for 3 a.m.
+def _daytime_weight(hour: int) -> float:
+    if 9 <= hour <= 18:
+        return 1.0
+    if 6 <= hour <= 21:
+        return 0.5
+    return 0.15
+
+
+# Tie-breaker for the dominant condition: the more disruptive weather wins
+_CONDITION_SEVERITY = {
+    "Thunderstorm": 6, "Snow": 5, "Rain": 4, "Drizzle": 3,
+    "Mist": 2, "Fog": 2, "Haze": 2, "Clouds": 1, "Clear": 0,
+}
+
+
+def _forecast_columns(raw_list, tz_offset: int):
+    """Convert OpenWeather's list of slot dicts into parallel per-field columns (one pass)."""
+    cols = {"dt": [], "date": [], "hour": [], "temp": [], "condition": [],
+            "description": [], "pop": [], "precip": [], "weight": []}
+    for e in raw_list or []:
+        try:
+            dt = int(e["dt"])
+            local = datetime.fromtimestamp(dt + tz_offset, timezone.utc)
+            temp = float(e["main"]["temp"])
+            condition = e["weather"][0]["main"]
+            description = e["weather"][0]["description"]
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        precip = 0.0
+        for kind in ("rain", "snow"):
+            amount = e.get(kind)
+            if isinstance(amount, dict):
+                precip += float(amount.get("3h") or 0.0)
+
+        cols["dt"].append(dt)
+        cols["date"].append(local.strftime("%Y-%m-%d"))
+        cols["hour"].append(local.hour)
+        cols["temp"].append(temp)
+        cols["condition"].append(condition)
+        cols["description"].append(description)
+        cols["pop"].append(float(e.get("pop") or 0.0))
+        cols["precip"].append(precip)
+        cols["weight"].append(_daytime_weight(local.hour))
+    return cols
+
+
+def _aggregate_days(cols):
+    """
+    Per-day aggregates computed in a single pass over the columns.
+
+    For each local date: min/max/mean temperature, daytime-weighted temperature (`temp`),
+    the dominant condition by daytime-weighted slot count (`weather`, with the description
+    of its most daytime slot), max precipitation probability (`pop`) and total precipitation.
+    """
+    acc = {}
+    for i, date in enumerate(cols["date"]):
+        temp = cols["temp"][i]
+        w = cols["weight"][i]
+        a = acc.get(date)
+        if a is None:
+            a = acc[date] = {"min": temp, "max": temp, "sum": 0.0, "n": 0, "wsum": 0.0,
+                             "wtemp": 0.0, "pop": 0.0, "precip": 0.0, "cond_w": {}, "desc": {}}
+        a["min"] = min(a["min"], temp)
+        a["max"] = max(a["max"], temp)
+        a["sum"] += temp
+        a["n"] += 1
+        a["wsum"] += w
+        a["wtemp"] += w * temp
+        a["pop"] = max(a["pop"], cols["pop"][i])
+        a["precip"] += cols["precip"][i]
+
+        cond = cols["condition"][i]
+        a["cond_w"][cond] = a["cond_w"].get(cond, 0.0) + w
+        # Keep the description from the most daytime slot of each condition
+        best = a["desc"].get(cond)
+        if best is None or w > best[0]:
+            a["desc"][cond] = (w, cols["description"][i])
+
+    days = {}
+    for date, a in acc.items():
+        dominant = max(a["cond_w"], key=lambda c: (a["cond_w"][c], _CONDITION_SEVERITY.get(c, 0)))
+        days[date] = {
+            "weather": dominant,
+            "description": a["desc"][dominant][1],
+            "temp": round(a["wtemp"] / a["wsum"], 1),
+            "temp_min": round(a["min"], 1),
+            "temp_max": round(a["max"], 1),
+            "temp_mean": round(a["sum"] / a["n"], 1),
+            "pop": round(a["pop"], 2),
+            "precip_mm": round(a["precip"], 1),
+            "slots": a["n"],
+        }
+    return days
+
+
+def parse_forecast(data):
+    """
+    Turn an OpenWeather forecast response into { issued_at, tz_offset, days }.
+
+    Slots are bucketed by *local* date (using the city's UTC offset) and aggregated per
+    day once, so every later lookup is a dict access. `issued_at` is the first slot's
+    timestamp; `next_slot` is that first slot on its own (in the same shape as a day),
+    used for the rest of today once the forecast has no slots left for it.
+    """
+    tz_offset = int(((data or {}).get("city") or {}).get("timezone") or 0)
+    cols = _forecast_columns((data or {}).get("list"), tz_offset)
+    first = _aggregate_days({k: v[:1] for k, v in cols.items()})
+    return {
+        "issued_at": cols["dt"][0] if cols["dt"] else None,
+        "tz_offset": tz_offset,
+        "days": _aggregate_days(cols),
+        "next_slot": next(iter(first.values()), None),
+    }
+
+
+def _load_forecast(cell):
+    data = _fetch_forecast(*cell)
+    if "error" in data:
+        return data
+    return parse_forecast(data)
+
+
+def get_forecast(lat, lon):
+    """
+    Return the parsed forecast ({ issued_at, tz_offset, days, next_slot }, see
+    parse_forecast) for a location, or {'error': ...}.
+
+    Nearby coordinates share one cached forecast; concurrent misses share one download.
+    """
+    cell = snap_coords(lat, lon)
+    if cell[0] is None:
+        return {"error": "Invalid location"}
+
+    key = (cell, int(time.time() // _ISSUE_WINDOW_SECONDS))
+    cached = _forecast_cache.get(key)
+    if cached is not MISS:
+        return cached
+
+    forecast = _forecast_flight.do(key, _load_forecast, cell)
+    if "error" not in forecast:
+        _forecast_cache.set(key, forecast)
+    return forecast
+
+
+def forecast_for_date(forecast, date_str):
+    """
+    Return the aggregated weather for `date_str` (YYYY-MM-DD, local date) from a parsed
+    forecast, or None if the forecast does not cover that date.
+
+    `weather`, `description` and `temp` describe the daytime (what to dress for);
+    temp_min/temp_max/temp_mean, pop and precip_mm cover the whole day.
+
+    Late in the location's day the forecast may have no slots left for today; today is
+    then answered from the next slot instead of falling back to climatology.
+    """
+    day = ((forecast or {}).get("days") or {}).get(date_str)
+    if day is None and forecast and forecast.get("next_slot") and date_str == _local_today(forecast):
+        day = forecast["next_slot"]
+    return dict(day, source="forecast") if day else None
+
+
+def _local_today(forecast) -> str:
+    """Today's date (YYYY-MM-DD) at the forecast's location."""
+    now = datetime.utcnow() + timedelta(seconds=int(forecast.get("tz_offset") or 0))
+    return now.strftime("%Y-%m-%d")
+
+
+def climatology_for_date(lat, lon, date_str):
+    """
+    Typical weather for the location and month (no network call), or None if the
+    climate normals are disabled. Same keys as a forecast day plus
+    `source: "climatology"`; a real forecast should replace it once one exists.
+    """
+    normals = get_climate_normals()
+    if normals is None:
+        return None
+    try:
+        return normals.for_date(lat, lon, date_str)
+    except (TypeError, ValueError):
+        return None
+
+
+def weather_for_date(forecast, lat, lon, date_str):
+    """Forecast day if the forecast covers `date_str`, otherwise the climatology estimate."""
+    return forecast_for_date(forecast, date_str) or climatology_for_date(lat, lon, date_str)
+
+
+def forecast_for_dates(lat, lon, dates):
+    """
+    Weather for several dates from a single (cached) forecast.
+
+    Returns { issued_at, days: { date: {weather, description, temp, ..., source} | None } },
+    or {'error': ...} if the forecast couldn't be fetched and there is no climatology
+    fallback. Dates beyond the forecast horizon never trigger a download.
+    """
+    # Raises ValueError for malformed dates so the route can answer 400
+    parsed = [datetime.strptime(date_str, "%Y-%m-%d").date() for date_str in dates]
+
+    horizon = datetime.utcnow().date() + timedelta(days=FORECAST_HORIZON_DAYS)
+    forecast = None
+    if any(d <= horizon for d in parsed):
+        forecast = get_forecast(lat, lon)
+        if "error" in forecast:
+            if get_climate_normals() is None:
+                return forecast
+            forecast = None
+
+    days = {date_str: weather_for_date(forecast, lat, lon, date_str) for date_str in dates}
+    return {"issued_at": forecast.get("issued_at") if forecast else None, "days": days}
+
+
+def get_forecast_cache_stats() -> dict:
+    return _forecast_cache.stats()
@@ -0,0 +1,218 @@
+"""
+geocoding_model.py
+
+Location search (autocomplete) and reverse geocoding on top of OpenWeather's
+geocoding API, with caching so typing a place name doesn't cost one upstream
+call per keystroke.
+
+Autocomplete lookup order:
+1. the bundled offline place index (utils.geo_index), a real prefix search
+2. a cached result for the exact (normalized) query
+3. OpenWeather /geo/1.0/direct (identical concurrent lookups share one call)
+
+OpenWeather matches whole place names, not prefixes, so its answer for "vie" says
+nothing about "vienna": upstream results are only ever reused for the same query.
+
+Reverse geocoding is keyed by the geohash of the coordinates (REVERSE_GEOHASH_PRECISION),
+so repeated visits from roughly the same spot reuse one label. Results live in memory and
+in the `geocode_cache` collection (TTL index declared in utils.indexes), so restarted or freshly spawned
+workers don't all hit OpenWeather at once.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+from utils.cache import TTLCache, MISS
+from utils.db import db
+from utils.geo import geohash
+from utils.geo_index import get_place_index, normalize
+from utils.weather_provider import get_weather_provider
+from utils.singleflight import SingleFlight
+
+# Suggestions per query (also what OpenWeather is asked for)
+AUTOCOMPLETE_LIMIT = 5
+AUTOCOMPLETE_CACHE_TTL = float(os.getenv("AUTOCOMPLETE_CACHE_TTL", "86400"))
+AUTOCOMPLETE_CACHE_SIZE = int(os.getenv("AUTOCOMPLETE_CACHE_SIZE", "2048"))
+
+_autocomplete_cache = TTLCache(maxsize=AUTOCOMPLETE_CACHE_SIZE, ttl=AUTOCOMPLETE_CACHE_TTL)
+_autocomplete_flight = SingleFlight("autocomplete")
+_stats_lock = threading.Lock()
+_autocomplete_stats = {"lookups": 0, "offline": 0, "exact_hits": 0, "upstream": 0}
+
+
+def _count(name: str):
+    with _stats_lock:
+        _autocomplete_stats[name] += 1
+
+
+def format_location_label(loc: dict) -> str:
+    """Human-friendly label like 'City, State, Country' from an OpenWeather geocoding result."""
+    label = loc.get("name", "")
+
+    if loc.get("state"):
+        label += f", {loc['state']}"
+
+    label += f", {loc.get('country', '')}"
+    return label
+
+
+def _fetch_suggestions(query: str):
+    """Ask the geocoding provider for places matching `query`; returns a list or None on failure."""
+    try:
+        results = get_weather_provider().geocode(query, limit=AUTOCOMPLETE_LIMIT)
+    except Exception:
+        return None
+    if not isinstance(results, list):
+        return None
+
+    return [
+        {
+            "label": format_location_label(loc),
+            "lat": loc.get("lat"),  # may be None if API doesn't return it
+            "lon": loc.get("lon"),
+        }
+        for loc in results
+    ]
+
+
+def _lookup_upstream(key: str, query: str):
+    suggestions = _fetch_suggestions(query)
+    _count("upstream")
+    if suggestions is None:
+        return None  # not cached; the next keystroke retries
+    _autocomplete_cache.set(key, suggestions)
+    return suggestions
+
+
+def autocomplete_locations(query: str):
+    """Return up to AUTOCOMPLETE_LIMIT suggestions [{label, lat, lon}] for a partial place name."""
+    parts = [normalize(p) for p in str(query or "").split(",")]
+    key = ",".join(parts).strip(",")
+    if not parts or not parts[0]:
+        return []
+    _count("lookups")
+
+    index = get_place_index()
+    if index is not None:
+        local = index.search(query, limit=AUTOCOMPLETE_LIMIT)
+        if local:
+            _count("offline")
+            return local
+
+    cached = _autocomplete_cache.get(key)
+    if cached is not MISS:
+        _count("exact_hits")
+        return [dict(s) for s in cached]
+
+    results = _autocomplete_flight.do(key, _lookup_upstream, key, query)
+    return [dict(s) for s in results or []]
+
+
+def get_autocomplete_stats() -> dict:
+    """Lookup counts by source and the share answered without calling OpenWeather."""
+    with _stats_lock:
+        stats = dict(_autocomplete_stats)
+    served_locally = stats["offline"] + stats["exact_hits"]
+    stats["local_hit_rate"] = round(served_locally / stats["lookups"], 3) if stats["lookups"] else 0.0
+    stats["coalesced"] = _autocomplete_flight.stats()["coalesced"]
+    stats["cache_size"] = _autocomplete_cache.stats()["size"]
+    return stats
+
+
+# ---------------------------------------------------------
+# REVERSE GEOCODING
+# ---------------------------------------------------------
+# Geohash precision for the cache key: 6 chars is a ~1.2 km x 0.6 km cell
+REVERSE_GEOHASH_PRECISION = int(os.getenv("REVERSE_GEOHASH_PRECISION", "6"))
+# Place names rarely change: keep labels for a month, "nothing here" answers for a day
+REVERSE_CACHE_TTL = float(os.getenv("REVERSE_CACHE_TTL", str(30 * 86400)))
+REVERSE_NEGATIVE_TTL = float(os.getenv("REVERSE_NEGATIVE_TTL", "86400"))
+REVERSE_CACHE_SIZE = int(os.getenv("REVERSE_CACHE_SIZE", "4096"))
+
+geocode_cache_col = db["geocode_cache"]
+
+_reverse_cache = TTLCache(maxsize=REVERSE_CACHE_SIZE, ttl=REVERSE_CACHE_TTL)
+_reverse_flight = SingleFlight("reverse_geocode")
+_reverse_stats = {"lookups": 0, "memory_hits": 0, "db_hits": 0, "upstream": 0}
+
+
+def _count_reverse(name: str):
+    with _stats_lock:
+        _reverse_stats[name] += 1
+
+
+def _fetch_reverse(lat, lon):
+    """Ask the geocoding provider for the place at lat/lon; returns a dict, {} if nothing is there, or None on failure."""
+    try:
+        result = get_weather_provider().reverse_geocode(lat, lon, limit=1)
+    except Exception:
+        return None
+    if not isinstance(result, list):
+        return None
+    if not result:
+        return {}
+
+    loc = result[0]
+    return {
+        "label": format_location_label(loc),
+        "lat": loc.get("lat"),
+        "lon": loc.get("lon"),
+    }
+
+
+def _reverse_from_db_or_upstream(cell, lat, lon):
+    doc_id = f"rev:{cell}"
+    doc = geocode_cache_col.find_one({"_id": doc_id, "expires_at": {"$gt": datetime.utcnow()}})
+    if doc is not None:
+        _count_reverse("db_hits")
+        place = doc.get("place") or {}
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        _reverse_cache.set(cell, place, ttl=max(1.0, min(remaining, REVERSE_CACHE_TTL)))
+        return place
+
+    place = _fetch_reverse(lat, lon)
+    _count_reverse("upstream")
+    if place is None:
+        return None  # upstream failure: don't cache, let the next request retry
+
+    ttl = REVERSE_CACHE_TTL if place else REVERSE_NEGATIVE_TTL
+    _reverse_cache.set(cell, place, ttl=ttl)
+    try:
+        geocode_cache_col.update_one(
+            {"_id": doc_id},
+            {"$set": {"place": place, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)}},
+            upsert=True,
+        )
+    except Exception as e:
+        print(f"⚠️ Could not persist reverse geocode for {cell}: {e}")
+    return place
+
+
+def reverse_geocode_location(lat, lon):
+    """
+    Human-readable place for coordinates: {label, lat, lon}, {} if OpenWeather knows
+    no place there, or None if the lookup failed.
+    """
+    cell = geohash(lat, lon, REVERSE_GEOHASH_PRECISION)
+    if not cell:
+        return {}
+    _count_reverse("lookups")
+
+    cached = _reverse_cache.get(cell)
+    if cached is not MISS:
+        _count_reverse("memory_hits")
+        return dict(cached)
+
+    place = _reverse_flight.do(cell, _reverse_from_db_or_upstream, cell, lat, lon)
+    return dict(place) if place is not None else None
+
+
+def get_reverse_geocode_stats() -> dict:
+    """Reverse lookups by source (memory, Mongo, OpenWeather) and the cached share."""
+    with _stats_lock:
+        stats = dict(_reverse_stats)
+    cached = stats["memory_hits"] + stats["db_hits"]
+    stats["hit_rate"] = round(cached / stats["lookups"], 3) if stats["lookups"] else 0.0
+    stats["precision"] = REVERSE_GEOHASH_PRECISION
+    return stats
@@ -12,31 +12,49 @@ NOTE (AI-only):
 - We keep server-side validation minimal, but we enforce that an outfit includes shoes.
 """
 
-import requests
 import os
 import json
 import re
+import copy
+import hashlib
+import threading
 import time
 from typing import Optional
 
-# Fetching OpenWeather API key from environment variables for security
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+from utils.cache import TTLCache, MISS
+from utils.http_client import http_client
+from utils.weather_provider import get_weather_provider
+from utils.json_stream import JsonArrayStream
+from utils.rate_limiter import groq_rate_limiter, RateLimitExceeded, GROQ_RATE_MAX_WAIT
+from utils.singleflight import SingleFlight
+from utils.geo import snap_coords, WEATHER_GRID_DEG
 
+# Current-weather cache: coordinates are snapped to a WEATHER_GRID_DEG grid so users in
+# the same area share entries. Entries are fresh for WEATHER_CACHE_TTL seconds; for another
+# WEATHER_STALE_TTL seconds they are still served while a background refresh runs.
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "300"))
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "900"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "512"))
 
-def get_weather(lat, lon):
-    """
-    Fetch weather data from OpenWeather API using latitude and longitude.
+_weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL + WEATHER_STALE_TTL)
+_weather_flight = SingleFlight("get_weather")
+_weather_refreshing = set()
+_weather_refresh_lock = threading.Lock()
+_weather_stats = {"fresh": 0, "stale": 0, "fetched": 0}
+_weather_stats_lock = threading.Lock()
 
-    Returns basic weather details like condition, temperature,
-    humidity, and wind speed.
-    """
 
-    # OpenWeather API endpoint with required query parameters
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric"
+def _count_weather(name: str):
+    with _weather_stats_lock:
+        _weather_stats[name] += 1
+
+
+def _fetch_weather(lat, lon):
+    """Ask the weather provider (OpenWeather by default) for current weather (no caching)."""
 
     try:
-        # Sending request to OpenWeather API and converting response to JSON
-        data = requests.get(url).json()
+        # OpenWeather-shaped current-weather response (see utils.weather_provider)
+        data = get_weather_provider().current(lat, lon)
 
         # Checking if the API response is successful
         if data.get("cod") != 200:
@@ -55,12 +73,77 @@ def get_weather(lat, lon):
         return {"error": "Unable to fetch weather"}
 
 
+def _fetch_and_cache_weather(key):
+    weather = _fetch_weather(*key)
+    _count_weather("fetched")
+    # Errors aren't cached so the next request tries again
+    if "error" not in weather:
+        _weather_cache.set(key, (time.monotonic(), weather))
+    return weather
+
+
+def _refresh_weather_in_background(key):
+    with _weather_refresh_lock:
+        if key in _weather_refreshing:
+            return
+        _weather_refreshing.add(key)
+
+    def _run():
+        try:
+            _weather_flight.do(key, _fetch_and_cache_weather, key)
+        finally:
+            with _weather_refresh_lock:
+                _weather_refreshing.discard(key)
+
+    threading.Thread(target=_run, name="weather-refresh", daemon=True).start()
+
+
+def get_weather(lat, lon):
+    """
+    Fetch weather data from OpenWeather API using latitude and longitude.
+
+    Returns basic weather details like condition, temperature,
+    humidity, and wind speed.
+
+    Results are cached per grid cell (see WEATHER_GRID_DEG). A stale entry is returned
+    immediately and refreshed in the background; concurrent misses for the same cell
+    share one upstream call.
+    """
+    key = snap_coords(lat, lon)
+    if key[0] is None:
+        return {"error": "Invalid location"}
+
+    cached = _weather_cache.get(key)
+    if cached is not MISS:
+        fetched_at, weather = cached
+        if time.monotonic() - fetched_at < WEATHER_CACHE_TTL:
+            _count_weather("fresh")
+        else:
+            _count_weather("stale")
+            _refresh_weather_in_background(key)
+        return dict(weather)
+
+    return dict(_weather_flight.do(key, _fetch_and_cache_weather, key))
+
+
+def get_weather_cache_stats() -> dict:
+    """Weather cache size/hit rate plus how many hits were fresh vs stale and upstream fetches."""
+    stats = _weather_cache.stats()
+    with _weather_stats_lock:
+        stats.update(_weather_stats)
+    stats["grid_deg"] = WEATHER_GRID_DEG
+    return stats
+
+
 from model.wardrobe_model import get_all_items
 
 # Accessories are managed on a separate page and stored separately from wardrobe items.
 # We pass them to the LLM as optional add-ons and validate them separately.
 from model.accessories_model import get_all_accessories
 
+# Local shortlist of feasible outfits so the LLM ranks candidates instead of assembling them.
+from model.outfit_candidates_model import enumerate_candidate_outfits, candidate_item_ids
+
 
 def _accessory_icon(accessory: dict) -> str:
     text = f"{accessory.get('type', '')} {accessory.get('name', '')}".strip().lower()
@@ -97,6 +180,41 @@ GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com")
 # Defaulting to a commonly-available Groq model.
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 
+# Cache of parsed LLM results keyed by a hash of the exact prompt + model + temperature.
+# Identical prompts (page refresh, Plan Ahead regenerations) skip the Groq round trip.
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "600"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+_llm_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+
+def _llm_cache_key(prompt_json: str, model: str, temperature) -> str:
+    """
+    Content-addressed key for an LLM call.
+
+    The prompt is re-serialized with sorted keys so that logically identical
+    payloads always hash the same way.
+    """
+    canonical = json.dumps(json.loads(prompt_json), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    raw = f"{model}|{float(temperature):.3f}|{canonical}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def invalidate_llm_cache(user_email: str = None):
+    """
+    Drop cached LLM results for a user (or everything when no user is given).
+
+    Called by the wardrobe and accessories models whenever the user's items change.
+    """
+    if user_email is None:
+        _llm_cache.clear()
+        return
+    _llm_cache.invalidate_tag(user_email)
+
+
+def get_llm_cache_stats():
+    """Return hit/miss counters of the LLM result cache."""
+    return _llm_cache.stats()
+
 def _resolve_groq_chat_completions_url(groq_api_url: str) -> str:
     """
     Convert Groq API URL to standard chat-completions endpoint.
@@ -121,9 +239,72 @@ def _resolve_groq_chat_completions_url(groq_api_url: str) -> str:
     return f"{base}/openai/v1/chat/completions"
 
 
-def _build_prompt(items, accessories, weather, occasion, extra_instruction: Optional[str] = None):
+# Per-request prompt budget (estimated tokens). Larger wardrobes are trimmed by relevance.
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "1200"))
+
+# Fewest wardrobe items we keep when trimming (enough for shoes + top + bottom + outer)
+_MIN_PROMPT_ITEMS = 4
+
+# Running totals of estimated prompt tokens (before/after compact encoding + trimming)
+# and of the token counts Groq reports back
+_prompt_usage = {
+    "calls": 0, "tokens_before": 0, "tokens_after": 0, "items_trimmed": 0,
+    "reported_prompt_tokens": 0, "reported_completion_tokens": 0,
+}
+_prompt_usage_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for Llama-style tokenizers (~3.6 characters per token
+    for compact JSON). Good enough for budgeting; Groq reports the real count.
+    """
+    return int(len(text or "") / 3.6) + 1
+
+
+def get_prompt_usage_stats():
+    """Return running totals of estimated prompt tokens before/after compaction and reported usage."""
+    with _prompt_usage_lock:
+        return dict(_prompt_usage)
+
+
+def _table(cols, rows):
+    # Columnar encoding: keys are sent once in `cols`, each row is a plain list.
+    return {"cols": cols, "rows": rows}
+
+
+def _item_relevance_order(items, candidates):
+    """
+    Order wardrobe items from most to least relevant for trimming.
+
+    With candidates: items of higher-scored candidates first.
+    Without: round-robin over item types (so every role survives), least-worn first.
+    """
+    if candidates:
+        rank = {}
+        for cand in candidates:
+            for role, value in cand.items():
+                if role != "score" and value is not None and value not in rank:
+                    rank[value] = len(rank)
+        return sorted(items, key=lambda i: rank.get(i.get("id"), len(rank)))
+
+    by_type = {}
+    for i in items:
+        by_type.setdefault(str(i.get("type") or "").lower(), []).append(i)
+    for group in by_type.values():
+        group.sort(key=lambda i: int(i.get("wear_count") or 0))
+    ordered = []
+    groups = list(by_type.values())
+    while any(groups):
+        for group in groups:
+            if group:
+                ordered.append(group.pop(0))
+    return ordered
+
+
+def _build_prompt(items, accessories, weather, occasion, extra_instruction: Optional[str] = None, candidates=None, token_budget: Optional[int] = None, usage: Optional[dict] = None):
     """
-    Build JSON-only prompt for LLM outfit generation.
+    Build compact JSON-only prompt for LLM outfit generation.
 
     Parameters:
     - items: List of wardrobe items with id, name, type, color, category
@@ -131,79 +312,241 @@ def _build_prompt(items, accessories, weather, occasion, extra_instruction: Opti
     - weather: String like "Clear, 12°C"
     - occasion: String like "Casual", "Formal", "Gym"
     - extra_instruction: Optional constraint (e.g., "exclude shoes with id 5")
+    - candidates: Optional shortlist of locally pre-scored outfits (role -> item id).
+      When given, only items used by a candidate are sent and the LLM picks one.
+    - token_budget: Max estimated prompt tokens (defaults to LLM_PROMPT_TOKEN_BUDGET);
+      the least relevant items/accessories/candidates are dropped to fit.
+    - usage: Optional dict that is filled with {tokens_before, tokens_after,
+      items_sent, items_trimmed} for reporting.
+
+    Returns: JSON string with instruction, weather, occasion and the
+    items/accessories/candidates tables ({cols, rows}, legend sent once).
 
-    Returns: Dict with instruction, items, accessories, weather, occasion
-    
     The LLM is instructed to:
     1. Always include exactly one shoes item if shoes exist
     2. Optionally include 1-2 accessories
     3. Avoid inappropriate combinations (e.g., belt for gym)
     4. Return JSON with outfit array and explanation
     """
-    items_short = [
-        {
-            "id": i.get("id"),
-            "name": i.get("name"),
-            "type": i.get("type"),
-            "category": i.get("category"),
-            "color": i.get("color"),
-        }
-        for i in items
-    ]
+    budget = LLM_PROMPT_TOKEN_BUDGET if token_budget is None else int(token_budget)
 
-    accessories_short = []
-    for a in (accessories or []):
-        if not isinstance(a, dict):
-            continue
-        acc_id = a.get("_id")
-        if acc_id is None:
-            continue
-        accessories_short.append({
-            "id": str(acc_id),
-            "name": a.get("name"),
-            "type": a.get("type"),
-        })
+    if candidates:
+        shortlisted = candidate_item_ids(candidates)
+        items = [i for i in items if i.get("id") in shortlisted]
+    candidates = list(candidates or [])
+
+    acc_list = [
+        a for a in (accessories or [])
+        if isinstance(a, dict) and a.get("_id") is not None
+    ]
 
-    # Comprehensive LLM instructions for consistent outfit generation
+    # Verbose size (one dict per item with repeated keys) for before/after reporting
+    verbose = json.dumps({
+        "items": [
+            {"id": i.get("id"), "name": i.get("name"), "type": i.get("type"),
+             "category": i.get("category"), "color": i.get("color")}
+            for i in items
+        ],
+        "accessories": [{"id": str(a.get("_id")), "name": a.get("name"), "type": a.get("type")} for a in acc_list],
+        "candidates": candidates,
+    })
+    tokens_before = estimate_tokens(verbose) + 330  # + the long-form instruction block
+
+    # All items usually share the occasion's category: send it once instead of per row.
+    categories = {i.get("category") for i in items}
+    shared_category = categories.pop() if len(categories) == 1 else None
+    item_cols = ["id", "name", "type", "color"] + ([] if shared_category is not None else ["category"])
+
+    # Comprehensive LLM instructions for consistent outfit generation (kept short: sent on every call)
     instruction = (
-        "You are a helpful wardrobe assistant. Return ONLY valid JSON (no extra text).\n"
-        "Use ONLY the provided wardrobe items (by id).\n"
-        "If the accessories list is non-empty, INCLUDE 1 accessory in most outfits (by id).\n"
-        "You may omit accessories only when clearly inappropriate (e.g., Gym) or if none are provided.\n"
-        "Never include more than 2 accessories.\n"
-        "IMPORTANT: Always include exactly one shoes item (type='shoes') if any shoes exist.\n"
-        "If no shoes exist in the wardrobe, return JSON with an 'error' telling the user to add shoes.\n"
-        "Input fields: 'items' (list of available wardrobe items with id,name,type,category,color),\n"
-        "'accessories' (list of optional accessories with id,name,type),\n"
-        "'weather' (string, e.g., 'Clear, 12°C'), and 'occasion' (string).\n"
-        "Output schema:\n"
-        "{\n"
-        "  \"outfit\": [ { role, id, reason } ],\n"
-        "  \"explanation\": string (optional),\n"
-        "  \"score\": float between 0 and 1 (optional)\n"
-        "}\n"
-        "Roles should be one of: top,bottom,onepiece,outer,shoes,accessory.\n"
-        "Wardrobe item ids are numbers. Accessory ids are strings (ObjectId).\n"
-        "Make it weather/occasion appropriate.\n"
-        "If you cannot assemble an outfit from the provided items, return JSON with an 'error' key describing why."
+        "Wardrobe assistant. Return ONLY valid JSON (no extra text).\n"
+        "'items', 'accessories' and 'candidates' are tables {cols, rows}: each row lists values in cols order.\n"
+        "Use ONLY listed wardrobe items (numeric ids) and accessories (string ids).\n"
+        "Always include exactly one shoes item (type 'shoes'); if there are no shoes, return an 'error' telling the user to add shoes.\n"
+        "Include 1 accessory when any are listed unless clearly inappropriate (e.g. Gym); never more than 2.\n"
+        "Output: {\"outfit\":[{\"role\",\"id\",\"reason\"}],\"explanation\":string,\"score\":0..1}. "
+        "Roles: top,bottom,onepiece,outer,shoes,accessory.\n"
+        "Make it weather/occasion appropriate. If no outfit is possible, return {\"error\": reason}."
     )
 
+    if candidates:
+        instruction += (
+            "\n'candidates' are pre-checked combinations (item id per role, local score as a hint). "
+            "Pick the ONE that best fits and return exactly its wardrobe items, plus optional accessories."
+        )
+
     if extra_instruction:
         instruction = instruction + "\n\n" + str(extra_instruction).strip()
 
-    payload = {
-        "instruction": instruction,
-        "items": items_short,
-        "accessories": accessories_short,
-        "weather": weather,
-        "occasion": occasion
-    }
+    ordered_items = _item_relevance_order(items, candidates)
+    trimmed = 0
+
+    def _encode():
+        payload = {
+            "instruction": instruction,
+            "weather": weather,
+            "occasion": occasion,
+        }
+        if shared_category is not None:
+            payload["category"] = shared_category
+        payload["items"] = _table(item_cols, [
+            [i.get(c) for c in item_cols] for i in ordered_items
+        ])
+        payload["accessories"] = _table(["id", "name", "type"], [
+            [str(a.get("_id")), a.get("name"), a.get("type")] for a in acc_list
+        ])
+        if candidates:
+            roles = ["shoes", "top", "bottom", "onepiece", "outer", "score"]
+            payload["candidates"] = _table(roles, [[c.get(r) for r in roles] for c in candidates])
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+    prompt = _encode()
+
+    # Enforce the token budget: trim accessories first (optional add-ons), then the
+    # lowest-ranked candidates, then the least relevant wardrobe items.
+    while budget > 0 and estimate_tokens(prompt) > budget:
+        if len(acc_list) > 3:
+            acc_list = acc_list[:-1]
+        elif len(candidates) > 1:
+            candidates = candidates[:-1]
+            keep = candidate_item_ids(candidates)
+            before = len(ordered_items)
+            ordered_items = [i for i in ordered_items if i.get("id") in keep]
+            trimmed += before - len(ordered_items)
+        elif not candidates and len(ordered_items) > _MIN_PROMPT_ITEMS:
+            ordered_items = ordered_items[:-1]
+            trimmed += 1
+        else:
+            break
+        prompt = _encode()
+
+    if usage is not None:
+        usage.update({
+            "tokens_before": tokens_before,
+            "tokens_after": estimate_tokens(prompt),
+            "items_sent": len(ordered_items),
+            "items_trimmed": trimmed,
+        })
+
+    return prompt
+
+
+def _enrich_llm_entry(entry, by_id, acc_by_id, exclude_set):
+    """Check one LLM outfit entry against the user's items and add display fields.
+
+    `by_id` maps wardrobe item ids to items, `acc_by_id` maps accessory id strings to accessories.
+    Returns (enriched_entry, None) or (None, (code, message)) when the entry is invalid.
+    """
+    if not isinstance(entry, dict):
+        return None, ("invalid_entry", 'LLM outfit entry is not an object')
+
+    item_id = entry.get('id')
+    role = (entry.get('role') or entry.get('type') or '').lower().strip()
+
+    # Accessories: optional add-ons, validated against accessories list.
+    if role == 'accessory':
+        acc_id = None if item_id is None else str(item_id)
+        if not acc_id or acc_id not in acc_by_id:
+            return None, ("unknown_accessory", f"LLM suggested accessory id {item_id} not found")
+        acc = acc_by_id[acc_id]
+        return {
+            'role': 'accessory',
+            'id': acc_id,
+            'name': acc.get('name') or 'Accessory',
+            'category': 'Accessory',
+            'color': '',
+            'icon': _accessory_icon(acc),
+            'reason': entry.get('reason')
+        }, None
+
+    # Wardrobe items: must exist, be clean, and respect exclusions.
+    try:
+        item_id_int = int(item_id)
+    except Exception:
+        return None, ("unknown_item", f"LLM suggested item id {item_id} not found in wardrobe")
+
+    if item_id_int not in by_id:
+        return None, ("unknown_item", f"LLM suggested item id {item_id} not found in wardrobe")
+
+    if exclude_set and item_id_int in exclude_set:
+        return None, ("used_excluded", f"LLM reused an excluded item id {item_id}")
+
+    item = by_id[item_id_int]
+
+    # item must be clean
+    if str(item.get('status', '')).lower() != 'clean':
+        return None, ("dirty_item", f"Item id {item_id} is not clean")
+
+    item_type = (item.get('type') or '').lower()
+    return {
+        'role': role or item_type or 'item',
+        'id': item_id_int,
+        'name': item.get('name'),
+        'category': item.get('category'),
+        'color': item.get('color'),
+        'icon': item.get('icon'),
+        'reason': entry.get('reason')
+    }, None
+
+
+def _read_streamed_completion(res, on_entry):
+    """Consume a streamed (SSE) chat completion, calling `on_entry` for each finished outfit entry.
+
+    Returns the same shape as a non-streamed response ({choices: [{message: {content}}], usage})
+    so the caller's parsing code doesn't care which mode was used.
+    """
+    parser = JsonArrayStream("outfit")
+    usage = None
+    # text/event-stream has no charset, so requests would decode it as ISO-8859-1;
+    # the stream is UTF-8 ("°C", accented item names)
+    res.encoding = "utf-8"
+    try:
+        for line in res.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            try:
+                chunk = json.loads(payload)
+            except ValueError:
+                continue
+
+            # Groq sends token usage on the last chunk under x_groq
+            if isinstance(chunk.get("x_groq"), dict) and chunk["x_groq"].get("usage"):
+                usage = chunk["x_groq"]["usage"]
+            elif chunk.get("usage"):
+                usage = chunk["usage"]
+
+            for choice in chunk.get("choices") or []:
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                for entry in parser.feed(delta):
+                    if isinstance(entry, dict):
+                        on_entry(entry)
+    finally:
+        res.close()
+
+    return {"choices": [{"message": {"content": parser.text}}], "usage": usage}
+
+
+def generate_with_llm(items, accessories, weather, occasion, temperature=0.2, timeout=30, extra_instruction: Optional[str] = None, cache_tag: Optional[str] = None, max_rate_wait: float = GROQ_RATE_MAX_WAIT, candidates=None, json_mode: bool = False, on_entry=None):
+    """Call the Groq API and return parsed JSON or an error dict.
 
-    return json.dumps(payload)
+    With `json_mode`, the provider's structured-output mode
+    (response_format=json_object) is requested so the reply is always parseable JSON.
 
+    With `on_entry` (a callback), the completion is streamed (stream=true) and each
+    raw `outfit` entry is passed to `on_entry` as soon as its JSON object is complete;
+    the full parsed result is still returned at the end. Groq's JSON mode can't be
+    combined with streaming, so `json_mode` is ignored in that case.
 
-def generate_with_llm(items, accessories, weather, occasion, temperature=0.2, timeout=30, extra_instruction: Optional[str] = None):
-    """Call the Groq API and return parsed JSON or an error dict."""
+    Successful results are cached by prompt hash; `cache_tag` (the user's email)
+    lets the cache be invalidated when that user's wardrobe or accessories change.
+    Calls queue for the shared Groq rate budget for up to `max_rate_wait` seconds,
+    then fail fast with code 'rate_limit_exceeded' and an accurate `retry_after`.
+    """
     api_key = os.getenv("GROQ_API_KEY") or GROQ_API_KEY
     if not api_key:
         return {"error": "GROQ_API_KEY not set"}
@@ -214,7 +557,30 @@ def generate_with_llm(items, accessories, weather, occasion, temperature=0.2, ti
         "Content-Type": "application/json"
     }
 
-    prompt_json = _build_prompt(items, accessories, weather, occasion, extra_instruction=extra_instruction)
+    prompt_usage = {}
+    prompt_json = _build_prompt(
+        items, accessories, weather, occasion,
+        extra_instruction=extra_instruction, candidates=candidates, usage=prompt_usage,
+    )
+
+    cache_key = _llm_cache_key(prompt_json, GROQ_MODEL, temperature)
+    cached = _llm_cache.get(cache_key)
+    if cached is not MISS:
+        if on_entry is not None:
+            for entry in cached.get("outfit") or []:
+                on_entry(copy.deepcopy(entry))
+        return copy.deepcopy(cached)
+
+    # Track prompt size (estimated tokens with the verbose vs compact encoding); see /api/stats
+    with _prompt_usage_lock:
+        _prompt_usage["calls"] += 1
+        _prompt_usage["tokens_before"] += prompt_usage["tokens_before"]
+        _prompt_usage["tokens_after"] += prompt_usage["tokens_after"]
+        _prompt_usage["items_trimmed"] += prompt_usage["items_trimmed"]
+
+    # Reserve the estimated prompt + completion size in the shared rate budget.
+    max_tokens = 350
+    estimated_tokens = prompt_usage["tokens_after"] + 20 + max_tokens
 
     # If the configured model is decommissioned, retry with a small set of fallback models.
     # This keeps the app working without requiring code edits.
@@ -265,27 +631,43 @@ def generate_with_llm(items, accessories, weather, occasion, temperature=0.2, ti
                     {"role": "user", "content": prompt_json}
                 ],
                 "temperature": temperature,
-                "max_tokens": 350
+                "max_tokens": max_tokens
             }
-
-            # Rate limits are common; retry once after the suggested wait (if it's short).
+            if on_entry is not None:
+                body["stream"] = True
+            elif json_mode:
+                body["response_format"] = {"type": "json_object"}
+
+            # Rate limits are shared by all workers: reserve a slot in the shared budget
+            # first (queueing briefly if needed) and feed every response's rate-limit
+            # headers back into it. A 429 re-enters the queue once instead of sleeping blindly.
             for attempt in range(2):
-                res = requests.post(url, headers=headers, json=body, timeout=timeout)
+                try:
+                    groq_rate_limiter.acquire(estimated_tokens, max_wait=max_rate_wait)
+                except RateLimitExceeded as e:
+                    return {
+                        "error": f"Groq is rate limiting requests right now (token limit). Please wait ~{e.retry_after:.0f}s and try again.",
+                        "code": "rate_limit_exceeded",
+                        "retry_after": round(e.retry_after, 1),
+                    }
+
+                res = http_client.post(url, headers=headers, json=body, timeout=timeout, stream=on_entry is not None)
+                groq_rate_limiter.observe(res.headers, res.status_code)
 
                 if res.status_code != 429:
                     break
 
-                try:
-                    err_json = res.json()
-                except Exception:
-                    err_json = {"message": res.text}
-
-                retry_after = _extract_retry_after_seconds(res, err_json)
-                # Only do a quick retry to keep the UI responsive.
-                if attempt == 0 and retry_after is not None and retry_after <= 6:
-                    time.sleep(max(0.0, retry_after) + 0.3)
-                    continue
-                break
+                # Some 429s only carry the wait in the error message; share it with all workers.
+                if not res.headers.get("Retry-After"):
+                    try:
+                        err_json = res.json()
+                    except Exception:
+                        err_json = {"message": res.text}
+                    retry_after = _extract_retry_after_seconds(res, err_json)
+                    if retry_after is not None:
+                        groq_rate_limiter.block_for(retry_after)
+                if attempt == 0:
+                    res.close()  # hand a streamed connection back to the pool before retrying
 
             if res.status_code >= 400:
                 # Try to parse Groq error payload.
@@ -331,13 +713,22 @@ def generate_with_llm(items, accessories, weather, occasion, temperature=0.2, ti
 
                 return {"error": f"Groq API {res.status_code}: {err_json}"}
 
-            data = res.json()
+            if on_entry is not None:
+                data = _read_streamed_completion(res, on_entry)
+            else:
+                data = res.json()
             last_error = None
             break
 
         if data is None:
             return {"error": last_error or "Groq API request failed"}
 
+        # Groq reports the real token counts; keep them next to our estimate.
+        if isinstance(data, dict) and isinstance(data.get("usage"), dict):
+            with _prompt_usage_lock:
+                _prompt_usage["reported_prompt_tokens"] += int(data["usage"].get("prompt_tokens") or 0)
+                _prompt_usage["reported_completion_tokens"] += int(data["usage"].get("completion_tokens") or 0)
+
         # Try common shapes: choices[0].message.content or choices[0].text
         content = None
         if isinstance(data, dict) and "choices" in data and len(data["choices"]) > 0:
@@ -360,24 +751,290 @@ def generate_with_llm(items, accessories, weather, occasion, temperature=0.2, ti
             text = text.replace('json\n', '', 1).strip()
 
         try:
-            return json.loads(text)
+            parsed = json.loads(text)
         except Exception:
             # fallback: extract first JSON object substring
             start = text.find('{')
             end = text.rfind('}')
             if start != -1 and end != -1 and end > start:
-                return json.loads(text[start:end + 1])
-            raise
+                parsed = json.loads(text[start:end + 1])
+            else:
+                raise
+
+        # Only cache real answers; errors should be retried on the next request.
+        if isinstance(parsed, dict) and 'error' not in parsed:
+            _llm_cache.set(cache_key, copy.deepcopy(parsed), tag=cache_tag)
+        return parsed
 
     except Exception as e:
         return {"error": f"LLM request failed: {str(e)}"}
 
 
-def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool = False, exclude_ids=None, weather_override: Optional[dict] = None):
+# Single-pass mode: one structured-output LLM call, then deterministic local repair
+# instead of follow-up correction/accessory calls.
+LLM_SINGLE_PASS = os.getenv("LLM_SINGLE_PASS", "1").lower() in ("1", "true", "yes")
+
+
+def _pick_accessory(accessories, condition, temp):
+    """Deterministically choose one accessory that suits the weather (or the newest one)."""
+    cond = str(condition or "").lower()
+    preferences = []
+    if cond in ("rain", "drizzle", "thunderstorm"):
+        preferences.append("umbrella")
+    if cond == "clear" and (temp is None or temp >= 15):
+        preferences += ["sunglass", "hat", "cap"]
+    if temp is not None and temp <= 8:
+        preferences += ["scarf", "beanie"]
+    preferences += ["watch", "bag", "belt"]
+
+    for keyword in preferences:
+        for a in accessories:
+            text = f"{a.get('type', '')} {a.get('name', '')}".lower()
+            if keyword in text:
+                return a
+    return accessories[0] if accessories else None
+
+
+def _repair_outfit(llm_res, occasion_items, accessories_items, exclude_set, candidates,
+                   outer_required=False, want_accessory=False, condition=None, temp=None):
+    """
+    Locally repair an LLM outfit so it passes validation without another round trip.
+
+    - unknown, excluded, dirty or duplicate ids are dropped
+    - missing shoes / body pieces / required outerwear are filled from the best
+      matching local candidate (or the validated clean pool)
+    - a missing accessory is filled deterministically when one is wanted
+    Returns (repaired_result, list_of_repairs), or (None, []) if nothing can be repaired.
+    """
+    if isinstance(llm_res, dict) and "error" in llm_res and "outfit" not in llm_res:
+        return None, []
+
+    repairs = []
+    entries = llm_res.get("outfit") if isinstance(llm_res, dict) else None
+    if not isinstance(entries, list):
+        entries = []
+        repairs.append("invalid_schema")
+
+    exclude_set = exclude_set or set()
+    by_id = {
+        i.get("id"): i for i in occasion_items
+        if i.get("id") is not None
+        and i.get("id") not in exclude_set
+        and str(i.get("status", "")).lower() == "clean"
+    }
+    acc_by_id = {
+        str(a.get("_id")): a for a in (accessories_items or [])
+        if isinstance(a, dict) and a.get("_id") is not None
+    }
+
+    kept = []
+    roles_taken = {}
+    acc_count = 0
+    for entry in entries:
+        if not isinstance(entry, dict):
+            repairs.append("dropped_invalid_entry")
+            continue
+        role = (entry.get("role") or entry.get("type") or "").lower().strip()
+        item_id = entry.get("id")
+
+        if role == "accessory":
+            acc_id = None if item_id is None else str(item_id)
+            if acc_id not in acc_by_id or acc_count >= 2:
+                repairs.append(f"dropped_accessory:{item_id}")
+                continue
+            acc_count += 1
+            kept.append({"role": "accessory", "id": acc_id, "reason": entry.get("reason")})
+            continue
+
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            repairs.append(f"dropped_unknown:{entry.get('id')}")
+            continue
+        if item_id not in by_id:
+            repairs.append(f"dropped_unknown:{item_id}")
+            continue
+
+        # Use the item's real type as its role, and keep one item per role
+        item_type = str(by_id[item_id].get("type") or "").lower()
+        if item_type in roles_taken:
+            repairs.append(f"dropped_duplicate_{item_type}:{item_id}")
+            continue
+        roles_taken[item_type] = item_id
+        kept.append({"role": item_type, "id": item_id, "reason": entry.get("reason")})
+
+    # A onepiece and a top/bottom pair are alternatives; keep the onepiece if both appear.
+    if "onepiece" in roles_taken and ("top" in roles_taken or "bottom" in roles_taken):
+        for r in ("top", "bottom"):
+            if r in roles_taken:
+                repairs.append(f"dropped_{r}:{roles_taken.pop(r)}")
+        kept = [e for e in kept if e["role"] not in ("top", "bottom")]
+
+    # Roles still needed for a complete outfit
+    needed = ["shoes"]
+    if "onepiece" not in roles_taken:
+        needed += ["top", "bottom"]
+    if outer_required:
+        needed.append("outer")
+    missing = [r for r in needed if r not in roles_taken]
+
+    if missing:
+        # Best source: the local candidate that agrees most with what the LLM chose
+        best = None
+        best_overlap = -1
+        for cand in candidates or []:
+            if "onepiece" in roles_taken and "onepiece" not in cand:
+                continue
+            if "onepiece" not in roles_taken and "onepiece" in cand and ("top" in roles_taken or "bottom" in roles_taken):
+                continue
+            overlap = sum(1 for r, v in roles_taken.items() if cand.get(r) == v)
+            if overlap > best_overlap:
+                best, best_overlap = cand, overlap
+
+        for role in list(missing):
+            fill = best.get(role) if best else None
+            if fill is None or fill not in by_id:
+                # Fall back to the least-worn clean item of that type
+                pool = [i for i in by_id.values() if str(i.get("type") or "").lower() == role]
+                pool.sort(key=lambda i: int(i.get("wear_count") or 0))
+                fill = pool[0].get("id") if pool else None
+            if fill is None:
+                continue
+            roles_taken[role] = fill
+            kept.append({"role": role, "id": fill, "reason": "Added locally to complete the outfit."})
+            repairs.append(f"filled_{role}:{fill}")
+            missing.remove(role)
+
+    if missing:
+        return None, repairs
+
+    if want_accessory and acc_count == 0 and acc_by_id:
+        acc = _pick_accessory(list(acc_by_id.values()), condition, temp)
+        if acc is not None:
+            kept.append({"role": "accessory", "id": str(acc.get("_id")), "reason": "Added locally as a finishing touch."})
+            repairs.append(f"filled_accessory:{acc.get('_id')}")
+
+    repaired = dict(llm_res) if isinstance(llm_res, dict) else {}
+    repaired["outfit"] = kept
+
+    # The LLM's explanation was written for its own picks; if any of them were dropped or
+    # swapped, say so instead of describing items that are no longer in the outfit.
+    changed = [r for r in repairs if r.startswith("dropped_") or (r.startswith("filled_") and not r.startswith("filled_accessory"))]
+    if changed:
+        added = [
+            str(by_id[e["id"]].get("name") or e["id"])
+            for e in kept
+            if e["reason"] == "Added locally to complete the outfit." and e["id"] in by_id
+        ]
+        note = "Some suggested pieces weren't available, so the outfit was adjusted locally"
+        note += f" (added: {', '.join(added)})." if added else "."
+        explanation = str(repaired.get("explanation") or "").strip()
+        repaired["explanation"] = f"{explanation} {note}" if explanation else note
+        repaired["repaired_locally"] = True
+    return repaired, repairs
+
+
+# Identical generate_outfit calls that overlap in time share one computation
+_outfit_flight = SingleFlight("generate_outfit")
+
+
+def _outfit_flight_key(lat, lon, occasion, user_email, use_llm, exclude_ids, weather_override,
+                       streaming=False) -> str:
+    """Canonical key for one generate_outfit request (exclusion order doesn't matter)."""
+    excludes = None
+    if isinstance(exclude_ids, list):
+        excludes = sorted(str(x) for x in exclude_ids)
+    return json.dumps(
+        [lat, lon, occasion, user_email, bool(use_llm), excludes, weather_override, bool(streaming)],
+        sort_keys=True,
+        default=str,
+    )
+
+
+class _ItemFanout:
+    """Items streamed by one in-flight generation, replayed to every caller that joins it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = []
+        self._listeners = []
+
+    def add(self, on_item):
+        # Under the lock so a late joiner gets every item exactly once (backlog, then live)
+        with self._lock:
+            self._listeners.append(on_item)
+            for item in self._items:
+                on_item(copy.deepcopy(item))
+
+    def remove(self, on_item):
+        with self._lock:
+            if on_item in self._listeners:
+                self._listeners.remove(on_item)
+
+    def emit(self, item):
+        with self._lock:
+            self._items.append(item)
+            for on_item in self._listeners:
+                on_item(copy.deepcopy(item))
+
+
+# Flight key -> _ItemFanout of the streaming generation currently in flight
+_outfit_fanouts = {}
+_outfit_fanouts_lock = threading.Lock()
+
+
+def get_outfit_coalescing_stats() -> dict:
+    """How many generate_outfit calls were served by an identical call already in flight."""
+    return _outfit_flight.stats()
+
+
+def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool = False, exclude_ids=None, weather_override: Optional[dict] = None, on_item=None):
+    """Generate an outfit, coalescing identical concurrent requests.
+
+    Double clicks, slider regenerations and client retries often send the same request
+    while the first is still running; those callers wait for the first one and get a
+    copy of its result instead of fetching weather and calling Groq again.
+
+    Streaming and non-streaming requests are coalesced separately. Every streaming caller
+    of one flight gets all streamed items on its own `on_item`, including the items that
+    arrived before it joined.
+    """
+    streaming = on_item is not None
+    key = _outfit_flight_key(lat, lon, occasion, user_email, use_llm, exclude_ids, weather_override, streaming)
+    kwargs = dict(user_email=user_email, use_llm=use_llm, exclude_ids=exclude_ids, weather_override=weather_override)
+    if not streaming:
+        return _outfit_flight.do(key, _generate_outfit, lat, lon, occasion, **kwargs)
+
+    with _outfit_fanouts_lock:
+        fanout = _outfit_fanouts.get(key)
+        if fanout is None:
+            fanout = _outfit_fanouts[key] = _ItemFanout()
+    fanout.add(on_item)
+
+    def _lead():
+        try:
+            return _generate_outfit(lat, lon, occasion, on_item=fanout.emit, **kwargs)
+        finally:
+            # Drop it before the flight ends, so the next identical request starts a fresh one
+            with _outfit_fanouts_lock:
+                if _outfit_fanouts.get(key) is fanout:
+                    del _outfit_fanouts[key]
+
+    try:
+        return _outfit_flight.do(key, _lead)
+    finally:
+        fanout.remove(on_item)
+
+
+def _generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool = False, exclude_ids=None, weather_override: Optional[dict] = None, on_item=None):
     """Generate outfit using the LLM exclusively when requested for a specific user.
 
     If `use_llm` is True (or LLM enabled in the environment), the function uses the LLM to generate an outfit.
     On any LLM failure or invalid output the function returns an error — there is no rule-based fallback.
+
+    `on_item` (optional callback) streams the LLM answer: each outfit entry is passed to it,
+    already validated and enriched, as soon as it arrives. The returned result is still the
+    final (possibly repaired) outfit, so callers should treat streamed items as a preview.
     """
     # Weather source:
     # - Get Outfit page uses live weather (OpenWeather current weather)
@@ -547,6 +1204,31 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
                     f"Avoid using these item ids (previous disliked outfit): {sorted(list(exclude_set))}. "
                     "Generate a different outfit if possible. If it's not possible with remaining items, return an 'error'."
                 )
+            # Enumerate feasible combinations locally and only send the best few.
+            candidates = enumerate_candidate_outfits(
+                occasion_items,
+                temp=temp,
+                condition=condition,
+                outer_required=outer_required,
+            )
+
+            # Streaming: forward each entry to the caller as soon as it checks out locally.
+            on_entry = None
+            if on_item is not None:
+                stream_by_id = {i.get('id'): i for i in occasion_items if i.get('id') is not None}
+                stream_acc_by_id = {
+                    str(a.get('_id')): a
+                    for a in accessories_items or []
+                    if isinstance(a, dict) and a.get('_id') is not None
+                }
+
+                def forward_entry(entry):
+                    enriched_entry, _problem = _enrich_llm_entry(entry, stream_by_id, stream_acc_by_id, exclude_set)
+                    if enriched_entry is not None:
+                        on_item(enriched_entry)
+
+                on_entry = forward_entry
+
             llm_res = generate_with_llm(
                 occasion_items,
                 accessories_items,
@@ -554,8 +1236,31 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
                 occasion_norm,
                 temperature=0.35 if exclude_set else 0.25,
                 extra_instruction=base_extra,
+                cache_tag=user_email,
+                candidates=candidates,
+                json_mode=LLM_SINGLE_PASS,
+                on_entry=on_entry,
             )
 
+            wants_accessory = bool(accessories_items) and (occasion_norm or '').strip().lower() != 'gym'
+
+            # Single-pass mode: fix common mistakes locally instead of asking the LLM again.
+            repairs = []
+            if LLM_SINGLE_PASS:
+                repaired, repairs = _repair_outfit(
+                    llm_res,
+                    occasion_items,
+                    accessories_items,
+                    exclude_set,
+                    candidates,
+                    outer_required=outer_required,
+                    want_accessory=wants_accessory,
+                    condition=condition,
+                    temp=temp,
+                )
+                if repaired is not None:
+                    llm_res = repaired
+
             # Validate the LLM output strictly against available wardrobe items
             def _validate_llm_output(llm_res):
                 # AI-first behavior: keep validation minimal so the LLM can choose freely.
@@ -603,61 +1308,15 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
                 included_accessory = False
 
                 for entry in llm_res['outfit']:
-                    if not isinstance(entry, dict):
-                        return {"valid": False, "code": "invalid_entry", "message": 'LLM outfit entry is not an object', "normalized": None}
-
-                    item_id = entry.get('id')
-                    role = (entry.get('role') or entry.get('type') or '').lower().strip()
-
-                    # Accessories: optional add-ons, validated against accessories list.
-                    if role == 'accessory':
-                        acc_id = None if item_id is None else str(item_id)
-                        if not acc_id or acc_id not in acc_by_id:
-                            return {"valid": False, "code": "unknown_accessory", "message": f"LLM suggested accessory id {item_id} not found", "normalized": None}
-                        acc = acc_by_id[acc_id]
-                        enriched.append({
-                            'role': 'accessory',
-                            'id': acc_id,
-                            'name': acc.get('name') or 'Accessory',
-                            'category': 'Accessory',
-                            'color': '',
-                            'icon': _accessory_icon(acc),
-                            'reason': entry.get('reason')
-                        })
-                        included_accessory = True
-                        continue
+                    enriched_entry, problem = _enrich_llm_entry(entry, by_id, acc_by_id, exclude_set)
+                    if problem:
+                        return {"valid": False, "code": problem[0], "message": problem[1], "normalized": None}
 
-                    # Wardrobe items: must exist, be clean, and respect exclusions.
-                    try:
-                        item_id_int = int(item_id)
-                    except Exception:
-                        return {"valid": False, "code": "unknown_item", "message": f"LLM suggested item id {item_id} not found in wardrobe", "normalized": None}
-
-                    if item_id_int not in by_id:
-                        return {"valid": False, "code": "unknown_item", "message": f"LLM suggested item id {item_id} not found in wardrobe", "normalized": None}
-
-                    if exclude_set and item_id_int in exclude_set:
-                        return {"valid": False, "code": "used_excluded", "message": f"LLM reused an excluded item id {item_id}", "normalized": None}
-
-                    item = by_id[item_id_int]
-
-                    # item must be clean
-                    if str(item.get('status', '')).lower() != 'clean':
-                        return {"valid": False, "code": "dirty_item", "message": f"Item id {item_id} is not clean", "normalized": None}
-
-                    item_type = (item.get('type') or '').lower()
-                    if item_type == 'shoes':
+                    if enriched_entry['role'] == 'accessory':
+                        included_accessory = True
+                    elif (by_id[enriched_entry['id']].get('type') or '').lower() == 'shoes':
                         included_shoes = True
-
-                    enriched.append({
-                        'role': role or item_type or 'item',
-                        'id': item_id_int,
-                        'name': item.get('name'),
-                        'category': item.get('category'),
-                        'color': item.get('color'),
-                        'icon': item.get('icon'),
-                        'reason': entry.get('reason')
-                    })
+                    enriched.append(enriched_entry)
 
                 # require at least one item
                 if len(enriched) == 0:
@@ -676,7 +1335,7 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
 
             # If the model violates constraints (common on regenerate), auto-retry once with
             # a more explicit correction message so the UI doesn't show a confusing error.
-            if not validation["valid"] and validation["code"] in (
+            if not LLM_SINGLE_PASS and not validation["valid"] and validation["code"] in (
                 "missing_shoes",
                 "unknown_accessory",
                 "invalid_schema",
@@ -703,6 +1362,8 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
                     occasion_norm,
                     temperature=0.25,
                     extra_instruction=correction,
+                    cache_tag=user_email,
+                    candidates=candidates,
                 )
                 validation = _validate_llm_output(llm_res_retry)
 
@@ -724,8 +1385,7 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
             # Best-effort accessory inclusion: if the user has accessories and the occasion isn't Gym,
             # retry once asking for exactly one accessory. If the retry fails, keep the valid outfit.
             try:
-                wants_accessory = (accessories_items or []) and (occasion_norm or '').strip().lower() != 'gym'
-                if wants_accessory and not validation.get('has_accessory'):
+                if not LLM_SINGLE_PASS and wants_accessory and not validation.get('has_accessory'):
                     accessory_ids = [
                         str(a.get('_id'))
                         for a in (accessories_items or [])
@@ -745,6 +1405,8 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
                             occasion_norm,
                             temperature=0.35 if exclude_set else 0.3,
                             extra_instruction=accessory_instruction,
+                            cache_tag=user_email,
+                            candidates=candidates,
                         )
                         validation2 = _validate_llm_output(llm_res_accessory)
                         if validation2.get('valid') and validation2.get('has_accessory'):
@@ -753,6 +1415,9 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
                 pass
 
             normalized = validation["normalized"]
+            if repairs:
+                normalized['repairs'] = repairs
+                normalized['repaired_locally'] = bool(llm_res.get('repaired_locally'))
 
             # Keep API contract consistent for the frontend (weather + details)
             normalized.update({
@@ -774,3 +1439,31 @@ def generate_outfit(lat, lon, occasion, user_email: str = None, use_llm: bool =
     # NOTE: Rule-based generation has been removed — this project uses LLM-only outfit generation.
     # If execution reaches this point it's an unexpected code path; return an error.
     return _error_with_weather('Non-LLM outfit generation has been removed. Enable the LLM (set GROQ_API_KEY/USE_LLM_OUTFITS) and try again.')
+
+
+def run_outfit_job(job, lat, lon, occasion, user_email=None, exclude_ids=None, weather_override=None, stream=False):
+    """Job body for the async outfit API: runs generate_outfit on the job pool.
+
+    The model's return value (outfit or `{error}` dict) becomes the job result
+    unchanged, so clients handle it exactly like the synchronous endpoint's JSON.
+    With `stream`, validated outfit entries are published in `progress.items` as the
+    LLM produces them (the explanation only arrives with the final result).
+    """
+    job.update(progress={"stage": "generating", "items": []})
+
+    streamed = []
+
+    def _on_item(item):
+        streamed.append(item)
+        job.update(progress={"items": list(streamed)})
+
+    return generate_outfit(
+        lat,
+        lon,
+        occasion,
+        user_email=user_email,
+        use_llm=True,
+        exclude_ids=exclude_ids,
+        weather_override=weather_override,
+        on_item=_on_item if stream else None,
+    )
@@ -9,6 +9,7 @@ This file belongs to the Model layer and does not handle routing or UI logic.
 """
 
 from utils.db import db
+from utils.counters import next_id
 import bcrypt
 
 # MongoDB collection for storing user information
@@ -79,9 +80,8 @@ def create_user(data: dict):
     # Store hashed password as string for MongoDB compatibility
     data["password"] = hashed.decode("utf-8")
 
-    # Generate auto-increment numeric ID
-    last = users.find_one(sort=[("id", -1)])
-    data["id"] = (last["id"] + 1) if last else 1
+    # Generate auto-increment numeric ID (atomic counter, safe with concurrent signups)
+    data["id"] = next_id("users")
 
     users.insert_one(data)
     return data
@@ -0,0 +1,201 @@
+"""
+outfit_candidates_model.py
+
+Local enumeration of feasible outfits before the LLM is called.
+
+Instead of sending every clean item to Groq and hoping it assembles a valid
+combination, we build all structurally valid outfits from the already-filtered
+occasion items:
+
+    shoes x (onepiece | top x bottom) x optional outer (required in cold/wet weather)
+
+Each combination is scored locally (item freshness, colour harmony, weather fit)
+and only the top-K are handed to the LLM, which just has to pick/rank one of them.
+This keeps prompts small and makes structurally invalid answers (e.g. missing
+shoes) close to impossible.
+
+Scoring is done column-wise: per-item scores are computed once into flat lists,
+then every combination is scored by index lookups, so the cost stays linear in
+the number of combinations.
+"""
+
+import heapq
+import os
+from datetime import datetime
+from itertools import product
+
+# How many candidate outfits to pass to the LLM (0 disables the shortlist)
+OUTFIT_CANDIDATES_TOP_K = int(os.getenv("OUTFIT_CANDIDATES_TOP_K", "8"))
+
+# Items kept per role before combining (bounds the size of the cross product)
+_MAX_PER_ROLE = 12
+
+# Colours that go with anything
+_NEUTRALS = {
+    "black", "white", "grey", "gray", "navy", "beige", "cream", "brown",
+    "denim", "khaki", "tan", "ivory", "charcoal", "camel", "off-white",
+}
+
+
+def _colour_key(item) -> str:
+    return str(item.get("color") or "").strip().lower()
+
+
+def _is_neutral(colour: str) -> bool:
+    return any(word in _NEUTRALS for word in colour.replace("/", " ").split())
+
+
+def _pair_harmony(a: str, b: str) -> float:
+    """Colour compatibility of two items in [0, 1]."""
+    if not a or not b:
+        return 0.7
+    if _is_neutral(a) or _is_neutral(b):
+        return 1.0
+    if a == b:
+        return 0.6  # monochrome: fine, but less interesting
+    return 0.35
+
+
+def _freshness(item, now: datetime) -> float:
+    """Prefer items worn less often and not worn in the last couple of days."""
+    wear_count = item.get("wear_count") or 0
+    try:
+        wear_count = int(wear_count)
+    except (TypeError, ValueError):
+        wear_count = 0
+    score = 1.0 / (1.0 + wear_count)
+
+    last = item.get("last_worn_at")
+    if isinstance(last, str) and last:
+        try:
+            last = datetime.fromisoformat(last)
+        except ValueError:
+            last = None
+    if isinstance(last, datetime):
+        days = (now - last).days
+        if days < 2:
+            score *= 0.5
+    return score
+
+
+def _outer_weight(temp) -> float:
+    """How much an (optional) outer layer helps at this temperature."""
+    if temp is None:
+        return 0.0
+    if temp <= 12:
+        return 0.4
+    if temp <= 18:
+        return 0.15
+    if temp >= 24:
+        return -0.4
+    return -0.1
+
+
+def enumerate_candidate_outfits(items, temp=None, condition=None, outer_required=False, top_k=OUTFIT_CANDIDATES_TOP_K):
+    """
+    Return up to `top_k` best-scoring feasible outfits built from `items`.
+
+    Each candidate is a dict of role -> wardrobe item id (shoes, and either
+    onepiece or top + bottom, plus outer when used) and a `score` in [0, 1]-ish.
+    Returns an empty list when no feasible combination exists or top_k <= 0.
+    """
+    if top_k <= 0:
+        return []
+
+    now = datetime.utcnow()
+
+    # ---- per-item columns (computed once) ----
+    by_role = {"shoes": [], "top": [], "bottom": [], "onepiece": [], "outer": []}
+    for item in items or []:
+        role = str(item.get("type") or "").strip().lower()
+        if role in by_role and item.get("id") is not None:
+            by_role[role].append(item)
+
+    ids = {}
+    colours = {}
+    fresh = {}
+    for role, role_items in by_role.items():
+        scored = sorted(role_items, key=lambda i: _freshness(i, now), reverse=True)[:_MAX_PER_ROLE]
+        ids[role] = [i.get("id") for i in scored]
+        colours[role] = [_colour_key(i) for i in scored]
+        fresh[role] = [_freshness(i, now) for i in scored]
+
+    if not ids["shoes"]:
+        return []
+
+    # Outer options: index into the outer columns, or None for "no outer layer"
+    outer_choices = list(range(len(ids["outer"])))
+    if not outer_required:
+        outer_choices.append(None)
+    if not outer_choices:
+        return []
+
+    outer_bonus = 1.0 if outer_required else _outer_weight(temp)
+    if str(condition or "").lower() in ("rain", "snow", "drizzle", "thunderstorm"):
+        outer_bonus = max(outer_bonus, 0.3)
+
+    # Body options: ("onepiece", i) or ("pair", top_i, bottom_i)
+    bodies = [("onepiece", i) for i in range(len(ids["onepiece"]))]
+    bodies += [("pair", t, b) for t in range(len(ids["top"])) for b in range(len(ids["bottom"]))]
+    if not bodies:
+        return []
+
+    # Body-level columns: freshness, a representative colour for matching shoes/outer, harmony
+    body_fresh = []
+    body_colour = []
+    body_harmony = []
+    for body in bodies:
+        if body[0] == "onepiece":
+            body_fresh.append(fresh["onepiece"][body[1]])
+            body_colour.append(colours["onepiece"][body[1]])
+            body_harmony.append(1.0)
+        else:
+            t, b = body[1], body[2]
+            body_fresh.append((fresh["top"][t] + fresh["bottom"][b]) / 2.0)
+            body_colour.append(colours["top"][t])
+            body_harmony.append(_pair_harmony(colours["top"][t], colours["bottom"][b]))
+
+    # ---- score every combination by index lookups ----
+    def _score(combo):
+        s_i, b_i, o_i = combo
+        shoe_colour = colours["shoes"][s_i]
+        score = (
+            0.35 * body_harmony[b_i]
+            + 0.20 * _pair_harmony(shoe_colour, body_colour[b_i])
+            + 0.25 * body_fresh[b_i]
+            + 0.10 * fresh["shoes"][s_i]
+        )
+        if o_i is not None:
+            # A layer helps in the cold and hurts in the heat; harmony/freshness pick which one.
+            fit = 0.5 + 0.25 * _pair_harmony(colours["outer"][o_i], body_colour[b_i]) + 0.25 * fresh["outer"][o_i]
+            score += 0.3 * outer_bonus * fit
+        return score
+
+    combos = product(range(len(ids["shoes"])), range(len(bodies)), outer_choices)
+    best = heapq.nlargest(top_k, combos, key=_score)
+
+    candidates = []
+    for combo in best:
+        s_i, b_i, o_i = combo
+        body = bodies[b_i]
+        cand = {"shoes": ids["shoes"][s_i]}
+        if body[0] == "onepiece":
+            cand["onepiece"] = ids["onepiece"][body[1]]
+        else:
+            cand["top"] = ids["top"][body[1]]
+            cand["bottom"] = ids["bottom"][body[2]]
+        if o_i is not None:
+            cand["outer"] = ids["outer"][o_i]
+        cand["score"] = round(_score(combo), 3)
+        candidates.append(cand)
+    return candidates
+
+
+def candidate_item_ids(candidates):
+    """Set of wardrobe item ids referenced by any candidate."""
+    out = set()
+    for cand in candidates or []:
+        for role, value in cand.items():
+            if role != "score" and value is not None:
+                out.add(value)
+    return out
@@ -27,6 +27,7 @@ Typical flow:
 """
 
 from utils.db import db
+from utils.counters import next_id
 
 # Mongo collection
 history_col = db["outfit_history"]
@@ -46,12 +47,9 @@ def _to_dict(doc):
         "liked": doc.get("liked", False),
     }
 
-# Generate numeric ID like in wardrobe
+# Generate numeric ID like in wardrobe (atomic counter, see utils.counters)
 def _get_next_id():
-    last = history_col.find_one(sort=[("id", -1)])
-    if last:
-        return int(last["id"]) + 1
-    return 1
+    return next_id("outfit_history")
 
 # Get all history entries sorted by newest first
 def get_all_history(user_email: str = None):
@@ -10,6 +10,7 @@ belong to the Model layer.
 
 from datetime import datetime, timedelta
 from utils.db import db
+from utils.counters import next_id, reserve_ids
 
 # MongoDB collection used for storing plan-ahead data
 plans = db["plans"]
@@ -33,6 +34,9 @@ def serialize_plan(p):
         "weather": p.get("weather"),
         "temp": p.get("temp"),
         "description": p.get("description"),
+        # "forecast" / "climatology" (both kept fresh by the background refresh) or "manual"
+        "weather_source": p.get("weather_source"),
+        "weather_updated_at": p["weather_updated_at"].isoformat() + "Z" if p.get("weather_updated_at") else None,
         "outfit": p.get("outfit", []),
         "group_id": int(p.get("group_id")) if p.get("group_id") is not None else None
     }
@@ -40,18 +44,24 @@ def serialize_plan(p):
 
 def _next_id():
     """
-    Generate the next available plan ID.
+    Generate the next available plan ID (atomic counter, see utils.counters).
     """
-    last = plans.find_one(sort=[("id", -1)])
-    return (last["id"] + 1) if last else 1
+    return next_id("plans")
 
 
 def _next_group_id():
     """
     Generate a group ID for multi-day plans.
     """
-    last = plans.find_one(sort=[("group_id", -1)])
-    return (last["group_id"] + 1) if last else 1
+    return next_id("plan_groups")
+
+
+def reserve_group_id():
+    """
+    Return a fresh group ID for plans that are created one day at a time
+    (e.g. by the trip generation job) but should still be linked together.
+    """
+    return _next_group_id()
 
 
 def get_all_plans(user_email: str = None):
@@ -82,13 +92,12 @@ def get_plan_by_id(pid, user_email: str = None):
     return plans.find_one(query)
 
 
-def add_plan_entry(entry, user_email: str = None):
+def _plan_document(entry, plan_id, user_email: str = None):
     """
-    Add a single plan entry with default values for missing fields.
+    Build a plan document with default values for missing fields.
     """
-
     new_entry = dict(entry)
-    new_entry["id"] = _next_id()
+    new_entry["id"] = plan_id
 
     # Default values to avoid missing fields
     new_entry.setdefault("location", "")
@@ -98,18 +107,47 @@ def add_plan_entry(entry, user_email: str = None):
     new_entry.setdefault("weather", "")
     new_entry.setdefault("temp", None)
     new_entry.setdefault("description", None)
+    new_entry.setdefault("weather_source", "forecast")
     new_entry.setdefault("outfit", [])
     new_entry.setdefault("group_id", None)
     new_entry["user_email"] = user_email
+    return new_entry
+
 
+def add_plan_entry(entry, user_email: str = None):
+    """
+    Add a single plan entry with default values for missing fields.
+    """
+
+    new_entry = _plan_document(entry, _next_id(), user_email)
     plans.insert_one(new_entry)
     return new_entry
 
 
+def add_plan_entries(entries, user_email: str = None):
+    """
+    Add many plan entries at once: all IDs are reserved with one counter update
+    and the documents are written with one insert_many, so the number of database
+    round trips doesn't grow with the number of entries.
+    """
+    entries = list(entries)
+    if not entries:
+        return []
+
+    ids = reserve_ids("plans", len(entries))
+    docs = [_plan_document(entry, plan_id, user_email) for entry, plan_id in zip(entries, ids)]
+    plans.insert_many(docs)
+    return docs
+
+
 def add_plan_range(start_date, end_date, entry_template, user_email: str = None):
     """
     Add multiple plan entries for a given date range.
     All entries share the same group ID and user email.
+
+    The group ID and every plan ID are reserved up front and all days are inserted
+    together (see add_plan_entries), so a long trip costs the same few round trips
+    as a single day.
     """
 
     start = datetime.strptime(start_date, "%Y-%m-%d").date()
@@ -119,27 +157,20 @@ def add_plan_range(start_date, end_date, entry_template, user_email: str = None)
     if end < start:
         start, end = end, start
 
+    # Assign one group ID to link related plans
     gid = _next_group_id()
-    created = []
+    entries = []
     cur = start
 
-    # Create a plan entry for each day in the range
+    # Build a plan entry for each day in the range
     while cur <= end:
         entry = dict(entry_template)
         entry["date"] = cur.strftime("%Y-%m-%d")
-        new_entry = add_plan_entry(entry, user_email)
-
-        # Assign group ID to link related plans
-        plans.update_one(
-            {"id": new_entry["id"]},
-            {"$set": {"group_id": gid}}
-        )
-
-        new_entry["group_id"] = gid
-        created.append(new_entry)
+        entry["group_id"] = gid
+        entries.append(entry)
         cur += timedelta(days=1)
 
-    return created
+    return add_plan_entries(entries, user_email)
 
 
 def update_plan(pid, user_email: str = None, **fields):
@@ -176,11 +207,15 @@ def delete_group(gid, user_email: str = None):
 
 
 from model.outfit_history_model import add_history_entry
+from model.wardrobe_model import record_outfits_worn
 
 
 def archive_past_plans(user_email: str = None):
     """
     Archive past plans by moving them into outfit history for a specific user.
+
+    Archived outfits count as worn on their plan date: all of them are recorded
+    with one record_outfits_worn call (wear_count, last_worn_at).
     """
 
     today = datetime.utcnow().date()
@@ -188,6 +223,7 @@ def archive_past_plans(user_email: str = None):
     if user_email:
         query["user_email"] = user_email
     past_plans = plans.find(query)
+    worn = []
 
     for p in past_plans:
         if p.get("outfit"):
@@ -200,3 +236,11 @@ def archive_past_plans(user_email: str = None):
                 "outfit": p.get("outfit")
             }, user_email)
             plans.delete_one({"id": p["id"]})
+            worn.append({"outfit": p.get("outfit"), "worn_at": p["date"]})
+
+    if worn:
+        try:
+            record_outfits_worn(worn, user_email)
+        except Exception as e:
+            # The plans are already in history; a failed wear update shouldn't undo that
+            print(f"⚠️ Could not record worn outfits for archived plans: {e}")
@@ -0,0 +1,177 @@
+"""
+plan_trip_model.py
+
+Server-side generation of outfits for a multi-day trip (Plan Ahead date range).
+
+The whole range is handled by one background job instead of the browser calling
+the outfit API once per day:
+- the forecast is fetched once for the trip location and reused for every day;
+  days beyond its reach get typical weather from the climate normals instead
+- items used on earlier days are excluded on later days (shared exclusion set)
+- Groq rate limits are respected by waiting exactly as long as the shared
+  rate limiter estimates (fed by Retry-After / x-ratelimit-* headers), not
+  with fixed sleeps between days
+- each day is saved through plan_ahead_model as soon as its outfit is ready,
+  so progress survives a closed browser tab
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+from model.forecast_model import get_forecast, weather_for_date, FORECAST_HORIZON_DAYS
+from model.get_outfit_model import generate_outfit
+from model.plan_ahead_model import add_plan_entry, reserve_group_id, serialize_plan
+
+# Upper bound (seconds) a single day may spend waiting on Groq rate limits
+TRIP_MAX_RATE_WAIT = float(os.getenv("TRIP_MAX_RATE_WAIT", "90"))
+
+# Longest trip the job accepts (days); keeps one request from queueing a season of LLM calls
+TRIP_MAX_DAYS = int(os.getenv("TRIP_MAX_DAYS", "31"))
+
+
+def trip_dates(start_date, end_date):
+    """Return the list of YYYY-MM-DD strings between two dates (inclusive, any order)."""
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    end = datetime.strptime(end_date, "%Y-%m-%d").date()
+    if end < start:
+        start, end = end, start
+
+    dates = []
+    cur = start
+    while cur <= end:
+        dates.append(cur.strftime("%Y-%m-%d"))
+        cur += timedelta(days=1)
+    return dates
+
+
+def _generate_with_rate_budget(lat, lon, occasion, user_email, exclude_ids, weather_override):
+    """
+    Call generate_outfit, waiting out Groq rate limits using the `retry_after`
+    estimate from the shared rate limiter. Gives up once TRIP_MAX_RATE_WAIT
+    seconds have been spent waiting.
+    """
+    waited = 0.0
+    backoff = 2.0
+
+    while True:
+        result = generate_outfit(
+            lat,
+            lon,
+            occasion,
+            user_email=user_email,
+            use_llm=True,
+            exclude_ids=exclude_ids,
+            weather_override=weather_override,
+        )
+        if not (isinstance(result, dict) and result.get("code") == "rate_limit_exceeded"):
+            return result
+
+        # Prefer the rate limiter's wait estimate; otherwise back off exponentially.
+        wait = result.get("retry_after")
+        if wait is None:
+            wait = backoff
+            backoff = min(backoff * 2, 30.0)
+        wait = max(0.0, float(wait)) + 0.25
+
+        if waited + wait > TRIP_MAX_RATE_WAIT:
+            return result
+        time.sleep(wait)
+        waited += wait
+
+
+def run_trip_generation(job, start_date, end_date, base, user_email, weather_override=None):
+    """
+    Job body: generate and persist one outfit per day of the trip.
+
+    `base` holds the shared plan fields (location, lat, lon, occasion).
+    `weather_override` (optional) is a manual weather string used for every day.
+
+    Returns a dict { group_id, days: [...] } where each day has the date, weather,
+    outfit/outfitError, missingWeather, and the saved plan (if it was persisted).
+    """
+    dates = trip_dates(start_date, end_date)
+    lat = base.get("lat")
+    lon = base.get("lon")
+    occasion = base.get("occasion") or "Casual"
+
+    job.update(progress={"total": len(dates), "done": 0, "current": None})
+
+    # One forecast download for the whole trip (none if every day is past the horizon)
+    forecast = None
+    horizon = (datetime.utcnow().date() + timedelta(days=FORECAST_HORIZON_DAYS)).strftime("%Y-%m-%d")
+    if not weather_override and dates and dates[0] <= horizon:
+        forecast = get_forecast(lat, lon)
+        if "error" in forecast:
+            forecast = None
+
+    group_id = None
+    used_across_days = set()
+    days = []
+
+    for idx, date_str in enumerate(dates):
+        job.update(progress={"current": date_str})
+
+        if weather_override:
+            weather = {"weather": weather_override, "temp": None, "description": None}
+        else:
+            # Past the forecast's reach (or no forecast at all): typical weather for the month
+            weather = weather_for_date(forecast, lat, lon, date_str)
+
+        day = {
+            "date": date_str,
+            "weather": weather.get("weather") if weather else None,
+            "temp": weather.get("temp") if weather else None,
+            "description": weather.get("description") if weather else None,
+            "weatherSource": "manual" if weather_override else (weather.get("source") if weather else None),
+            "outfit": [],
+            "outfitError": None,
+            "missingWeather": weather is None,
+            "plan": None,
+        }
+
+        if weather is not None:
+            override = {"weather": weather["weather"], "temp": weather["temp"]}
+
+            # First try: avoid items already used on earlier days of the trip.
+            exclude_ids = sorted(used_across_days)
+            result = _generate_with_rate_budget(lat, lon, occasion, user_email, exclude_ids, override)
+
+            # If the exclusion makes it impossible, fall back to allowing repeats.
+            if (
+                isinstance(result, dict) and result.get("error")
+                and result.get("code") != "rate_limit_exceeded"
+                and exclude_ids
+            ):
+                result = _generate_with_rate_budget(lat, lon, occasion, user_email, [], override)
+
+            if isinstance(result, dict) and result.get("error"):
+                day["outfitError"] = result.get("error")
+            else:
+                day["outfit"] = result.get("outfit") or []
+                for item in day["outfit"]:
+                    item_id = item.get("id") if isinstance(item, dict) else None
+                    if isinstance(item_id, int):
+                        used_across_days.add(item_id)
+
+                # Persist the day right away so completed days are never lost.
+                if group_id is None:
+                    group_id = reserve_group_id()
+                entry = dict(base)
+                entry.update({
+                    "date": date_str,
+                    "weather": day["weather"],
+                    "temp": day["temp"],
+                    "description": day["description"],
+                    # Manual weather must not be overwritten by the background forecast refresh
+                    "weather_source": day["weatherSource"],
+                    "outfit": day["outfit"],
+                    "group_id": group_id,
+                })
+                day["plan"] = serialize_plan(add_plan_entry(entry, user_email))
+
+        days.append(day)
+        job.update(progress={"done": idx + 1, "days": list(days)})
+
+    job.update(progress={"current": None})
+    return {"group_id": group_id, "days": days}
@@ -0,0 +1,167 @@
+"""
+plan_weather_model.py
+
+Keeps the weather stored on upcoming plans up to date.
+
+Plans get their weather once, when they are created. A background scheduler
+periodically looks at every plan (all users) whose date falls inside the
+forecast window, groups them by grid-snapped location, downloads one forecast
+per location (through the shared forecast cache) and writes the new
+weather/temp/description back with a single bulk write. Plan pages then just
+read Mongo; nothing on the request path talks to the weather API.
+
+Only plans whose weather came from a forecast or from climate normals
+(weather_source "forecast" / "climatology") are refreshed. Manual weather and legacy
+plans without a weather_source are left alone; utils.db_migrate classifies the latter.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from model.forecast_model import get_forecast, forecast_for_date
+from model.plan_ahead_model import plans
+from utils.db import db
+from utils.geo import snap_coords
+
+# Seconds between refresh runs (0 disables the scheduler)
+PLAN_WEATHER_REFRESH_INTERVAL = float(os.getenv("PLAN_WEATHER_REFRESH_INTERVAL", "3600"))
+# The 5-day forecast covers today + 5 local days at most
+PLAN_WEATHER_WINDOW_DAYS = int(os.getenv("PLAN_WEATHER_WINDOW_DAYS", "5"))
+
+# One document per scheduled task; only the worker holding the lease runs it, so several
+# gunicorn workers don't all refresh (and all call the weather API) at the same time
+scheduler_leases = db["scheduler_leases"]
+
+_LEASE_ID = "plan_weather_refresh"
+_stats_lock = threading.Lock()
+_stats = {"runs": 0, "skipped_runs": 0, "plans_seen": 0, "locations": 0, "updated": 0, "last_run": None}
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def _acquire_lease(seconds: float) -> bool:
+    """Take the refresh lease for `seconds` if nobody else holds it."""
+    now = datetime.utcnow()
+    try:
+        scheduler_leases.update_one(
+            {"_id": _LEASE_ID, "until": {"$lt": now}},
+            {"$set": {"until": now + timedelta(seconds=seconds), "pid": os.getpid()}},
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The lease document exists and hasn't expired: another worker has it
+        return False
+
+
+def _weather_fields(day, issued_at):
+    return {
+        "weather": day.get("weather"),
+        "temp": day.get("temp"),
+        "description": day.get("description"),
+        "weather_source": "forecast",
+        "forecast_issued_at": issued_at,
+    }
+
+
+def refresh_plan_weather():
+    """
+    Refresh the weather of every plan inside the forecast window.
+
+    Returns { plans, locations, updated, errors }. One forecast is fetched per
+    snapped location, however many users/plans share it.
+    """
+    today = datetime.utcnow().date()
+    # Start one day back: in timezones ahead of UTC "today" may already be tomorrow
+    first = (today - timedelta(days=1)).strftime("%Y-%m-%d")
+    last = (today + timedelta(days=PLAN_WEATHER_WINDOW_DAYS)).strftime("%Y-%m-%d")
+
+    cursor = plans.find(
+        {
+            "date": {"$gte": first, "$lte": last},
+            "lat": {"$ne": None},
+            "lon": {"$ne": None},
+            # Missing weather_source (legacy) may be hand-typed weather: never overwrite it
+            "weather_source": {"$in": ["forecast", "climatology"]},
+        },
+        {"_id": 1, "date": 1, "lat": 1, "lon": 1, "weather": 1, "temp": 1, "description": 1},
+    )
+
+    # Group by forecast cell so every location is downloaded once
+    groups = {}
+    seen = 0
+    for p in cursor:
+        seen += 1
+        cell = snap_coords(p.get("lat"), p.get("lon"))
+        if cell[0] is None:
+            continue
+        groups.setdefault(cell, []).append(p)
+
+    ops = []
+    errors = 0
+    for cell, group in groups.items():
+        forecast = get_forecast(*cell)
+        if "error" in forecast:
+            errors += 1
+            continue
+        for p in group:
+            day = forecast_for_date(forecast, p["date"])
+            if day is None:
+                continue
+            fields = _weather_fields(day, forecast.get("issued_at"))
+            # Skip writes that wouldn't change what the user sees
+            if all(p.get(k) == fields[k] for k in ("weather", "temp", "description")):
+                continue
+            fields["weather_updated_at"] = datetime.utcnow()
+            ops.append(UpdateOne({"_id": p["_id"]}, {"$set": fields}))
+
+    if ops:
+        plans.bulk_write(ops, ordered=False)
+
+    result = {"plans": seen, "locations": len(groups), "updated": len(ops), "errors": errors}
+    with _stats_lock:
+        _stats["runs"] += 1
+        _stats["plans_seen"] += seen
+        _stats["locations"] += len(groups)
+        _stats["updated"] += len(ops)
+        _stats["last_run"] = dict(result, at=datetime.utcnow().isoformat() + "Z")
+    return result
+
+
+def _scheduler_loop(interval: float):
+    while True:
+        try:
+            if _acquire_lease(interval * 0.9):
+                result = refresh_plan_weather()
+                print(f"🌤️ Plan weather refresh: {result}")
+            else:
+                with _stats_lock:
+                    _stats["skipped_runs"] += 1
+        except Exception as e:
+            print(f"⚠️ Plan weather refresh failed: {e}")
+        time.sleep(interval)
+
+
+def start_plan_weather_scheduler(interval: float = PLAN_WEATHER_REFRESH_INTERVAL):
+    """Start the refresh loop in a daemon thread (once per process; no-op if interval <= 0)."""
+    global _scheduler_started
+    if interval <= 0:
+        return False
+    with _scheduler_lock:
+        if _scheduler_started:
+            return False
+        _scheduler_started = True
+    threading.Thread(target=_scheduler_loop, args=(interval,), name="plan-weather-refresh", daemon=True).start()
+    return True
+
+
+def get_plan_weather_refresh_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["interval"] = PLAN_WEATHER_REFRESH_INTERVAL
+    return stats
@@ -10,11 +10,22 @@ Handles all database operations for wardrobe items including:
 
 Database Structure:
 - wardrobe_items: Main collection storing all user clothing items
+  (status_key / category_key hold lower-cased copies of status / category so
+  filters are exact, index-served matches instead of case-insensitive regexes)
 - dirty_items: Tracks items marked for washing
 """
 
-from datetime import datetime
+import os
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from pymongo import UpdateMany, UpdateOne
+
 from utils.db import db, laundry_db  # main DB and laundry DB
+from utils.counters import next_id
+from utils.db_migrate import is_migration_done, WARDROBE_KEYS
 
 # Main collection where all wardrobe items are stored
 wardrobe_col = db["wardrobe_items"]
@@ -52,18 +63,43 @@ def _to_dict(doc):
         "icon": doc.get("icon", "👚"),
     }
 
+def _key(value) -> str:
+    """Normalized form stored in status_key / category_key ("Needs Wash" -> "needs wash")."""
+    return str(value or "").strip().lower()
+
+def _key_filter(key_field: str, field: str, value) -> dict:
+    """
+    Query matching `key_field` == _key(value).
+
+    Until the status_key/category_key backfill (utils.db_migrate) has finished, legacy
+    documents without the key are matched on the original field, case-insensitively.
+    """
+    key = _key(value)
+    if is_migration_done(WARDROBE_KEYS):
+        return {key_field: key}
+    return {"$or": [
+        {key_field: key},
+        {key_field: {"$exists": False}, field: {"$regex": rf"^\s*{re.escape(key)}\s*$", "$options": "i"}},
+    ]}
+
+def _invalidate_outfit_cache(user_email: str = None):
+    """
+    Drop cached LLM outfit results for this user after their wardrobe changed.
+
+    Imported lazily because get_outfit_model imports this module.
+    """
+    from model.get_outfit_model import invalidate_llm_cache
+    invalidate_llm_cache(user_email)
+
 # Generate a numeric ID similar to SQL auto-increment
 def _get_next_id():
     """
     Generate next auto-increment ID for new wardrobe items.
     
-    Similar to SQL auto-increment. Finds the highest existing ID
-    and returns the next sequential number.
+    Similar to SQL auto-increment. Uses the atomic "wardrobe_items" counter
+    (utils.counters), so concurrent inserts never get the same ID.
     """
-    last = wardrobe_col.find_one(sort=[("id", -1)])
-    if last and "id" in last:
-        return int(last["id"]) + 1
-    return 1
+    return next_id("wardrobe_items")
 
 # =====================================================
 # MAIN API FUNCTIONS
@@ -101,20 +137,18 @@ def get_items_by_filter(filter_value, user_email: str = None):
 
     # Special handling for "Needs Wash" status
     if filter_lower in ["needs wash", "needs", "needswash"]:
-        query = {**base_query, "status": {"$regex": "^needs wash$", "$options": "i"}}
+        query = {**base_query, **_key_filter("status_key", "status", "needs wash")}
         docs = wardrobe_col.find(query)
         return [_to_dict(d) for d in docs]
 
-    # Category filter (case-insensitive exact match)
-    query = {**base_query, "category": {"$regex": f"^{filter_lower}$", "$options": "i"}}
+    # Category filter (case-insensitive exact match via the normalized key)
+    query = {**base_query, **_key_filter("category_key", "category", filter_value)}
     docs = wardrobe_col.find(query)
     return [_to_dict(d) for d in docs]
 
-# Get items by status using case-insensitive regex match
+# Get items by status (case-insensitive, matched on the normalized key)
 def get_items_by_status(status):
-    docs = wardrobe_col.find(
-        {"status": {"$regex": f"^{status}$", "$options": "i"}}
-    )
+    docs = wardrobe_col.find(_key_filter("status_key", "status", status))
     return [_to_dict(d) for d in docs]
 
 # Find item by numeric id (for a specific user)
@@ -158,6 +192,8 @@ def add_item(name: str, category: str, status: str, color: str, item_type: str,
         "type": item_type,
         "color": color,
         "status": status,
+        "status_key": _key(status),
+        "category_key": _key(category),
         "wear_count": 0,
         "last_worn_at": None,
         "icon": icon,
@@ -180,6 +216,7 @@ def add_item(name: str, category: str, status: str, color: str, item_type: str,
             upsert=True,   # create new doc if it does not exist
         )
 
+    _invalidate_outfit_cache(user_email)
     return _to_dict(doc)
 
 # Update item status between 'Clean' and 'Needs Wash'
@@ -231,29 +268,26 @@ def update_item_status(item_id: int, user_email: str = None):
 # Update status and wear_count in main wardrobe collection
     wardrobe_col.update_one(
         query,
-        {"$set": {"status": new_status, "wear_count": wear_count, "last_worn_at": last_worn_at}},
+        {"$set": {
+            "status": new_status,
+            "status_key": _key(new_status),
+            "wear_count": wear_count,
+            "last_worn_at": last_worn_at,
+        }},
     )
 
+    _invalidate_outfit_cache(user_email)
+
 # Read back updated document to return fresh data
     updated = wardrobe_col.find_one(query)
     return _to_dict(updated)
 
 
-def record_outfit_worn(outfit_items, user_email: str = None):
-    """Record that the user wore an entire outfit now.
-
-    Stores timestamps so items can be auto-marked as "Needs Wash" after N days.
-    Only updates items belonging to the specified user (if user_email provided).
-    """
-    if not isinstance(outfit_items, list):
-        return
-
-    now = datetime.utcnow()
-
-    # Deduplicate ids so we don't double-update if the LLM repeats something.
+def _outfit_item_ids(outfit_items):
+    """Unique integer item ids of one outfit, in order (the LLM sometimes repeats items)."""
     seen = set()
     ids = []
-    for x in outfit_items:
+    for x in outfit_items if isinstance(outfit_items, list) else []:
         if not isinstance(x, dict):
             continue
         item_id = x.get("id")
@@ -267,61 +301,171 @@ def record_outfit_worn(outfit_items, user_email: str = None):
             continue
         seen.add(item_id_int)
         ids.append(item_id_int)
+    return ids
+
+
+def _as_worn_at(value, default: datetime) -> datetime:
+    """
+    Normalize a wear timestamp: datetime as is, date / "YYYY-MM-DD" / ISO string to a
+    naive UTC datetime, None to `default`. Anything else raises ValueError.
+    """
+    if value is None or value == "":
+        return default
+    if isinstance(value, datetime):
+        return value if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str):
+        try:
+            return _as_worn_at(datetime.fromisoformat(value.strip().replace("Z", "+00:00")), default)
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid worn_at: {value!r}")
+
+
+def record_outfits_worn(outfits, user_email: str = None, worn_at: datetime = None):
+    """Record many worn outfits in one go.
 
-    for item_id_int in ids:
-        # Only update timestamp for items that currently exist and belong to user.
-        # Also increment wear_count to track how many times worn since last wash
-        query = {"id": int(item_id_int)}
+    `outfits` is a list whose entries are either an outfit (list of item dicts) or a dict
+    { "outfit": [...], "worn_at": datetime } when outfits were worn at different times
+    (e.g. past plans or imported history). Each item gets wear_count += number of outfits
+    it appears in and last_worn_at = its latest wear (never moved backwards).
+
+    When every item gets the same increment and timestamp this is a single update_many
+    over `$in` ids; otherwise one bulk write with an update_many per distinct
+    (increment, timestamp) pair. Only items belonging to `user_email` (if given) change.
+
+    `worn_at` values may be datetimes, dates or ISO strings ("2026-10-16"); they are
+    normalized to UTC datetimes first (ValueError if one can't be parsed).
+
+    Returns { "items", "matched", "modified" }.
+    """
+    default_worn_at = _as_worn_at(worn_at, datetime.utcnow())
+
+    # item id -> [times worn, latest wear]
+    per_item = {}
+    for entry in outfits or []:
+        if isinstance(entry, dict):
+            items, when = entry.get("outfit"), _as_worn_at(entry.get("worn_at"), default_worn_at)
+        else:
+            items, when = entry, default_worn_at
+        for item_id in _outfit_item_ids(items):
+            acc = per_item.setdefault(item_id, [0, when])
+            acc[0] += 1
+            acc[1] = max(acc[1], when)
+
+    if not per_item:
+        return {"items": 0, "matched": 0, "modified": 0}
+
+    # Items sharing the same (increment, timestamp) go into one update_many
+    groups = {}
+    for item_id, (times, when) in per_item.items():
+        groups.setdefault((times, when), []).append(item_id)
+
+    def _op(times, when, ids):
+        query = {"id": {"$in": ids}}
         if user_email:
             query["user_email"] = user_email
-        
-        wardrobe_col.update_one(
-            query,
-            {
-                "$set": {"last_worn_at": now},
-                "$inc": {"wear_count": 1}  # Increment wear_count by 1
-            },
+        # $max keeps a newer last_worn_at when recording older wears
+        return query, {"$max": {"last_worn_at": when}, "$inc": {"wear_count": times}}
+
+    if len(groups) == 1:
+        (times, when), ids = next(iter(groups.items()))
+        result = wardrobe_col.update_many(*_op(times, when, ids))
+        matched, modified = result.matched_count, result.modified_count
+    else:
+        result = wardrobe_col.bulk_write(
+            [UpdateMany(*_op(times, when, ids)) for (times, when), ids in groups.items()],
+            ordered=False,
         )
+        matched, modified = result.matched_count, result.modified_count
+
+    return {"items": len(per_item), "matched": matched, "modified": modified}
 
 
-def refresh_dirty_items_by_days(days_until_dirty: int):
+def record_outfit_worn(outfit_items, user_email: str = None):
+    """Record that the user wore an entire outfit now.
+
+    Stores timestamps so items can be auto-marked as "Needs Wash" after N days,
+    and increments wear_count to track how many times worn since last wash.
+    Only updates items belonging to the specified user (if user_email provided).
+    Returns the number of modified items.
+    """
+    if not isinstance(outfit_items, list):
+        return 0
+    return record_outfits_worn([outfit_items], user_email)["modified"]
+
+
+# Per-user "last refreshed" watermark: user_email -> (monotonic time, threshold used).
+# Repeat calls inside DIRTY_REFRESH_INTERVAL seconds (same threshold) are no-ops.
+DIRTY_REFRESH_INTERVAL = float(os.getenv("DIRTY_REFRESH_INTERVAL", "300"))
+_dirty_refreshed = {}
+_dirty_refreshed_lock = threading.Lock()
+
+
+def refresh_dirty_items_by_days(days_until_dirty: int, user_email: str = None, force: bool = False):
     """Auto-mark items as "Needs Wash" when last_worn_at is older than the threshold.
 
     Called opportunistically (e.g., when loading wardrobe or generating an outfit)
     so the UI stays in sync without a background scheduler.
+
+    Set-based: one indexed read of the stale item ids, one update_many on the wardrobe
+    and one bulk upsert into dirty_items, whatever the number of items. Scoped to
+    `user_email` when given (all users otherwise). Returns the number of items marked.
     """
     try:
         threshold_days = int(days_until_dirty)
     except Exception:
-        return
+        return 0
 
     if threshold_days <= 0:
-        return
+        return 0
+
+    # Skip if this user's wardrobe was refreshed recently with the same threshold
+    started = time.monotonic()
+    if not force:
+        with _dirty_refreshed_lock:
+            last = _dirty_refreshed.get(user_email)
+            if last and last[1] == threshold_days and started - last[0] < DIRTY_REFRESH_INTERVAL:
+                return 0
+
+    def _mark_refreshed():
+        # Only once the work went through: a failed refresh must be retried next call.
+        # Also not while status_key is still being backfilled, so legacy items that
+        # get their key in the meantime are picked up by the next call.
+        if not is_migration_done(WARDROBE_KEYS):
+            return
+        with _dirty_refreshed_lock:
+            _dirty_refreshed[user_email] = (started, threshold_days)
 
     now = datetime.utcnow()
-    docs = list(wardrobe_col.find({"status": {"$regex": "^clean$", "$options": "i"}}))
+    # Only clean items worn at least `threshold_days` ago; the date comparison also skips
+    # missing/non-date last_worn_at values, so Mongo returns exactly the items to flip.
+    query = {**_key_filter("status_key", "status", "clean"), "last_worn_at": {"$lte": now - timedelta(days=threshold_days)}}
+    if user_email:
+        query["user_email"] = user_email
 
-    for doc in docs:
-        last = doc.get("last_worn_at")
-        if not last:
-            continue
+    ids = [int(d["id"]) for d in wardrobe_col.find(query, {"id": 1}) if d.get("id") is not None]
+    if not ids:
+        _mark_refreshed()
+        return 0
 
-        # Some Mongo drivers may return strings; ignore those for simplicity.
-        if not isinstance(last, datetime):
-            continue
+    # Same predicate again, so an item washed in the meantime isn't flipped back
+    wardrobe_col.update_many(
+        {**query, "id": {"$in": ids}},
+        {"$set": {"status": "Needs Wash", "status_key": "needs wash"}},
+    )
+    dirty_col.bulk_write(
+        [
+            UpdateOne({"item_id": item_id}, {"$set": {"item_id": item_id, "marked_at": now}}, upsert=True)
+            for item_id in ids
+        ],
+        ordered=False,
+    )
 
-        age_days = (now - last).days
-        if age_days >= threshold_days:
-            item_id = int(doc.get("id"))
-            wardrobe_col.update_one(
-                {"id": item_id},
-                {"$set": {"status": "Needs Wash"}},
-            )
-            dirty_col.update_one(
-                {"item_id": item_id},
-                {"$set": {"item_id": item_id, "marked_at": now}},
-                upsert=True,
-            )
+    _mark_refreshed()
+    _invalidate_outfit_cache(user_email)
+    return len(ids)
 
 
 # Update a wardrobe item fields
@@ -345,11 +489,18 @@ def update_item(item_id: int, data: dict, user_email: str = None):
     if not update:
         return None
 
+    # Keep the normalized filter keys in step with the displayed values
+    if "status" in update:
+        update["status_key"] = _key(update["status"])
+    if "category" in update:
+        update["category_key"] = _key(update["category"])
+
     query = {"id": int(item_id)}
     if user_email:
         query["user_email"] = user_email
     
     wardrobe_col.update_one(query, {"$set": update})
+    _invalidate_outfit_cache(user_email)
     updated = wardrobe_col.find_one(query)
     return _to_dict(updated)
 # Delete item from wardrobe (and dirty_items if applicable)
@@ -363,5 +514,6 @@ def delete_item(item_id: int, user_email: str = None) -> bool:
     result = wardrobe_col.delete_one(query)
 # Also clean up from dirty_items (if it was marked as dirty)
     dirty_col.delete_one({"item_id": int(item_id)})
+    _invalidate_outfit_cache(user_email)
 # Return True if something was actually deleted
     return result.deleted_count > 0
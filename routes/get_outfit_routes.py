@@ -3,32 +3,45 @@ get_outfit_routes.py
 
 Endpoints powering the Get Outfit UI:
 - GET /get_outfit : render page
-- GET /api/location/autocomplete : return location suggestions via OpenWeather geocoding
+- GET /api/location/autocomplete : return location suggestions (offline index / cache, then OpenWeather geocoding)
 - GET /api/location/reverse : reverse geocode lat/lon to a human-readable label
-- POST /api/get_outfit : generate outfit suggestions (calls model)
+- POST /api/get_outfit : generate outfit suggestions (calls model, blocks until done)
+- POST /api/get_outfit/jobs : queue outfit generation, returns { job_id } immediately
+- GET /api/get_outfit/jobs/<job_id> : poll a queued generation
+- GET /api/get_outfit/jobs/<job_id>/events : follow a queued generation via Server-Sent Events
+  (only with JOB_EVENTS_ENABLED=1 on async/gevent workers; clients poll otherwise)
 - POST /api/save_outfit : save a generated outfit to in-memory history
+- GET /api/stats : cache hit rates and upstream call counters (diagnostics)
 
 Notes:
-- `requests` is used for server-side calls to OpenWeather's geocoding APIs.
+- Weather and geocoding go through utils.weather_provider (OpenWeather, or the offline
+  `WEATHER_PROVIDER=local` provider for load tests and benchmarks).
 - `add_history_entry` persists a saved outfit into the in-memory history model.
-- `OPENWEATHER_API_KEY` is required in environment variables; if missing,
+- `OPENWEATHER_API_KEY` is required for the OpenWeather provider; if missing,
   API requests will fail and endpoints return errors or empty results.
 """
 
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, Response, stream_with_context
 from routes import outfit_bp
-from model.get_outfit_model import generate_outfit
+from model.get_outfit_model import (
+    generate_outfit, run_outfit_job,
+    get_llm_cache_stats, get_prompt_usage_stats, get_outfit_coalescing_stats, get_weather_cache_stats,
+)
+from model.geocoding_model import (
+    autocomplete_locations, reverse_geocode_location, get_autocomplete_stats, get_reverse_geocode_stats,
+)
+from model.forecast_model import get_forecast_cache_stats
+from model.plan_weather_model import get_plan_weather_refresh_stats
 from model.outfit_history_model import add_history_entry   # used to persist saved outfits
 from model.login_model import get_user_by_email
 from model.wardrobe_model import record_outfit_worn, refresh_dirty_items_by_days
 from utils.auth import token_required
-import requests  # used to call third-party OpenWeather APIs
+from utils.http_client import http_client  # pooled client for third-party APIs (stats only here)
+from utils.weather_provider import get_weather_provider
+from utils.jobs import job_runner, JobQueueFull, JOB_EVENTS_ENABLED
 import os
 from datetime import datetime
 
-# Read the OpenWeather API key from env; required for geocoding and reverse geocoding
-OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-
 
 # ---------------------------------------------------------
 # PAGE RENDER
@@ -47,7 +60,10 @@ def get_outfit_page(current_user):
 def autocomplete(current_user):
     """Return up to 5 location suggestions for the given query string.
 
-    Query param: q (partial place name)
+    Served from the offline place index or the autocomplete cache when possible,
+    otherwise from OpenWeather's geocoding API (see model.geocoding_model).
+
+    Query param: q (partial place name, optionally ", region/country")
     Response: JSON array of { label, lat, lon }
     """
     query = request.args.get("q", "")
@@ -56,34 +72,8 @@ def autocomplete(current_user):
     if not query:
         return jsonify([])
 
-    # Build the OpenWeather geocoding request URL. The `appid` must be set.
-    url = (
-        "http://api.openweathermap.org/geo/1.0/direct"
-        f"?q={query}&limit=5&appid={OPENWEATHER_API_KEY}"
-    )
-
-    # NOTE: This performs a blocking HTTP call; if the external API fails
-    # it will raise or return non-JSON; the current pattern forwards an empty
-    # or error response upstream. In production you may add retries or error handling.
-    results = requests.get(url).json()
-
-    suggestions = []
-    for loc in results:
-        # Build a human-friendly label like 'City, State, Country'
-        label = loc.get("name", "")
-
-        if loc.get("state"):
-            label += f", {loc['state']}"
-
-        label += f", {loc.get('country', '')}"
-
-        suggestions.append({
-            "label": label,
-            "lat": loc.get("lat"),  # may be None if API doesn't return it
-            "lon": loc.get("lon")
-        })
-
-    return jsonify(suggestions)
+    # Offline index (prefix search), then results cached for this exact query, then OpenWeather
+    return jsonify(autocomplete_locations(query))
 
 
 # ---------------------------------------------------------
@@ -95,7 +85,8 @@ def reverse_geocode(current_user):
     """Reverse geocode lat/lon into a human-readable label.
 
     Query params: lat, lon
-    Returns 400 if coords missing, 404 if OpenWeather returns no match.
+    Returns 400 if coords missing, 404 if OpenWeather returns no match,
+    502 if the lookup failed and nothing was cached.
     """
     lat = request.args.get("lat")
     lon = request.args.get("lon")
@@ -104,93 +95,85 @@ def reverse_geocode(current_user):
     if not lat or not lon:
         return jsonify({"error": "Missing coordinates"}), 400
 
-    # Call OpenWeather reverse geocoding endpoint for a single result
-    url = (
-        "http://api.openweathermap.org/geo/1.0/reverse"
-        f"?lat={lat}&lon={lon}&limit=1&appid={OPENWEATHER_API_KEY}"
-    )
-    result = requests.get(url).json()
+    # Cached by geohash cell (memory, then Mongo), OpenWeather only on a miss
+    place = reverse_geocode_location(lat, lon)
+    if place is None:
+        return jsonify({"error": "Reverse geocoding unavailable"}), 502
 
-    # If API returned an empty list, respond with 404 for not found
-    if not result:
+    # If nothing is known at these coordinates, respond with 404 for not found
+    if not place:
         return jsonify({"error": "Location not found"}), 404
 
-    loc = result[0]
-
-    # Construct label consistently with `autocomplete`
-    label = loc.get("name", "")
-
-    if loc.get("state"):
-        label += f", {loc['state']}"
-
-    label += f", {loc.get('country', '')}"
-
-    return jsonify({
-        "label": label,
-        "lat": loc.get("lat"),
-        "lon": loc.get("lon")
-    })
+    return jsonify(place)
 
 
 # ---------------------------------------------------------
 # GENERATE OUTFIT
 # ---------------------------------------------------------
-@outfit_bp.route("/api/get_outfit", methods=["POST"])
-@token_required
-def api_generate_outfit(current_user):
-    """Generate outfit suggestions.
+def _prepare_outfit_request(data, current_user):
+    """Validate a generate-outfit payload and refresh the user's wardrobe statuses.
 
-    Expected JSON body: { lat, lon, occasion }
-    Returns JSON result from the model; if missing coords, returns 400.
+    Shared by the synchronous endpoint and the job API.
+    Returns (kwargs for generate_outfit, None) or (None, (json, status)) on a bad request.
     """
-    data = request.get_json()
+    data = data if isinstance(data, dict) else {}
     print(f"DEBUG: Received payload: {data}")
-    
+
     lat = data.get("lat")
     lon = data.get("lon")
-    occasion = data.get("occasion")
-    exclude_ids = data.get("exclude_ids")
     weather_override = None
 
     # Optional: allow callers (e.g., Plan Ahead) to pass forecast weather.
     # Shape: { weather: "Rain", temp: 8 } (temp optional)
-    if isinstance(data, dict) and (data.get("weather") or data.get("temp") is not None):
+    if data.get("weather") or data.get("temp") is not None:
         weather_override = {
             "weather": data.get("weather"),
             "temp": data.get("temp"),
         }
-    # Always use LLM generation for outfits (AI-first behavior)
-    use_llm = True
 
     # Validate required inputs
     if not lat or not lon:
         print(f"DEBUG: Missing location - lat: {lat}, lon: {lon}")
-        return jsonify({"error": "Missing location"}), 400
+        return None, (jsonify({"error": "Missing location"}), 400)
+
+    # Always use LLM generation for outfits (AI-first behavior), so it must be enabled
+    llm_allowed = os.getenv('USE_LLM_OUTFITS', '').lower() in ('1', 'true', 'yes') or bool(os.getenv('GROQ_API_KEY'))
+    if not llm_allowed:
+        return None, (jsonify({"error": "LLM generation is not enabled on this server"}), 403)
 
     # Refresh wardrobe statuses based on day threshold (so generation uses correct Clean items)
     try:
         user = get_user_by_email(current_user)
         days_until_dirty = user.get('days_until_dirty') if user else None
         if days_until_dirty is not None:
-            refresh_dirty_items_by_days(int(days_until_dirty))
+            refresh_dirty_items_by_days(int(days_until_dirty), current_user)
     except Exception:
         pass
 
-    # Determine whether LLM generation is allowed by environment
-    llm_allowed = os.getenv('USE_LLM_OUTFITS', '').lower() in ('1', 'true', 'yes') or bool(os.getenv('GROQ_API_KEY'))
-    if use_llm and not llm_allowed:
-        return jsonify({"error": "LLM generation is not enabled on this server"}), 403
+    return {
+        "lat": lat,
+        "lon": lon,
+        "occasion": data.get("occasion"),
+        "user_email": current_user,
+        "exclude_ids": data.get("exclude_ids"),
+        "weather_override": weather_override,
+    }, None
+
+
+@outfit_bp.route("/api/get_outfit", methods=["POST"])
+@token_required
+def api_generate_outfit(current_user):
+    """Generate outfit suggestions (blocking; prefer the job API below).
+
+    Expected JSON body: { lat, lon, occasion }
+    Returns JSON result from the model; if missing coords, returns 400.
+    """
+    kwargs, bad = _prepare_outfit_request(request.get_json(), current_user)
+    if bad:
+        return bad
 
     # Call into the business logic (model) to generate outfit suggestions
-    result = generate_outfit(
-        lat,
-        lon,
-        occasion,
-        user_email=current_user,
-        use_llm=use_llm,
-        exclude_ids=exclude_ids,
-        weather_override=weather_override,
-    )
+    result = generate_outfit(use_llm=True, **kwargs)
 
     # If model returns an error, forward appropriate status code for client handling
     if isinstance(result, dict) and 'error' in result:
@@ -199,6 +182,68 @@ def api_generate_outfit(current_user):
     return jsonify(result)
 
 
+# ---------------------------------------------------------
+# OUTFIT JOBS (async generation)
+# ---------------------------------------------------------
+@outfit_bp.route("/api/get_outfit/jobs", methods=["POST"])
+@token_required
+def api_start_outfit_job(current_user):
+    """Queue outfit generation on the background pool and return right away.
+
+    Same JSON body as POST /api/get_outfit. Returns 202 { job_id }; follow the job with
+    GET /api/get_outfit/jobs/<job_id> (polling) or, when `events` is true in the
+    response, .../events (Server-Sent Events).
+    The finished job's `result` is exactly what the synchronous endpoint would return.
+    With `stream: true` in the body, validated outfit entries appear in `progress.items`
+    while the LLM is still writing (best followed over the events stream).
+    """
+    data = request.get_json()
+    kwargs, bad = _prepare_outfit_request(data, current_user)
+    if bad:
+        return bad
+
+    stream = bool(isinstance(data, dict) and data.get("stream"))
+    try:
+        job = job_runner.submit("outfit", run_outfit_job, owner=current_user, stream=stream, **kwargs)
+    except JobQueueFull:
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503
+
+    # `events` tells the client whether the SSE endpoint may be used (see JOB_EVENTS_ENABLED)
+    return jsonify({"job_id": job.id, "events": JOB_EVENTS_ENABLED}), 202
+
+
+@outfit_bp.route("/api/get_outfit/jobs/<job_id>", methods=["GET"])
+@token_required
+def api_outfit_job_status(current_user, job_id):
+    """Return { job_id, status, progress, result, error } for one of the user's outfit jobs."""
+    job = job_runner.get(job_id, owner=current_user)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+
+@outfit_bp.route("/api/get_outfit/jobs/<job_id>/events", methods=["GET"])
+@token_required
+def api_outfit_job_events(current_user, job_id):
+    """Stream job updates as Server-Sent Events (`progress`, then `done` or `error`).
+
+    Disabled (404) unless JOB_EVENTS_ENABLED: the stream holds a request worker until
+    the job finishes, which sync/threaded workers can't afford.
+    """
+    if not JOB_EVENTS_ENABLED:
+        return jsonify({"error": "Event stream disabled, poll the job instead"}), 404
+
+    job = job_runner.get(job_id, owner=current_user)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    return Response(
+        stream_with_context(job_runner.stream(job)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ---------------------------------------------------------
 # SAVE OUTFIT INTO IN-MEMORY MODEL
 # ---------------------------------------------------------
@@ -242,3 +287,24 @@ def save_outfit(current_user):
         pass
 
     return jsonify({"success": True})
+
+
+# ---------------------------------------------------------
+# CACHE / UPSTREAM STATS (diagnostics)
+# ---------------------------------------------------------
+@outfit_bp.route("/api/stats", methods=["GET"])
+@token_required
+def api_stats(current_user):
+    """Return hit rates of the in-process caches and upstream call counters for this worker."""
+    return jsonify({
+        "autocomplete": get_autocomplete_stats(),
+        "reverse_geocode": get_reverse_geocode_stats(),
+        "weather": get_weather_cache_stats(),
+        "forecast": get_forecast_cache_stats(),
+        "plan_weather_refresh": get_plan_weather_refresh_stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "llm_prompt": get_prompt_usage_stats(),
+        "outfit_coalescing": get_outfit_coalescing_stats(),
+        "http": http_client.stats(),
+        "weather_provider": get_weather_provider().name,
+    })
@@ -5,25 +5,31 @@ Routes to support the "Plan Ahead" feature. Endpoints provided:
 - GET /plan_ahead : render UI
 - GET /plan/plans : list plans (archives past plans first)
 - POST /plan/create : create plans for a single date or a date range
+- POST /plan/generate_trip : start a server-side outfit generation job for a date range
+- GET /plan/generate_trip/<job_id> : poll progress/results of a trip generation job
 - POST /plan/update : update allowed plan fields
 - POST /plan/delete : delete a plan
 - POST /plan/delete_group : delete plans by group
 - GET /plan_ahead/api/weather_for_date : fetch forecast for a specific date
+- GET /plan_ahead/api/weather_for_dates : fetch forecast for several dates in one call
 
 This module relies on `model.plan_ahead_model` for persistent operations
-and uses OpenWeather's forecast API to fetch weather for a requested date.
+and on `model.forecast_model` (cached OpenWeather forecast) for weather by date.
 """
 
-from flask import Blueprint, render_template, request, jsonify, current_app
-from datetime import datetime
-import requests
+from flask import Blueprint, render_template, request, jsonify
 import traceback
 
 from utils.auth import token_required
+from utils.jobs import job_runner, JobQueueFull
 from model.plan_ahead_model import (
     serialize_plan, get_all_plans,
     add_plan_range, update_plan, delete_plan, delete_group, archive_past_plans
 )
+from model.plan_trip_model import run_trip_generation, trip_dates, TRIP_MAX_DAYS
+from model.forecast_model import forecast_for_dates
+from model.login_model import get_user_by_email
+from model.wardrobe_model import refresh_dirty_items_by_days
 
 plan_bp = Blueprint("plan", __name__)
 
@@ -51,6 +57,13 @@ def api_plans(current_user):
         traceback.print_exc()
         return jsonify([])
 
+def _weather_source(data):
+    """Where a plan's weather came from: "forecast", "climatology" or "manual"."""
+    if data.get("weather_source") in ("forecast", "climatology", "manual"):
+        return data["weather_source"]
+    # Older clients: weather typed in by the user comes without a temperature
+    return "manual" if data.get("weather") and data.get("temp") is None else "forecast"
+
 @plan_bp.route("/plan/create", methods=["POST"])
 @token_required
 def api_create(current_user):
@@ -74,6 +87,7 @@ def api_create(current_user):
             "weather": data.get("weather", ""),
             "temp": data.get("temp"),
             "description": data.get("description"),
+            "weather_source": _weather_source(data),
             "outfit": []
         }
 
@@ -81,10 +95,77 @@ def api_create(current_user):
         created = add_plan_range(start, end, base, current_user)
         return jsonify([serialize_plan(c) for c in created]), 201
 
-    except Exception as e:
+    except Exception:
         traceback.print_exc()
         return jsonify({"error": "failed"}), 500
 
+@plan_bp.route("/plan/generate_trip", methods=["POST"])
+@token_required
+def api_generate_trip(current_user):
+    """Start one background job that generates and saves outfits for a date range.
+
+    Expected JSON: start, optional end (YYYY-MM-DD), lat, lon, and optional
+    location, occasion, weather (manual override applied to every day).
+    Returns 202 with { job_id } right away; poll GET /plan/generate_trip/<job_id>.
+    """
+    try:
+        data = request.json or {}
+        start = data["start"]
+        end = data.get("end", start)
+
+        if not data.get("lat") or not data.get("lon"):
+            return jsonify({"error": "Missing location"}), 400
+
+        if len(trip_dates(start, end)) > TRIP_MAX_DAYS:
+            return jsonify({"error": f"Trips are limited to {TRIP_MAX_DAYS} days"}), 400
+
+        base = {
+            "location": data.get("location", ""),
+            "lat": data.get("lat"),
+            "lon": data.get("lon"),
+            "occasion": data.get("occasion", "Casual"),
+        }
+
+        # Refresh wardrobe statuses once for the whole trip (same as the single-day API)
+        try:
+            user = get_user_by_email(current_user)
+            days_until_dirty = user.get('days_until_dirty') if user else None
+            if days_until_dirty is not None:
+                refresh_dirty_items_by_days(int(days_until_dirty), current_user)
+        except Exception:
+            pass
+
+        job = job_runner.submit(
+            "plan_trip",
+            run_trip_generation,
+            start,
+            end,
+            base,
+            current_user,
+            weather_override=data.get("weather") or None,
+            owner=current_user,
+        )
+        return jsonify({"job_id": job.id}), 202
+
+    except JobQueueFull:
+        return jsonify({"error": "Server is busy, please try again shortly"}), 503
+
+    except Exception:
+        traceback.print_exc()
+        return jsonify({"error": "failed"}), 500
+
+@plan_bp.route("/plan/generate_trip/<job_id>")
+@token_required
+def api_generate_trip_status(current_user, job_id):
+    """Return status, progress ({ done, total, current, days }) and result of a trip job.
+
+    Any app worker can answer: job state is shared through MongoDB (utils.jobs).
+    """
+    job = job_runner.get(job_id, owner=current_user)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
 @plan_bp.route("/plan/update", methods=["POST"])
 @token_required
 def api_update(current_user):
@@ -101,6 +182,8 @@ def api_update(current_user):
                    "weather", "temp", "description", "outfit"]
 
         update_fields = {k: data[k] for k in allowed if k in data}
+        if "weather" in update_fields:
+            update_fields["weather_source"] = _weather_source(data)
 
         updated = update_plan(pid, current_user, **update_fields)
         return jsonify(serialize_plan(updated))
@@ -142,44 +225,70 @@ def weather_for_date(current_user):
       - lon: longitude
       - date: ISO date string (YYYY-MM-DD)
 
-    This uses OpenWeather 5-day/3-hour forecast and searches for any
-    timestamp matching the requested date. If found, it returns weather,
-    description and temp; otherwise returns 404.
+    Served from the cached 5-day/3-hour forecast for the location (see
+    model.forecast_model). Dates beyond the forecast come from climate normals
+    (`source: "climatology"`). Returns weather, description, temp and source,
+    or 404 if neither covers the date.
     """
     try:
         lat = request.args["lat"]
         lon = request.args["lon"]
         date_str = request.args["date"]
 
-        # Read API key from app configuration
-        key = current_app.config["OPENWEATHER_API_KEY"]
+        result = forecast_for_dates(lat, lon, [date_str])
+        # If the API failed or returned an unexpected shape, signal an error
+        if "error" in result:
+            return jsonify({"error": result["error"]}), 500
 
-        # Forecast endpoint provides multiple 3-hour blocks for several days
-        url = (
-            f"https://api.openweathermap.org/data/2.5/forecast?"
-            f"lat={lat}&lon={lon}&units=metric&appid={key}"
-        )
+        day = result["days"].get(date_str)
+        if day is None:
+            # No forecast slot for the requested date
+            return jsonify({"error": "Weather not available"}), 404
+        return jsonify(day)
 
-        r = requests.get(url).json()
-        # If the API failed or returned an unexpected shape, signal an error
-        if "list" not in r:
-            return jsonify({"error": "Weather unavailable"}), 500
-
-        # Parse requested date to compare against each forecast timestamp
-        target = datetime.strptime(date_str, "%Y-%m-%d").date()
-
-        for e in r["list"]:
-            # `dt_txt` is in format 'YYYY-MM-DD HH:MM:SS'; parse and compare dates
-            dt = datetime.strptime(e["dt_txt"], "%Y-%m-%d %H:%M:%S").date()
-            if dt == target:
-                return jsonify({
-                    "weather": e["weather"][0]["main"],
-                    "description": e["weather"][0]["description"],
-                    "temp": e["main"]["temp"]
-                })
-
-        # No matching timestamp found for requested date
-        return jsonify({"error": "Weather not available"}), 404
+    except Exception:
+        traceback.print_exc()
+        return jsonify({"error": "failed"}), 500
+
+
+@plan_bp.route("/plan_ahead/api/weather_for_dates")
+@token_required
+def weather_for_dates(current_user):
+    """Return forecasted weather for several dates from one forecast fetch.
+
+    Query params:
+      - lat, lon: coordinates
+      - dates: comma-separated YYYY-MM-DD dates, or
+      - start and optional end: an inclusive date range
+
+    Response: { issued_at, days: { "YYYY-MM-DD": {weather, description, temp, source} | null } }
+    (source is "forecast" or "climatology"; null means no weather is known for that date).
+    """
+    try:
+        lat = request.args.get("lat")
+        lon = request.args.get("lon")
+        if not lat or not lon:
+            return jsonify({"error": "Missing location"}), 400
+
+        if request.args.get("dates"):
+            dates = [d.strip() for d in request.args["dates"].split(",") if d.strip()]
+        elif request.args.get("start"):
+            start = request.args["start"]
+            dates = trip_dates(start, request.args.get("end", start))
+        else:
+            return jsonify({"error": "Missing dates"}), 400
+
+        if len(dates) > TRIP_MAX_DAYS:
+            return jsonify({"error": f"At most {TRIP_MAX_DAYS} dates per request"}), 400
+
+        try:
+            result = forecast_for_dates(lat, lon, dates)
+        except ValueError:
+            return jsonify({"error": "Dates must be YYYY-MM-DD"}), 400
+
+        if "error" in result:
+            return jsonify({"error": result["error"]}), 500
+        return jsonify(result)
 
     except Exception:
         traceback.print_exc()
@@ -2,7 +2,8 @@
 // static/get_outfit.js — Client-side behavior for the Get Outfit page
 // ======================================================
 // Purpose: handle location autocomplete, optional browser geolocation,
-// outfit generation via server API, preview rendering, and saving to history.
+// outfit generation via the server job API (see outfit_jobs.js), preview rendering,
+// and saving to history.
 // Key ideas:
 // - Autocomplete is debounced (250ms) to avoid excessive API calls while typing.
 // - All fetch calls include `{ credentials: "include" }` so server-side session/JWT cookies
@@ -60,6 +61,42 @@ function formatOutfitItemTitle(item) {
 }
 
 
+// Build the preview row for one outfit item (string or { name, color, icon, role, category }).
+function renderOutfitItem(item) {
+    const div = document.createElement("div");
+    div.className = "outfit-item d-flex align-items-center gap-3 p-2";
+
+    if (typeof item === 'string') {
+        div.textContent = item;
+    } else {
+        const icon = document.createElement('div');
+        icon.className = 'outfit-item-icon fs-3';
+        icon.textContent = item.icon || '👗';
+
+        const info = document.createElement('div');
+        info.className = 'outfit-item-info';
+
+        const name = document.createElement('div');
+        name.className = 'fw-semibold';
+        name.textContent = formatOutfitItemTitle(item);
+
+        const meta = document.createElement('div');
+        meta.className = 'text-muted small';
+        const parts = [];
+        if (item.role) parts.push(item.role);
+        if (item.category) parts.push(item.category);
+        meta.textContent = parts.join(' • ');
+
+        info.appendChild(name);
+        info.appendChild(meta);
+        div.appendChild(icon);
+        div.appendChild(info);
+    }
+
+    return div;
+}
+
+
 // ======================================================
 // FETCH AND DISPLAY WEATHER
 // ======================================================
@@ -243,34 +280,27 @@ generateBtn.addEventListener("click", async () => {
     console.log("lat:", selectedLat, "lon:", selectedLon, "occasion:", occasion);
 
     try {
-        // Add a 45-second timeout (longer than backend's 30s, but catches hanging requests)
-        const controller = new AbortController();
-        const timeoutId = setTimeout(() => controller.abort(), 45000);
-
-        const response = await fetch("/get_outfit/api/get_outfit", {
-            method: "POST",
-            credentials: "include", // important to include auth cookies/session
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(payload),
-            signal: controller.signal
+        // Queue the generation as a background job and poll it (or follow its SSE
+        // stream where the server enables one) so no server worker is held while the LLM runs.
+        // Items are streamed in as the AI picks them (progress.items); the final result
+        // replaces them and adds the explanation.
+        payload.stream = true;
+        let shownItems = 0;
+        const data = await requestOutfit(payload, {
+            onProgress: job => {
+                const items = (job.progress && job.progress.items) || [];
+                if (items.length <= shownItems) return;
+                spinner.classList.add("d-none");
+                items.slice(shownItems).forEach(item => previewBox.appendChild(renderOutfitItem(item)));
+                shownItems = items.length;
+            }
         });
 
-        clearTimeout(timeoutId);
-        
-        let data;
-        try {
-            data = await response.json();
-        } catch (parseErr) {
-            console.error("Failed to parse JSON response:", parseErr);
-            throw new Error("Invalid response from server");
-        }
-        
-        console.log("Response status:", response.status);
         console.log("Outfit data received:", data);
-        
-        // Check if response has an error (even if status is 200)
-        if (!response.ok || data.error) {
-            throw new Error(data.error || `HTTP ${response.status}: ${response.statusText}`);
+
+        // Check if the result is an error
+        if (data.error) {
+            throw new Error(data.error);
         }
         
         // Stop spinner after response received
@@ -343,39 +373,7 @@ generateBtn.addEventListener("click", async () => {
             }
         }
 
-        (data.outfit || []).forEach(item => {
-            const div = document.createElement("div");
-            div.className = "outfit-item d-flex align-items-center gap-3 p-2";
-
-            if (typeof item === 'string') {
-                div.textContent = item;
-            } else {
-                const icon = document.createElement('div');
-                icon.className = 'outfit-item-icon fs-3';
-                icon.textContent = item.icon || '👗';
-
-                const info = document.createElement('div');
-                info.className = 'outfit-item-info';
-
-                const name = document.createElement('div');
-                name.className = 'fw-semibold';
-                name.textContent = formatOutfitItemTitle(item);
-
-                const meta = document.createElement('div');
-                meta.className = 'text-muted small';
-                const parts = [];
-                if (item.role) parts.push(item.role);
-                if (item.category) parts.push(item.category);
-                meta.textContent = parts.join(' • ');
-
-                info.appendChild(name);
-                info.appendChild(meta);
-                div.appendChild(icon);
-                div.appendChild(info);
-            }
-
-            previewBox.appendChild(div);
-        });
+        (data.outfit || []).forEach(item => previewBox.appendChild(renderOutfitItem(item)));
 
         // Save the relevant metadata locally so the Like button can save it later
         lastGenerated = {
@@ -410,7 +408,7 @@ generateBtn.addEventListener("click", async () => {
         const err = document.createElement('div');
         err.className = 'alert alert-danger outfit-alert';
         
-        if (error.name === 'AbortError') {
+        if (error.name === 'TimeoutError') {
             err.textContent = 'Request took too long. The AI server is slow right now. Please try again in a moment.';
         } else {
             err.textContent = `Error: ${error.message || 'Failed to generate outfit'}`;
@@ -0,0 +1,103 @@
+// ======================================================
+// static/outfit_jobs.js — Shared helper for async outfit generation
+// ======================================================
+// Purpose: request an outfit without holding a server worker for the whole LLM call.
+// Flow:
+// - POST /get_outfit/api/get_outfit/jobs queues generation and returns { job_id, events } at once.
+// - The job is polled at /jobs/<id> by default. Only when the server reports `events: true`
+//   (JOB_EVENTS_ENABLED, async/gevent workers) and the browser supports EventSource is it
+//   followed over Server-Sent Events (/jobs/<id>/events), falling back to polling if the
+//   stream drops.
+// - Resolves with the same JSON the old /get_outfit/api/get_outfit endpoint returned:
+//     { outfit, weather, temp, ... } on success or { error, ... } on failure.
+// Used by get_outfit.js and plan_ahead.js (include this script before them).
+
+const OUTFIT_JOB_POLL_MS = 1000;
+const OUTFIT_JOB_TIMEOUT_MS = 120000;
+
+function outfitJobTimeoutError() {
+    const err = new Error("Request took too long");
+    err.name = "TimeoutError";
+    return err;
+}
+
+// Follow a job via SSE; resolves with the final job state, or null if streaming isn't usable.
+// Rejects with a TimeoutError at `deadline`. The EventSource is closed on every exit path,
+// otherwise it would keep reconnecting in the background.
+function followOutfitJobEvents(jobId, onProgress, deadline) {
+    if (typeof EventSource === "undefined") return Promise.resolve(null);
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`/get_outfit/api/get_outfit/jobs/${jobId}/events`, { withCredentials: true });
+        const timer = setTimeout(() => {
+            source.close();
+            reject(outfitJobTimeoutError());
+        }, Math.max(0, deadline - Date.now()));
+        const finish = (job) => {
+            clearTimeout(timer);
+            source.close();
+            resolve(job);
+        };
+        const parse = (data) => {
+            try {
+                return JSON.parse(data);
+            } catch (err) {
+                return null;  // malformed event: fall back to polling
+            }
+        };
+
+        source.addEventListener("progress", e => {
+            const job = parse(e.data);
+            if (job && onProgress) onProgress(job);
+        });
+        source.addEventListener("done", e => finish(parse(e.data)));
+        source.addEventListener("error", e => {
+            // A server-sent "error" event carries the job state; a bare error means
+            // the connection failed, so the caller falls back to polling.
+            finish(e && e.data ? parse(e.data) : null);
+        });
+    });
+}
+
+// Poll a job until it finishes; resolves with the final job state.
+async function pollOutfitJob(jobId, onProgress, deadline) {
+    while (Date.now() < deadline) {
+        const res = await fetch(`/get_outfit/api/get_outfit/jobs/${jobId}`, { credentials: "include" });
+        const job = await res.json();
+        if (!res.ok) return { status: "error", error: job.error || `HTTP ${res.status}` };
+        if (job.status === "done" || job.status === "error") return job;
+        if (onProgress) onProgress(job);
+        await new Promise(r => setTimeout(r, OUTFIT_JOB_POLL_MS));
+    }
+    throw outfitJobTimeoutError();
+}
+
+// Queue an outfit generation and wait for its result.
+// `payload` is the usual { lat, lon, occasion, weather?, temp?, exclude_ids? } body.
+async function requestOutfit(payload, { onProgress = null, timeoutMs = OUTFIT_JOB_TIMEOUT_MS } = {}) {
+    const deadline = Date.now() + timeoutMs;
+
+    const startRes = await fetch("/get_outfit/api/get_outfit/jobs", {
+        method: "POST",
+        credentials: "include",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(payload)
+    });
+    const started = await startRes.json();
+    if (!startRes.ok || !started.job_id) {
+        return { error: started.error || `HTTP ${startRes.status}: ${startRes.statusText}` };
+    }
+
+    let job = null;
+    if (started.events) {
+        job = await followOutfitJobEvents(started.job_id, onProgress, deadline);
+    }
+    if (!job) {
+        job = await pollOutfitJob(started.job_id, onProgress, deadline);
+    }
+
+    if (job.status === "error") {
+        return { error: job.error || "Failed to generate outfit" };
+    }
+    return job.result || { error: "Failed to generate outfit" };
+}
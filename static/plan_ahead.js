@@ -141,6 +141,14 @@ function formatOutfitItemLabel(item) {
     return `${icon ? icon + " " : ""}${color}${name}`.trim();
 }
 
+// "Clouds (12°C)"; climate-average weather (dates past the 5-day forecast) is labelled
+// as such until the background refresh replaces it with a real forecast.
+function formatPlanWeather(p) {
+    const source = p.weatherSource || p.weather_source;
+    const base = `${p.weather}${p.temp ? ` (${p.temp}°C)` : ""}`;
+    return source === "climatology" ? `${base} · typical for the season` : base;
+}
+
 function renderOutfitPreview(outfit, errorMessage) {
     if (errorMessage) {
         return `<div class="alert alert-danger w-100">${escapeHtml(errorMessage)}</div>`;
@@ -272,18 +280,14 @@ async function regenerateMultiDayWithOccasion(dateStr, slideElement) {
     const excludeIds = mergeExcludeIds(prevIds, otherIds);
     excludeIdsByDate[dateStr] = excludeIds;
 
-    const makeReq = (ids) => fetch("/get_outfit/api/get_outfit", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-            lat: p.lat,
-            lon: p.lon,
-            occasion: chosenOccasion,
-            weather: p.weather,
-            temp: p.temp,
-            exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
-        })
-    }).then(r => r.json());
+    const makeReq = (ids) => requestOutfit({
+        lat: p.lat,
+        lon: p.lon,
+        occasion: chosenOccasion,
+        weather: p.weather,
+        temp: p.temp,
+        exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
+    });
 
     // Try with cross-day exclusions; if too restrictive, fall back to just prevIds,
     // then to no exclusions (allows repeats when wardrobe is limited).
@@ -626,9 +630,27 @@ generateBtn.addEventListener("click", () => {
 /* ============================================================
    GET WEATHER
 ============================================================ */
+// Forecasts for the selected location: all selected dates are fetched in one request
+// (the server reuses a single cached forecast) and kept for a few minutes.
+const WEATHER_MEMO_MS = 10 * 60 * 1000;
+let weatherMemo = { key: null, fetchedAt: 0, days: {} };
+
 async function getWeatherFor(dateStr) {
-    const res = await fetch(`/plan_ahead/api/weather_for_date?lat=${selectedLat}&lon=${selectedLon}&date=${dateStr}`);
-    return await res.json();
+    const key = `${selectedLat},${selectedLon}`;
+    const fresh = weatherMemo.key === key && (Date.now() - weatherMemo.fetchedAt) < WEATHER_MEMO_MS;
+
+    if (!fresh || !(dateStr in weatherMemo.days)) {
+        const dates = Array.from(new Set([...(selectedDates || []), dateStr]));
+        const res = await fetch(`/plan_ahead/api/weather_for_dates?lat=${selectedLat}&lon=${selectedLon}&dates=${dates.join(",")}`);
+        const data = await res.json();
+        if (!res.ok || data.error) {
+            return { error: data.error || "Weather unavailable" };
+        }
+        if (!fresh) weatherMemo = { key, fetchedAt: Date.now(), days: {} };
+        Object.assign(weatherMemo.days, data.days || {});
+    }
+
+    return weatherMemo.days[dateStr] || { error: "Weather not available" };
 }
 
 /* ============================================================
@@ -670,7 +692,7 @@ async function generateSingleDay(excludeIds) {
         let weatherData;
 
         if (weatherInput.value) {
-            weatherData = { weather: weatherInput.value, temp: null, description: null };
+            weatherData = { weather: weatherInput.value, temp: null, description: null, source: "manual" };
         } else {
             weatherData = await getWeatherFor(date);
         }
@@ -690,22 +712,19 @@ async function generateSingleDay(excludeIds) {
             return;
         }
 
-        const outfitData = await fetch("/get_outfit/api/get_outfit", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-                lat: selectedLat,
-                lon: selectedLon,
-                occasion: p.occasion,
-                weather: weatherData.weather,
-                temp: weatherData.temp,
-                exclude_ids: Array.isArray(excludeIds) && excludeIds.length ? excludeIds : undefined
-            })
-        }).then(r => r.json());
+        const outfitData = await requestOutfit({
+            lat: selectedLat,
+            lon: selectedLon,
+            occasion: p.occasion,
+            weather: weatherData.weather,
+            temp: weatherData.temp,
+            exclude_ids: Array.isArray(excludeIds) && excludeIds.length ? excludeIds : undefined
+        });
 
     p.weather = weatherData.weather;
     p.temp = weatherData.temp;
     p.description = weatherData.description;
+    p.weatherSource = weatherData.source;
     p.tempOutfit = outfitData.outfit || [];
     p.outfitError = outfitData.error || null;
 
@@ -746,7 +765,7 @@ function showGeneratedSingle(dateStr) {
     document.querySelector(".sd-location").textContent = p.location;
     document.querySelector(".sd-occasion").textContent = p.occasion;
     document.querySelector(".sd-weather").textContent =
-        `${p.weather}${p.temp ? ` (${p.temp}°C)` : ""}`;
+        formatPlanWeather(p);
 
     document.querySelector(".sd-outfit").innerHTML =
         renderOutfitPreview(p.tempOutfit, p.outfitError);
@@ -801,7 +820,7 @@ function openSavedSingleDay(dateStr) {
     document.querySelector(".sd-location").textContent = p.location;
     document.querySelector(".sd-occasion").textContent = p.occasion;
     document.querySelector(".sd-weather").textContent =
-        `${p.weather}${p.temp ? ` (${p.temp}°C)` : ""}`;
+        formatPlanWeather(p);
 
     document.querySelector(".sd-outfit").innerHTML =
         renderOutfitPreview(p.outfit, null);
@@ -908,98 +927,80 @@ async function generateMultiDay() {
 
     const results = {};
     const occasion = occasionInput.value;
-    const usedAcrossDays = new Set();
 
-    // Helper function to add delay between API calls to avoid rate limiting
+    // Helper used while polling the trip job
     const delay = (ms) => new Promise(resolve => setTimeout(resolve, ms));
 
-    // For each day in the slider, attempt to obtain weather and then an outfit.
-    for (let i = 0; i < sliderDates.length; i++) {
-        const d = sliderDates[i];
-        
-        // Add delay between days (except for the first day) to avoid rate limiting
-        if (i > 0) {
-            await delay(8000); // 8 second delay to stay under rate limits
-        }
-
-        let weatherData;
+    // The server generates the whole range in one job: it fetches the forecast once,
+    // avoids reusing items across days, waits out Groq rate limits itself, and saves
+    // each day as soon as it is ready. We only start the job and poll its progress.
+    const spinnerText = loadingSpinner ? loadingSpinner.querySelector("p") : null;
+    let job = null;
 
-        // Allow manual weather override for all generated days
-        if (weatherInput.value) {
-            weatherData = { weather: weatherInput.value, temp: null, description: null };
-        } else {
-            weatherData = await getWeatherFor(d);
+    try {
+        const startRes = await fetch("/plan/generate_trip", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                start: sliderDates[0],
+                end: sliderDates[sliderDates.length - 1],
+                location: locationInput.value,
+                lat: selectedLat,
+                lon: selectedLon,
+                occasion,
+                weather: weatherInput.value || undefined
+            })
+        });
+        const started = await startRes.json();
+        if (!startRes.ok || !started.job_id) {
+            throw new Error(started.error || "Failed to start trip generation");
         }
 
-        let outfit = [];
-        let missing = false;
-        let outfitError = null;
+        while (true) {
+            await delay(1500);
+            const pollRes = await fetch(`/plan/generate_trip/${started.job_id}`);
+            job = await pollRes.json();
+            if (!pollRes.ok) {
+                throw new Error(job.error || "Trip generation failed");
+            }
 
-        // If the weather API couldn't provide a forecast for this date, mark it missing
-        if (weatherData.error) {
-            missing = true;
-        } else {
-            // Call outfit-generation endpoint with lat/lon and the chosen weather
-            const makeReq = async (ids, retryCount = 0) => {
-                try {
-                    const response = await fetch("/get_outfit/api/get_outfit", {
-                        method: "POST",
-                        headers: { "Content-Type": "application/json" },
-                        body: JSON.stringify({
-                            lat: selectedLat,
-                            lon: selectedLon,
-                            occasion,
-                            weather: weatherData.weather,
-                            temp: weatherData.temp,
-                            exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
-                        })
-                    });
-                    const data = await response.json();
-                    
-                    // If we hit rate limit, retry after delay
-                    if (data.error && data.error.includes("rate limit") && retryCount < 3) {
-                        await delay(10000); // Wait 10 seconds before retry
-                        return makeReq(ids, retryCount + 1);
-                    }
-                    
-                    return data;
-                } catch (err) {
-                    console.error("Error generating outfit:", err);
-                    return { error: "Failed to generate outfit. Please try again." };
-                }
-            };
+            const progress = job.progress || {};
+            if (spinnerText && progress.total) {
+                spinnerText.textContent = `Generating outfits… (${progress.done || 0}/${progress.total} days)`;
+            }
 
-            // First try: avoid reusing items already used on earlier days.
-            const excludeIds = Array.from(usedAcrossDays);
-            let outfitData = await makeReq(excludeIds);
+            if (job.status === "done" || job.status === "error") break;
+        }
+    } catch (err) {
+        console.error("Error generating trip:", err);
+        job = { status: "error", error: err.message };
+    }
 
-            // If the exclusion makes it impossible, fall back to allowing repeats.
-            if (outfitData?.error && !outfitData.error.includes("rate limit") && excludeIds.length) {
-                await delay(2000); // Small delay between attempts
-                outfitData = await makeReq([]);
-            }
+    const days = (job && job.result && Array.isArray(job.result.days))
+        ? job.result.days
+        : ((job && job.progress && job.progress.days) || []);
+    const jobError = (job && job.status === "error")
+        ? (job.error || "Failed to generate outfit. Please try again.")
+        : null;
 
-            outfit = outfitData.outfit || [];
-            outfitError = outfitData.error || null;
+    days.forEach(day => {
+        results[day.date] = day;
+    });
 
-            // Track used items only when we successfully generated an outfit.
-            if (!outfitError) {
-                for (const id of getNumericOutfitIds(outfit)) {
-                    usedAcrossDays.add(id);
-                }
-            }
+    sliderDates.forEach(d => {
+        // Days the job never reached (e.g. it failed midway) show the job error.
+        if (!results[d]) {
+            results[d] = {
+                missingWeather: false,
+                weather: null,
+                temp: null,
+                description: null,
+                outfit: [],
+                outfitError: jobError || "Failed to generate outfit. Please try again.",
+                plan: null
+            };
         }
-
-        // Store results for later building of tempPlans and slider
-        results[d] = {
-            missingWeather: missing,
-            weather: weatherData.weather,
-            temp: weatherData.temp,
-            description: weatherData.description,
-            outfit,
-            outfitError
-        };
-    }
+    });
 
     sliderDates.forEach(date => {
         const r = results[date];
@@ -1013,19 +1014,26 @@ async function generateMultiDay() {
             weather: r.weather,
             temp: r.temp,
             description: r.description,
+            weatherSource: r.weatherSource,
             tempOutfit: r.outfit,
             outfitError: r.outfitError,
             missingWeather: r.missingWeather,
-            id: null,
+            // Days the job already saved keep their plan id, so Like only updates them.
+            id: r.plan ? r.plan.id : null,
         };
 
         // Seed per-date exclude cache for later Dislike/regenerate.
         excludeIdsByDate[date] = getNumericOutfitIds(r.outfit);
     });
 
+    if (spinnerText) spinnerText.textContent = "Generating outfits…";
+
     setMultiDayLoading(false);
     buildSlider();
     openSliderOn(sliderDates[0]);
+
+    // Saved days now exist on the server; refresh the calendar highlighting.
+    loadSavedPlans();
 }
 
 /* ============================================================
@@ -1097,7 +1105,7 @@ function buildSlider() {
             <p><b>Location:</b> ${p.location}</p>
             <p><b>Occasion:</b> ${p.occasion}</p>
             ${(!p.outfitError && Array.isArray(p.tempOutfit) && p.tempOutfit.length > 0)
-                ? `<p><b>Weather:</b> ${p.weather}${p.temp ? ` (${p.temp}°C)` : ""}</p>`
+                ? `<p><b>Weather:</b> ${formatPlanWeather(p)}</p>`
                 : ""}
             <div class="outfit-preview justify-content-center ${flashClass}">
                 ${renderOutfitPreview(p.tempOutfit, p.outfitError)}
@@ -1171,18 +1179,14 @@ async function regenerateMissing(dateStr, slideElement) {
     const excludeIds = mergeExcludeIds(prevIds, otherIds);
     excludeIdsByDate[dateStr] = excludeIds;
 
-    const makeReq = (ids) => fetch("/get_outfit/api/get_outfit", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-            lat: p.lat,
-            lon: p.lon,
-            occasion: p.occasion,
-            weather: chosen,
-            temp: null,
-            exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
-        })
-    }).then(r => r.json());
+    const makeReq = (ids) => requestOutfit({
+        lat: p.lat,
+        lon: p.lon,
+        occasion: p.occasion,
+        weather: chosen,
+        temp: null,
+        exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
+    });
 
     let outfitData = await makeReq(excludeIds);
     if (outfitData?.error && otherIds.length) {
@@ -1194,6 +1198,7 @@ async function regenerateMissing(dateStr, slideElement) {
 
     // ✅ Update TEMP plan only
     p.weather = chosen;
+    p.weatherSource = "manual";
     p.tempOutfit = outfitData.outfit || [];
     p.outfitError = outfitData.error || null;
     p.missingWeather = false;
@@ -1234,18 +1239,14 @@ async function regenerateMultiDayOne(dateStr, slideElement) {
     const excludeIds = mergeExcludeIds(prevIds, otherIds);
     excludeIdsByDate[dateStr] = excludeIds;
 
-    const makeReq = (ids) => fetch("/get_outfit/api/get_outfit", {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-            lat: p.lat,
-            lon: p.lon,
-            occasion: p.occasion,
-            weather: p.weather,
-            temp: p.temp,
-            exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
-        })
-    }).then(r => r.json());
+    const makeReq = (ids) => requestOutfit({
+        lat: p.lat,
+        lon: p.lon,
+        occasion: p.occasion,
+        weather: p.weather,
+        temp: p.temp,
+        exclude_ids: Array.isArray(ids) && ids.length ? ids : undefined
+    });
 
     let outfitData = await makeReq(excludeIds);
     if (outfitData?.error && otherIds.length) {
@@ -1402,7 +1403,8 @@ async function saveFinalOutfit(dateStr) {
                 occasion: p.occasion,
                 weather: p.weather,
                 temp: p.temp,
-                description: p.description
+                description: p.description,
+                weather_source: p.weatherSource
             })
         });
 
@@ -0,0 +1,61 @@
+"""
+test_indexes.py
+
+Every hot model query (utils.indexes.MODEL_QUERIES) must be served by an index,
+so a new query shape without a matching index fails CI instead of turning into a
+collection scan in production.
+
+Needs a running MongoDB at MONGO_URI; skipped when none is reachable. Uses throwaway
+databases (styleforecast_test / styleforecast_laundry_test) unless DATABASE_NAME /
+LAUNDRY_DATABASE_NAME are set.
+
+    MONGO_URI=mongodb://localhost:27017 python -m pytest tests
+"""
+
+import os
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_URI = os.getenv("MONGO_URI")
+
+
+def _server_reachable() -> bool:
+    if not MONGO_URI:
+        return False
+    try:
+        MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000).admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not _server_reachable(), reason="no MongoDB reachable at MONGO_URI")
+
+
+@pytest.fixture(scope="module")
+def indexes():
+    # utils.db connects on import, so pick the test databases first
+    os.environ.setdefault("DATABASE_NAME", "styleforecast_test")
+    os.environ.setdefault("LAUNDRY_DATABASE_NAME", "styleforecast_laundry_test")
+    from utils import indexes
+
+    result = indexes.ensure_indexes()
+    errors = {k: v for k, v in result.items() if isinstance(v, str)}
+    assert not errors, f"index creation failed: {errors}"
+    return indexes
+
+
+def test_declared_indexes_exist(indexes):
+    missing = {k: r["missing"] for k, r in indexes.report_indexes().items() if r["missing"]}
+    assert not missing, f"declared indexes missing after ensure_indexes(): {missing}"
+
+
+def test_model_queries_use_an_index(indexes):
+    scans = [
+        f"{used_by} ({key}): {' > '.join(reversed(stages))}"
+        for used_by, key, stages, uses_index in indexes.explain_queries()
+        if not uses_index
+    ]
+    assert not scans, "collection scans:\n" + "\n".join(scans)
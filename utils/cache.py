@@ -0,0 +1,84 @@
+### Small in-process cache with a time-to-live and a bounded LRU size.
+## Used to avoid repeating expensive upstream calls (LLM, weather, geocoding).
+## Entries can carry a tag (e.g. the user's email) so all entries for that tag
+## can be dropped at once when the underlying data changes.
+
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel returned by get() on a miss, so cached falsy values still count as hits
+MISS = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl` seconds after being stored.
+
+    When more than `maxsize` entries are stored, the least recently used entry is evicted.
+    A `maxsize` or `ttl` of 0 disables the cache (every get() is a miss).
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._data = OrderedDict()  # key -> (expires_at, tag, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key, default=MISS):
+        """Return the cached value for `key`, or `default` if missing/expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, tag=None, ttl: float = None):
+        """Store `value` under `key`; optional `tag` groups entries for invalidation."""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else float(ttl))
+        with self._lock:
+            self._data[key] = (expires_at, tag, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_tag(self, tag) -> int:
+        """Drop every entry stored with `tag`; returns how many were removed."""
+        with self._lock:
+            keys = [k for k, (_, t, _) in self._data.items() if t == tag]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
@@ -0,0 +1,250 @@
+### Gridded monthly climate normals for dates beyond the forecast horizon.
+## A CLIMATE_GRID_DEG grid of cells, each with 12 monthly records (min/max temperature,
+## dominant condition, wet days), stored as a fixed-size binary file that is memory-mapped:
+## a lookup is one offset computation and a 4-byte read, no network involved.
+##
+## The bundled table is a coarse approximation generated from a simple latitude/season
+## model (no continentality, altitude or ocean currents), good enough for "pack a warm
+## jacket" but not a substitute for a real forecast. For better values, import real normals
+## (e.g. exported from WorldClim/CRU) as CSV: lat,lon,month,tmin,tmax[,condition[,wet_days]]
+##
+## Build (or rebuild):   python -m utils.climate_normals build [normals.csv]
+## Try a lookup:         python -m utils.climate_normals query 48.2 16.37 12
+
+import calendar
+import csv
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Compiled normals; rebuilt automatically when missing (or older than CLIMATE_NORMALS_CSV)
+CLIMATE_NORMALS_PATH = os.getenv("CLIMATE_NORMALS_PATH", os.path.join(_DATA_DIR, "climate_normals.bin"))
+# Optional CSV of real normals; cells it doesn't cover use the built-in approximation
+CLIMATE_NORMALS_CSV = os.getenv("CLIMATE_NORMALS_CSV", "")
+CLIMATE_GRID_DEG = float(os.getenv("CLIMATE_GRID_DEG", "2.5"))
+# Set to 0 to answer far-future dates with "not available" instead
+CLIMATE_FALLBACK_ENABLED = os.getenv("CLIMATE_FALLBACK_ENABLED", "1").lower() in ("1", "true", "yes")
+
+# File layout:
+#   header  : magic (8 bytes), step (float32), lat rows (uint16), lon columns (uint16),
+#             source (uint8: 0 = approximation only, 1 = includes imported normals)
+#   records : for each lat row (south -> north), lon column (west -> east), month (1..12):
+#             tmin (int8 °C), tmax (int8 °C), condition (uint8, index into CONDITIONS),
+#             wet days (uint8)
+_MAGIC = b"SFCLIM1\0"
+_HEADER = struct.Struct("<8sfHHB")
+_RECORD = struct.Struct("<bbBB")
+
+CONDITIONS = ["Clear", "Clouds", "Rain", "Snow", "Drizzle", "Thunderstorm", "Mist"]
+_DESCRIPTIONS = {
+    "Clear": "mostly clear (typical for the season)",
+    "Clouds": "often cloudy (typical for the season)",
+    "Rain": "rainy season (typical for the season)",
+    "Snow": "snow likely (typical for the season)",
+    "Drizzle": "frequent drizzle (typical for the season)",
+    "Thunderstorm": "frequent thunderstorms (typical for the season)",
+    "Mist": "often misty (typical for the season)",
+}
+
+
+def _approx_normals(lat: float, month: int):
+    """
+    Rough monthly normals for a latitude: (tmin, tmax, condition, wet_days).
+
+    Annual mean falls off with latitude, the seasonal swing grows with it (peak in
+    July up north, January down south) and the dominant condition follows the
+    broad climate belts (wet tropics, dry subtropics, cloudy mid-latitudes).
+    """
+    a = abs(lat)
+    summer = math.cos(2 * math.pi * (month - 7) / 12.0)
+    if lat < 0:
+        summer = -summer  # southern hemisphere: seasons flipped
+
+    mean = 27.0 - 0.0065 * a * a + 0.2 * a * summer
+    dry_belt = 15.0 <= a < 35.0
+    diurnal = 12.0 if dry_belt else 8.0
+
+    if mean <= -2.0 and a >= 35.0:
+        condition, wet_days = "Snow", 10
+    elif a < 10.0:
+        condition, wet_days = "Rain", 16
+    elif a < 25.0:
+        # Monsoon-style summer rains, dry otherwise
+        condition, wet_days = ("Rain", 14) if summer > 0.3 else ("Clear", 3)
+    elif a < 35.0:
+        condition, wet_days = ("Clear", 3) if summer > 0 else ("Clouds", 7)
+    elif a < 60.0:
+        condition, wet_days = ("Clear", 9) if summer > 0.5 else ("Clouds", 12)
+    else:
+        condition, wet_days = "Clouds", 12
+
+    tmin = round(mean - diurnal / 2)
+    tmax = round(mean + diurnal / 2)
+    return tmin, tmax, condition, wet_days
+
+
+def _grid_shape(step: float):
+    return int(round(180.0 / step)), int(round(360.0 / step))
+
+
+def _cell(lat: float, lon: float, step: float, rows: int, cols: int):
+    i = min(rows - 1, max(0, int((lat + 90.0) // step)))
+    j = int(((lon + 180.0) % 360.0) // step) % cols
+    return i, j
+
+
+def _read_csv(csv_path, step, rows, cols):
+    """Average CSV rows into {(i, j, month): (tmin, tmax, condition, wet_days)}."""
+    acc = {}
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon, month = float(row["lat"]), float(row["lon"]), int(row["month"])
+                tmin, tmax = float(row["tmin"]), float(row["tmax"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not 1 <= month <= 12:
+                continue
+            i, j = _cell(lat, lon, step, rows, cols)
+            a = acc.setdefault((i, j, month), {"n": 0, "tmin": 0.0, "tmax": 0.0, "wet": 0.0, "cond": {}})
+            a["n"] += 1
+            a["tmin"] += tmin
+            a["tmax"] += tmax
+            a["wet"] += float(row.get("wet_days") or 0)
+            cond = (row.get("condition") or "").strip()
+            if cond in CONDITIONS:
+                a["cond"][cond] = a["cond"].get(cond, 0) + 1
+
+    out = {}
+    for key, a in acc.items():
+        fallback = _approx_normals(-90.0 + (key[0] + 0.5) * step, key[2])
+        out[key] = (
+            round(a["tmin"] / a["n"]),
+            round(a["tmax"] / a["n"]),
+            max(a["cond"], key=a["cond"].get) if a["cond"] else fallback[2],
+            round(a["wet"] / a["n"]) if a["wet"] else fallback[3],
+        )
+    return out
+
+
+def build_normals(path: str = CLIMATE_NORMALS_PATH, csv_path: str = None, step: float = CLIMATE_GRID_DEG) -> int:
+    """Write the normals file at `path`; returns the number of cells."""
+    rows, cols = _grid_shape(step)
+    imported = _read_csv(csv_path, step, rows, cols) if csv_path else {}
+
+    # The approximation only depends on latitude, so compute each row's 12 months once
+    body = bytearray()
+    for i in range(rows):
+        lat = -90.0 + (i + 0.5) * step
+        row_months = [_approx_normals(lat, m) for m in range(1, 13)]
+        for j in range(cols):
+            for m in range(1, 13):
+                tmin, tmax, cond, wet = imported.get((i, j, m)) or row_months[m - 1]
+                body += _RECORD.pack(
+                    max(-128, min(127, tmin)), max(-128, min(127, tmax)),
+                    CONDITIONS.index(cond), max(0, min(31, wet)),
+                )
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, step, rows, cols, 1 if imported else 0))
+        f.write(body)
+    os.replace(tmp_path, path)
+    return rows * cols
+
+
+class ClimateNormals:
+    """Read-only, memory-mapped normals grid (shared between threads)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.step, self.rows, self.cols, source = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a climate normals file")
+        self.imported = bool(source)
+
+    def lookup(self, lat, lon, month: int):
+        """(tmin, tmax, condition, wet_days) for the cell containing lat/lon in `month`."""
+        i, j = _cell(float(lat), float(lon), self.step, self.rows, self.cols)
+        off = _HEADER.size + ((i * self.cols + j) * 12 + (int(month) - 1)) * _RECORD.size
+        tmin, tmax, cond, wet = _RECORD.unpack_from(self._mm, off)
+        return tmin, tmax, CONDITIONS[cond], wet
+
+    def for_date(self, lat, lon, date_str: str):
+        """
+        Typical weather for a YYYY-MM-DD date, in the same shape as a forecast day,
+        labelled `source: "climatology"` so callers can replace it with a real forecast later.
+        """
+        year, month = int(date_str[0:4]), int(date_str[5:7])
+        tmin, tmax, cond, wet = self.lookup(lat, lon, month)
+        return {
+            "weather": cond,
+            "description": _DESCRIPTIONS.get(cond, "typical for the season"),
+            # Daytime-ish temperature, like the forecast's daytime-weighted `temp`
+            "temp": round(tmin + 0.65 * (tmax - tmin), 1),
+            "temp_min": float(tmin),
+            "temp_max": float(tmax),
+            "pop": round(wet / calendar.monthrange(year, month)[1], 2),
+            "source": "climatology",
+            "approximate": not self.imported,
+        }
+
+
+_normals = None
+_normals_lock = threading.Lock()
+_normals_failed = False
+
+
+def get_climate_normals():
+    """
+    Return the shared ClimateNormals, building the file on first use if it is missing
+    or stale. Returns None when the fallback is disabled or the file can't be built.
+    """
+    global _normals, _normals_failed
+    if not CLIMATE_FALLBACK_ENABLED or _normals_failed:
+        return None
+    if _normals is not None:
+        return _normals
+
+    with _normals_lock:
+        if _normals is not None or _normals_failed:
+            return _normals
+        try:
+            path = CLIMATE_NORMALS_PATH
+            csv_path = CLIMATE_NORMALS_CSV or None
+            stale = (
+                not os.path.exists(path)
+                or (csv_path and os.path.exists(csv_path) and os.path.getmtime(path) < os.path.getmtime(csv_path))
+            )
+            if stale:
+                try:
+                    build_normals(path, csv_path)
+                except OSError:
+                    # Read-only deployment: build next to other temp files instead
+                    path = os.path.join(tempfile.gettempdir(), "styleforecast_climate_normals.bin")
+                    build_normals(path, csv_path)
+                print(f"🌍 Built climate normals at {path}")
+            _normals = ClimateNormals(path)
+        except Exception as e:
+            print(f"⚠️ Climate normals unavailable, far-future dates get no weather: {e}")
+            _normals_failed = True
+        return _normals
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        csv_arg = sys.argv[2] if len(sys.argv) > 2 else (CLIMATE_NORMALS_CSV or None)
+        print(f"{build_normals(CLIMATE_NORMALS_PATH, csv_arg)} cells written to {CLIMATE_NORMALS_PATH}")
+    elif len(sys.argv) >= 5 and sys.argv[1] == "query":
+        normals = get_climate_normals()
+        print(normals.lookup(float(sys.argv[2]), float(sys.argv[3]), int(sys.argv[4])) if normals else None)
+    else:
+        print("usage: python -m utils.climate_normals build [normals.csv] | query <lat> <lon> <month>")
@@ -0,0 +1,100 @@
+### Atomic auto-increment IDs backed by a `counters` collection.
+## Each counter is one document { _id: <name>, seq: <last id handed out> }. Allocation is a
+## single find_one_and_update($inc), so concurrent inserts can never get the same id and no
+## sorted "find the current max" query is needed per insert. Bulk paths reserve a whole block
+## of ids in the same single round trip (reserve_ids(name, n)).
+##
+## Migration: counters are seeded from the existing maximum of each collection with $max
+## (idempotent, safe to run while the app is serving):
+##   python -m utils.counters seed
+## The app also seeds a counter lazily the first time this process uses it, so a forgotten
+## migration can't hand out ids that already exist.
+
+import sys
+import threading
+
+from pymongo import ReturnDocument
+
+from utils.db import db
+
+counters = db["counters"]
+
+# Counter name -> (collection, numeric id field) it allocates for
+COUNTERS = {
+    "wardrobe_items": ("wardrobe_items", "id"),
+    "outfit_history": ("outfit_history", "id"),
+    "plans": ("plans", "id"),
+    "plan_groups": ("plans", "group_id"),
+    "users": ("users", "id"),
+}
+
+_seeded = set()
+_seed_lock = threading.Lock()
+
+
+def _current_max(name: str) -> int:
+    collection, field = COUNTERS[name]
+    last = db[collection].find_one({field: {"$type": "number"}}, sort=[(field, -1)], projection={field: 1})
+    return int(last[field]) if last else 0
+
+
+def seed_counter(name: str) -> int:
+    """Raise counter `name` to at least the collection's current max id; returns the counter value."""
+    doc = counters.find_one_and_update(
+        {"_id": name},
+        {"$max": {"seq": _current_max(name)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return int(doc["seq"])
+
+
+def _ensure_seeded(name: str):
+    if name in _seeded:
+        return
+    with _seed_lock:
+        if name in _seeded:
+            return
+        if name in COUNTERS:
+            seed_counter(name)
+        _seeded.add(name)
+
+
+def reserve_ids(name: str, count: int) -> range:
+    """
+    Reserve `count` consecutive ids from counter `name` in one round trip.
+
+    Returns range(first, last + 1). Ids of a block that end up unused are simply skipped
+    (gaps are fine, duplicates are not).
+    """
+    count = int(count)
+    if count <= 0:
+        return range(0)
+    _ensure_seeded(name)
+    doc = counters.find_one_and_update(
+        {"_id": name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    last = int(doc["seq"])
+    return range(last - count + 1, last + 1)
+
+
+def next_id(name: str) -> int:
+    """Allocate a single id from counter `name`."""
+    return reserve_ids(name, 1)[0]
+
+
+def seed_all_counters() -> dict:
+    """Migration: seed every known counter from the existing data."""
+    return {name: seed_counter(name) for name in COUNTERS}
+
+
+# This makes the migration runnable with: python -m utils.counters seed
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "seed":
+        for counter, value in seed_all_counters().items():
+            print(f"✅ counter {counter}: {value}")
+    else:
+        print("usage: python -m utils.counters seed")
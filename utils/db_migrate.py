@@ -0,0 +1,128 @@
+### Data migrations for existing MongoDB documents.
+## Every migration is idempotent (it only touches documents that still need it), so the
+## app runs them in the background at startup and they can also be run by hand:
+##   python -m utils.db_migrate
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+from utils.counters import seed_all_counters
+from utils.db import db
+
+# Set to 0 to skip running migrations at startup
+MONGO_AUTO_MIGRATE = os.getenv("MONGO_AUTO_MIGRATE", "1").lower() in ("1", "true", "yes")
+
+# Completed migrations: { _id: <name>, done_at }. Code that depends on a backfill asks
+# is_migration_done() and keeps a fallback until it returns True.
+migrations_col = db["migrations"]
+WARDROBE_KEYS = "wardrobe_keys"
+
+# How often (seconds) a process re-checks a migration that wasn't done yet
+MIGRATION_RECHECK_SECONDS = float(os.getenv("MIGRATION_RECHECK_SECONDS", "30"))
+
+_done = set()
+_checked_at = {}
+_done_lock = threading.Lock()
+
+
+def mark_migration_done(name: str):
+    migrations_col.update_one({"_id": name}, {"$set": {"done_at": datetime.utcnow()}}, upsert=True)
+    with _done_lock:
+        _done.add(name)
+
+
+def is_migration_done(name: str) -> bool:
+    """True once migration `name` has completed (cached; re-checked every MIGRATION_RECHECK_SECONDS)."""
+    with _done_lock:
+        if name in _done:
+            return True
+        if time.monotonic() - _checked_at.get(name, -MIGRATION_RECHECK_SECONDS) < MIGRATION_RECHECK_SECONDS:
+            return False
+        _checked_at[name] = time.monotonic()
+    try:
+        done = migrations_col.find_one({"_id": name}, {"_id": 1}) is not None
+    except PyMongoError:
+        return False
+    if done:
+        with _done_lock:
+            _done.add(name)
+    return done
+
+
+# Fill wardrobe_items.status_key / category_key (lower-cased, trimmed copies of
+# status / category) on items created before those fields existed.
+## Runs as one server-side pipeline update instead of reading every document.
+def backfill_wardrobe_keys():
+    col = db["wardrobe_items"]
+
+    def normalized(field):
+        return {"$toLower": {"$trim": {"input": {"$toString": {"$ifNull": [f"${field}", ""]}}}}}
+
+    missing = {"$or": [{"status_key": {"$exists": False}}, {"category_key": {"$exists": False}}]}
+    result = col.update_many(
+        missing,
+        [{"$set": {"status_key": normalized("status"), "category_key": normalized("category")}}],
+    )
+    print(f"✅ wardrobe_items keys: backfilled {result.modified_count}")
+    # New items always get their keys, so once nothing is missing the filters can drop
+    # their fallback for legacy documents (see wardrobe_model._key_filter)
+    if col.count_documents(missing, limit=1) == 0:
+        mark_migration_done(WARDROBE_KEYS)
+    return result.modified_count
+
+
+# Set plans.weather_source on plans created before it existed, so the background weather
+# refresh (model.plan_weather_model) knows which ones it may update.
+## Same rule as the plan routes use for older clients: weather without a temperature
+## was typed in by hand ("manual"), anything else came from the forecast.
+def backfill_plan_weather_source():
+    col = db["plans"]
+    typed_by_hand = {"$and": [
+        {"$gt": [{"$ifNull": ["$weather", ""]}, ""]},
+        {"$eq": [{"$ifNull": ["$temp", None]}, None]},
+    ]}
+
+    result = col.update_many(
+        {"weather_source": {"$exists": False}},
+        [{"$set": {"weather_source": {"$cond": [typed_by_hand, "manual", "forecast"]}}}],
+    )
+    print(f"✅ plans weather_source: backfilled {result.modified_count}")
+    return result.modified_count
+
+
+# Raise the auto-increment counters to the current maximum ids (see utils.counters)
+def seed_counters():
+    values = seed_all_counters()
+    print(f"✅ counters: {values}")
+    return values
+
+
+def main():
+# Run all migrations in order
+    seed_counters()
+    backfill_wardrobe_keys()
+    backfill_plan_weather_source()
+    print("🎉 Done! Migrations applied.")
+
+
+def migrate_in_background():
+    """Run main() once on a daemon thread (no-op if MONGO_AUTO_MIGRATE=0)."""
+    if not MONGO_AUTO_MIGRATE:
+        return
+
+    def _run():
+        try:
+            main()
+        except PyMongoError as e:
+            print(f"⚠️ Migrations skipped: {e}")
+
+    threading.Thread(target=_run, name="db-migrate", daemon=True).start()
+
+
+# This makes the script runnable with: python -m utils.db_migrate
+if __name__ == "__main__":
+    main()
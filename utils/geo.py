@@ -0,0 +1,64 @@
+### Small coordinate helpers (grid snapping, geohash) shared by the weather and geocoding caches.
+
+import os
+
+# Grid size (degrees) used to bucket nearby coordinates; 0.05° is roughly 5 km
+WEATHER_GRID_DEG = float(os.getenv("WEATHER_GRID_DEG", "0.05"))
+
+
+def snap_coords(lat, lon, grid: float = WEATHER_GRID_DEG):
+    """
+    Snap lat/lon to the nearest point of a `grid`-degree grid so nearby users share cache entries.
+
+    Returns (lat, lon) as floats, or (None, None) if the input isn't numeric.
+    A grid of 0 (or less) leaves the coordinates unchanged apart from float conversion.
+    """
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (TypeError, ValueError):
+        return None, None
+    if grid <= 0:
+        return lat, lon
+    # The outer round() trims float noise such as 51.550000000000004
+    return round(round(lat / grid) * grid, 6), round(round(lon / grid) * grid, 6)
+
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(lat, lon, precision: int = 6) -> str:
+    """
+    Standard geohash of a point ('u4pruy' style). Each extra character narrows the cell
+    (precision 5 ~ 4.9 km, 6 ~ 1.2 km x 0.6 km, 7 ~ 150 m). Returns '' for invalid input.
+    """
+    try:
+        lat = float(lat)
+        lon = float(lon)
+    except (TypeError, ValueError):
+        return ""
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return ""
+
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    out = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash interleaves bits starting with longitude
+    while len(out) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            out.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(out)
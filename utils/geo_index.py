@@ -0,0 +1,218 @@
+### Offline place-name index for location autocomplete.
+## The bundled GeoNames-style dataset (data/places.tsv) is compiled into a compact,
+## sorted binary file that is memory-mapped and searched with a binary search, so a
+## prefix query costs a few key comparisons instead of an HTTP round trip.
+## Results are ranked by population. Queries the index can't answer go upstream.
+##
+## Build (or rebuild after editing the TSV):  python -m utils.geo_index build
+## Try a query:                               python -m utils.geo_index query "vie"
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import unicodedata
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+# Source dataset: name, asciiname, admin1, country, lat, lon, population (tab-separated)
+GEO_PLACES_TSV = os.getenv("GEO_PLACES_TSV", os.path.join(_DATA_DIR, "places.tsv"))
+# Compiled index; rebuilt automatically when missing or older than the TSV
+GEO_INDEX_PATH = os.getenv("GEO_INDEX_PATH", os.path.join(_DATA_DIR, "places.idx"))
+# Set to 0 to always use the upstream geocoder
+GEO_INDEX_ENABLED = os.getenv("GEO_INDEX_ENABLED", "1").lower() in ("1", "true", "yes")
+
+# File layout:
+#   header   : magic (8 bytes) + record count (uint32)
+#   offsets  : one uint32 per record, pointing at the record
+#   records  : lat (float32), lon (float32), population (uint32), key length (uint16),
+#              label length (uint16), key bytes, label bytes   -- sorted by key
+_MAGIC = b"SFGEO1\n\0"
+_HEADER = struct.Struct("<8sI")
+_OFFSET = struct.Struct("<I")
+_RECORD = struct.Struct("<ffIHH")
+
+# Upper bound on records inspected for one (very short) prefix
+_MAX_SCAN = 5000
+
+
+def normalize(text) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace ('São Paulo' -> 'sao paulo')."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = "".join(c if c.isalnum() else " " for c in text.lower())
+    return " ".join(text.split())
+
+
+def _read_places(tsv_path):
+    """Yield (name, asciiname, admin1, country, lat, lon, population) from the dataset."""
+    with open(tsv_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 7:
+                continue
+            name, asciiname, admin1, country, lat, lon, population = cols[:7]
+            try:
+                yield name, asciiname, admin1, country, float(lat), float(lon), int(population or 0)
+            except ValueError:
+                continue
+
+
+def build_index(tsv_path: str = GEO_PLACES_TSV, idx_path: str = GEO_INDEX_PATH) -> int:
+    """Compile the TSV into the binary index at `idx_path`; returns the number of records."""
+    records = []
+    for name, asciiname, admin1, country, lat, lon, population in _read_places(tsv_path):
+        label = name + (f", {admin1}" if admin1 else "") + f", {country}"
+        # Index the native and ASCII spellings so 'sao' and 'são' both match
+        for key in {normalize(name), normalize(asciiname)}:
+            if key:
+                records.append((key.encode("utf-8"), label.encode("utf-8"), lat, lon, population))
+
+    # Sorted by key; equal keys keep the most populous first
+    records.sort(key=lambda r: (r[0], -r[4]))
+
+    offsets = []
+    body = bytearray()
+    base = _HEADER.size + _OFFSET.size * len(records)
+    for key, label, lat, lon, population in records:
+        offsets.append(base + len(body))
+        body += _RECORD.pack(lat, lon, min(population, 0xFFFFFFFF), len(key), len(label))
+        body += key + label
+
+    tmp_path = idx_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(records)))
+        for off in offsets:
+            f.write(_OFFSET.pack(off))
+        f.write(body)
+    os.replace(tmp_path, idx_path)
+    return len(records)
+
+
+class PlaceIndex:
+    """Read-only view over a compiled index file (memory-mapped, shared between threads)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a place index")
+
+    def _offset(self, i: int) -> int:
+        return _OFFSET.unpack_from(self._mm, _HEADER.size + _OFFSET.size * i)[0]
+
+    def _key(self, i: int) -> bytes:
+        off = self._offset(i)
+        key_len = _RECORD.unpack_from(self._mm, off)[3]
+        start = off + _RECORD.size
+        return self._mm[start:start + key_len]
+
+    def _record(self, i: int):
+        off = self._offset(i)
+        lat, lon, population, key_len, label_len = _RECORD.unpack_from(self._mm, off)
+        start = off + _RECORD.size + key_len
+        label = self._mm[start:start + label_len].decode("utf-8")
+        return label, lat, lon, population
+
+    def _lower_bound(self, prefix: bytes) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def search(self, query: str, limit: int = 5):
+        """
+        Places whose name starts with `query`, most populous first, as [{label, lat, lon}].
+
+        Text after a comma narrows the match by region/country ('springfield, mi' or
+        'paris, fr'): every extra part must be a prefix of one of the label's other parts.
+        """
+        parts = [normalize(p) for p in str(query or "").split(",")]
+        prefix = parts[0] if parts else ""
+        filters = [p for p in parts[1:] if p]
+        if not prefix:
+            return []
+
+        prefix_b = prefix.encode("utf-8")
+        matches = {}
+        i = self._lower_bound(prefix_b)
+        end = min(self.count, i + _MAX_SCAN)
+        while i < end and self._key(i).startswith(prefix_b):
+            label, lat, lon, population = self._record(i)
+            i += 1
+            if label in matches:
+                continue
+            if filters:
+                rest = [normalize(p) for p in label.split(",")[1:]]
+                if not all(any(r.startswith(f) for r in rest) for f in filters):
+                    continue
+            matches[label] = (population, lat, lon)
+
+        ranked = sorted(matches.items(), key=lambda kv: -kv[1][0])[:limit]
+        return [
+            {"label": label, "lat": round(lat, 4), "lon": round(lon, 4)}
+            for label, (_, lat, lon) in ranked
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+_index_failed = False
+
+
+def get_place_index():
+    """
+    Return the shared PlaceIndex, building it from the TSV on first use if it is missing
+    or stale. Returns None when disabled or when the dataset isn't available.
+    """
+    global _index, _index_failed
+    if not GEO_INDEX_ENABLED or _index_failed:
+        return None
+    if _index is not None:
+        return _index
+
+    with _index_lock:
+        if _index is not None or _index_failed:
+            return _index
+        try:
+            path = GEO_INDEX_PATH
+            stale = (
+                not os.path.exists(path)
+                or (os.path.exists(GEO_PLACES_TSV) and os.path.getmtime(path) < os.path.getmtime(GEO_PLACES_TSV))
+            )
+            if stale:
+                try:
+                    build_index(GEO_PLACES_TSV, path)
+                except OSError:
+                    # Read-only deployment: build next to other temp files instead
+                    path = os.path.join(tempfile.gettempdir(), "styleforecast_places.idx")
+                    build_index(GEO_PLACES_TSV, path)
+                print(f"🗺️ Built place index at {path}")
+            _index = PlaceIndex(path)
+        except Exception as e:
+            print(f"⚠️ Place index unavailable, using upstream geocoder only: {e}")
+            _index_failed = True
+        return _index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        tsv = sys.argv[2] if len(sys.argv) > 2 else GEO_PLACES_TSV
+        idx = sys.argv[3] if len(sys.argv) > 3 else GEO_INDEX_PATH
+        print(f"{build_index(tsv, idx)} records written to {idx}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "query":
+        index = get_place_index()
+        for place in (index.search(" ".join(sys.argv[2:])) if index else []):
+            print(place)
+    else:
+        print("usage: python -m utils.geo_index build [places.tsv] [places.idx] | query <text>")
@@ -0,0 +1,137 @@
+### Shared outbound HTTP client for all third-party API calls (Groq, OpenWeather).
+## One requests.Session is reused for the whole process so TCP/TLS connections stay
+## open (keep-alive) between calls instead of being re-created for every request.
+## Pool sizes, timeouts and retries are configurable through environment variables.
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Number of distinct hosts whose connection pools are kept alive
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+# Max open connections kept per host
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Default timeouts (seconds); callers may override the read timeout per call
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+# Retries for connection errors and 502/503/504 on idempotent (GET) requests
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+
+
+class HttpClient:
+    """
+    Thin wrapper around a pooled requests.Session.
+
+    - get()/post() behave like requests.get()/requests.post()
+    - a (connect, read) timeout is always applied
+    - per-host latency and connection-reuse counters are kept for stats()
+    """
+
+    def __init__(self):
+        retry = Retry(
+            total=HTTP_RETRIES,
+            connect=HTTP_RETRIES,
+            read=HTTP_RETRIES,
+            status=HTTP_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            # POSTs to the LLM cost tokens and are not safe to replay blindly
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self._adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._stats = {}  # host -> counters
+
+    def _timeout(self, timeout):
+        # Accept None (defaults), a single read timeout, or a full (connect, read) tuple
+        if timeout is None:
+            return (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        if isinstance(timeout, (tuple, list)):
+            return tuple(timeout)
+        return (HTTP_CONNECT_TIMEOUT, float(timeout))
+
+    def request(self, method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        ok = False
+        try:
+            res = self.session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+            ok = True
+            return res
+        finally:
+            self._record(host, (time.perf_counter() - started) * 1000.0, ok)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def _record(self, host: str, elapsed_ms: float, ok: bool):
+        with self._lock:
+            s = self._stats.setdefault(host, {
+                "requests": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+            })
+            s["requests"] += 1
+            if not ok:
+                s["errors"] += 1
+            s["total_ms"] += elapsed_ms
+            s["max_ms"] = max(s["max_ms"], elapsed_ms)
+
+    def _pool_counters(self):
+        # urllib3 keeps one pool per (scheme, host, port); each pool counts how many
+        # connections it opened and how many requests it served over them.
+        counters = {}
+        pools = getattr(self._adapter.poolmanager, "pools", None)
+        if pools is None:
+            return counters
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            c = counters.setdefault(host, {"connections_opened": 0, "pool_requests": 0})
+            c["connections_opened"] += getattr(pool, "num_connections", 0)
+            c["pool_requests"] += getattr(pool, "num_requests", 0)
+        return counters
+
+    def stats(self) -> dict:
+        """Per-host request counts, latency (avg/max ms) and connection reuse."""
+        pools = self._pool_counters()
+        out = {}
+        with self._lock:
+            for host, s in self._stats.items():
+                p = pools.get(host, {"connections_opened": 0, "pool_requests": 0})
+                reused = max(0, p["pool_requests"] - p["connections_opened"])
+                out[host] = {
+                    "requests": s["requests"],
+                    "errors": s["errors"],
+                    "avg_ms": round(s["total_ms"] / s["requests"], 1) if s["requests"] else 0.0,
+                    "max_ms": round(s["max_ms"], 1),
+                    "connections_opened": p["connections_opened"],
+                    "connections_reused": reused,
+                    "reuse_rate": round(reused / p["pool_requests"], 3) if p["pool_requests"] else 0.0,
+                }
+        return out
+
+
+# Process-wide client; import this instead of calling requests.get/post directly
+http_client = HttpClient()
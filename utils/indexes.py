@@ -0,0 +1,217 @@
+### MongoDB index declarations for every collection the models query.
+## Indexes are created idempotently at startup (in a background thread, so a slow or
+## unreachable database never blocks boot) and can be managed from the command line:
+##
+##   python -m utils.indexes ensure    create every declared index (no-op if present)
+##   python -m utils.indexes report    declared-but-missing, undeclared and unused indexes
+##   python -m utils.indexes explain   run explain() on each model query and flag collection scans
+##
+## When a model gains a new query shape, add its index here and a sample to MODEL_QUERIES.
+
+import os
+import sys
+import threading
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.db import db, laundry_db
+
+# Set to 0 to skip index creation at startup (e.g. when a DBA manages indexes)
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "1").lower() in ("1", "true", "yes")
+
+_DATABASES = {"main": db, "laundry": laundry_db}
+
+# (database, collection) -> indexes. Compound indexes lead with user_email because almost
+# every request is scoped to the logged-in user; cross-user jobs get their own indexes.
+INDEXES = {
+    ("main", "users"): [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", DESCENDING)], name="id"),
+    ],
+    ("main", "wardrobe_items"): [
+        IndexModel([("user_email", ASCENDING), ("id", DESCENDING)], name="user_id"),
+        IndexModel([("user_email", ASCENDING), ("status_key", ASCENDING), ("last_worn_at", ASCENDING)],
+                   name="user_status_key_last_worn"),
+        IndexModel([("user_email", ASCENDING), ("category_key", ASCENDING)], name="user_category_key"),
+        IndexModel([("id", DESCENDING)], name="id"),
+        # refresh_dirty_items_by_days without a user (all users)
+        IndexModel([("status_key", ASCENDING), ("last_worn_at", ASCENDING)], name="status_key_last_worn"),
+    ],
+    ("main", "plans"): [
+        IndexModel([("user_email", ASCENDING), ("date", ASCENDING)], name="user_date"),
+        IndexModel([("id", DESCENDING)], name="id"),
+        IndexModel([("group_id", DESCENDING)], name="group_id"),
+        # Background weather refresh: plans of all users inside the forecast window
+        IndexModel([("date", ASCENDING)], name="date"),
+    ],
+    ("main", "outfit_history"): [
+        IndexModel([("user_email", ASCENDING), ("id", DESCENDING)], name="user_id"),
+        IndexModel([("id", DESCENDING)], name="id"),
+    ],
+    ("main", "accessories"): [
+        IndexModel([("user_email", ASCENDING), ("_id", DESCENDING)], name="user_newest"),
+    ],
+    ("main", "geocode_cache"): [
+        # Mongo deletes cache documents once expires_at has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    ("main", "jobs"): [
+        # Background job state shared between app workers (utils.jobs); expires when stale
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    ("main", "lookup_categories"): [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    ("main", "lookup_genders"): [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+    ],
+    ("laundry", "dirty_items"): [
+        IndexModel([("item_id", ASCENDING)], name="item_id_unique", unique=True),
+    ],
+}
+
+# Representative query per model function: (database, collection, filter, sort, used by)
+MODEL_QUERIES = [
+    ("main", "users", {"email": "a@b.c"}, None, "login_model.get_user_by_email"),
+    ("main", "users", {"id": {"$type": "number"}}, [("id", -1)], "counters.seed_counter (users)"),
+    ("main", "wardrobe_items", {"user_email": "a@b.c"}, [("id", -1)], "wardrobe_model.get_all_items"),
+    ("main", "wardrobe_items", {"id": 1, "user_email": "a@b.c"}, None, "wardrobe_model.get_item_by_id"),
+    ("main", "wardrobe_items", {"user_email": "a@b.c", "status_key": "needs wash"},
+     None, "wardrobe_model.get_items_by_filter (status)"),
+    ("main", "wardrobe_items", {"user_email": "a@b.c", "category_key": "casual"},
+     None, "wardrobe_model.get_items_by_filter (category)"),
+    ("main", "wardrobe_items", {"status_key": "clean", "last_worn_at": {"$lte": datetime(2030, 1, 1)}},
+     None, "wardrobe_model.refresh_dirty_items_by_days (all users)"),
+    ("main", "wardrobe_items", {"status_key": "clean", "last_worn_at": {"$lte": datetime(2030, 1, 1)},
+                                "user_email": "a@b.c"}, None, "wardrobe_model.refresh_dirty_items_by_days"),
+    ("main", "wardrobe_items", {"id": {"$type": "number"}}, [("id", -1)], "counters.seed_counter (wardrobe_items)"),
+    ("main", "plans", {"user_email": "a@b.c"}, None, "plan_ahead_model.get_all_plans"),
+    ("main", "plans", {"date": "2030-01-01", "user_email": "a@b.c"}, None, "plan_ahead_model.get_plans_for_date"),
+    ("main", "plans", {"id": 1, "user_email": "a@b.c"}, None, "plan_ahead_model.get_plan_by_id"),
+    ("main", "plans", {"group_id": 1, "user_email": "a@b.c"}, None, "plan_ahead_model.delete_group"),
+    ("main", "plans", {"group_id": {"$type": "number"}}, [("group_id", -1)], "counters.seed_counter (plan_groups)"),
+    ("main", "plans", {"date": {"$lt": "2030-01-01"}, "user_email": "a@b.c"}, None,
+     "plan_ahead_model.archive_past_plans"),
+    ("main", "plans", {"date": {"$gte": "2030-01-01", "$lte": "2030-01-06"}, "lat": {"$ne": None},
+                       "weather_source": {"$in": ["forecast", "climatology"]}}, None,
+     "plan_weather_model.refresh_plan_weather"),
+    ("main", "outfit_history", {"user_email": "a@b.c"}, [("id", -1)], "outfit_history_model.get_all_history"),
+    ("main", "outfit_history", {"id": 1, "user_email": "a@b.c"}, None, "outfit_history_model.delete_history_entry"),
+    ("main", "accessories", {"user_email": "a@b.c"}, [("_id", -1)], "accessories_model.get_all_accessories"),
+    ("laundry", "dirty_items", {"item_id": 1}, None, "wardrobe_model (laundry upserts)"),
+]
+
+
+def _collection(db_key, name):
+    return _DATABASES[db_key][name]
+
+
+def ensure_indexes(verbose: bool = False) -> dict:
+    """
+    Create every declared index. Existing identical indexes are a no-op on the server.
+
+    Returns { "db.collection": [created index names] | "error: ..." }; one failing
+    collection (e.g. duplicates blocking a unique index) doesn't stop the others.
+    """
+    result = {}
+    for (db_key, name), models in INDEXES.items():
+        key = f"{db_key}.{name}"
+        try:
+            result[key] = _collection(db_key, name).create_indexes(models)
+        except OperationFailure as e:
+            result[key] = f"error: {e}"
+            print(f"⚠️ Could not create indexes on {key}: {e}")
+        if verbose:
+            print(f"{key}: {result[key]}")
+    return result
+
+
+def ensure_indexes_in_background():
+    """Run ensure_indexes() once on a daemon thread (no-op if MONGO_ENSURE_INDEXES=0)."""
+    if not MONGO_ENSURE_INDEXES:
+        return
+
+    def _run():
+        try:
+            ensure_indexes()
+            print("🗂️ MongoDB indexes ensured")
+        except PyMongoError as e:
+            print(f"⚠️ Index bootstrap skipped: {e}")
+
+    threading.Thread(target=_run, name="ensure-indexes", daemon=True).start()
+
+
+def report_indexes() -> dict:
+    """
+    Compare declared and existing indexes per collection.
+
+    Returns { "db.collection": {missing, undeclared, unused} }. `unused` lists indexes
+    with no recorded accesses since the server started ($indexStats).
+    """
+    report = {}
+    for (db_key, name), models in INDEXES.items():
+        col = _collection(db_key, name)
+        declared = {m.document["name"] for m in models}
+        existing = set(col.index_information().keys()) - {"_id_"}
+        try:
+            usage = {s["name"]: s["accesses"]["ops"] for s in col.aggregate([{"$indexStats": {}}])}
+        except OperationFailure:
+            usage = {}  # not supported / not permitted on this deployment
+        report[f"{db_key}.{name}"] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared),
+            "unused": sorted(n for n, ops in usage.items() if ops == 0 and n != "_id_"),
+        }
+    return report
+
+
+def _plan_stages(plan):
+    """All stage names in an explain() plan tree."""
+    stages = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        for child_key in ("inputStage", "queryPlan"):
+            if child_key in node:
+                stack.append(node[child_key])
+        stack.extend(node.get("inputStages", []))
+    return stages
+
+
+def explain_queries():
+    """
+    explain() every entry of MODEL_QUERIES. Returns a list of
+    (used_by, "db.collection", stages, uses_index) tuples.
+    """
+    out = []
+    for db_key, name, filter_, sort, used_by in MODEL_QUERIES:
+        cursor = _collection(db_key, name).find(filter_)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(1).explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(plan)
+        out.append((used_by, f"{db_key}.{name}", stages, "COLLSCAN" not in stages))
+    return out
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "ensure":
+        ensure_indexes(verbose=True)
+    elif cmd == "report":
+        for key, r in report_indexes().items():
+            print(f"{key}: missing={r['missing']} undeclared={r['undeclared']} unused={r['unused']}")
+    elif cmd == "explain":
+        scans = 0
+        for used_by, key, stages, uses_index in explain_queries():
+            scans += 0 if uses_index else 1
+            print(f"{'OK  ' if uses_index else 'SCAN'} {key:28} {used_by}  [{' > '.join(reversed(stages))}]")
+        sys.exit(1 if scans else 0)
+    else:
+        print("usage: python -m utils.indexes ensure | report | explain")
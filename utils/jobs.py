@@ -0,0 +1,268 @@
+### Background job registry for long-running work (outfit and multi-day trip generation).
+## Jobs run on a bounded thread pool so Flask workers can return immediately;
+## clients poll the job by id (the default) or, when JOB_EVENTS_ENABLED is set, follow
+## it as a Server-Sent Events stream.
+##
+## Job state (status, progress, result) is mirrored into the `jobs` collection keyed by
+## job id, so a poll that lands on another app worker than the one running the job still
+## finds it. Finished jobs expire through a TTL index (declared in utils.indexes).
+
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson.errors import InvalidDocument
+from pymongo.errors import PyMongoError
+
+from utils.db import db
+
+# How many jobs may run at the same time in this process
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+
+# Finished jobs are kept this long (seconds) so clients can still fetch the result
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "900"))
+
+# Max jobs waiting or running at once; beyond this, submit() refuses new work
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "32"))
+
+# An SSE stream keeps its request worker busy until the job finishes, which only pays off
+# on async/green-thread workers (e.g. gunicorn -k gevent). On sync/threaded workers leave
+# this off and clients poll instead.
+JOB_EVENTS_ENABLED = os.getenv("JOB_EVENTS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+# How often (seconds) an SSE stream re-reads a job that runs in another worker
+JOB_STORE_POLL_SECONDS = float(os.getenv("JOB_STORE_POLL_SECONDS", "1"))
+
+# Shared job state, readable from every app worker
+jobs_col = db["jobs"]
+
+
+class JobQueueFull(Exception):
+    """Raised by JobRunner.submit() when too many jobs are already pending."""
+
+
+class Job:
+    """
+    State of a single background job.
+
+    `progress` and `result` are plain dicts so they can be returned as JSON.
+    The worker function updates them through `update()`, which is thread-safe.
+    """
+
+    def __init__(self, kind: str, owner: str = None, ttl_seconds: int = JOB_TTL_SECONDS):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = "queued"  # queued -> running -> done | error
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.version = 0  # bumped on every update so listeners can wait for changes
+        self.local = True  # False for a job read back from the store (runs in another worker)
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @classmethod
+    def from_doc(cls, doc: dict):
+        """Read-only snapshot of a job stored by another worker."""
+        job = cls(doc.get("kind"), doc.get("owner"))
+        job.id = doc["_id"]
+        job.status = doc.get("status", "queued")
+        job.progress = doc.get("progress") or {}
+        job.result = doc.get("result")
+        job.error = doc.get("error")
+        job.version = doc.get("version", 0)
+        job.local = False
+        return job
+
+    def _save(self, doc: dict):
+        """Write the job state to the shared store; a failing store only costs cross-worker lookups."""
+        doc["expires_at"] = datetime.utcnow() + timedelta(seconds=self._ttl)
+        try:
+            jobs_col.update_one({"_id": self.id}, {"$set": doc}, upsert=True)
+        except (PyMongoError, InvalidDocument) as e:
+            print(f"⚠️ Could not store job {self.id}: {e}")
+
+    def update(self, status: str = None, progress: dict = None, result=None, error: str = None):
+        with self._lock:
+            if status is not None:
+                self.status = status
+            if progress:
+                self.progress.update(progress)
+            if result is not None:
+                self.result = result
+            if error is not None:
+                self.error = error
+            self.updated_at = time.time()
+            self.version += 1
+            doc = self._doc()
+            self._changed.notify_all()
+        self._save(doc)
+
+    def _doc(self) -> dict:
+        # Caller holds self._lock
+        return {
+            "kind": self.kind,
+            "owner": self.owner,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "version": self.version,
+        }
+
+    def wait_for_change(self, since_version: int, timeout: float = 15.0) -> int:
+        """Block until the job changes after `since_version` (or timeout); return the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != since_version, timeout=timeout)
+            return self.version
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobRunner:
+    """Submit callables as background jobs and look them up by id."""
+
+    def __init__(self, max_workers: int = JOB_MAX_WORKERS, ttl_seconds: int = JOB_TTL_SECONDS,
+                 max_pending: int = JOB_MAX_PENDING):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ttl = ttl_seconds
+        self._max_pending = max_pending
+
+    def submit(self, kind: str, fn, *args, owner: str = None, **kwargs) -> Job:
+        """
+        Queue `fn(job, *args, **kwargs)` on the pool and return the Job.
+
+        The return value of `fn` becomes `job.result`; an exception marks the job as failed.
+        Raises JobQueueFull when JOB_MAX_PENDING jobs are already queued or running.
+        """
+        self._prune()
+        job = Job(kind, owner, self._ttl)
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if not j.finished)
+            if pending >= self._max_pending:
+                raise JobQueueFull(f"{pending} jobs already pending")
+            self._jobs[job.id] = job
+
+        # Stored before the id goes back to the client, so any worker can answer its first poll
+        with job._lock:
+            doc = job._doc()
+        job._save(doc)
+
+        def _run():
+            job.update(status="running")
+            try:
+                result = fn(job, *args, **kwargs)
+                job.update(status="done", result=result)
+            except Exception as e:
+                traceback.print_exc()
+                job.update(status="error", error=str(e))
+
+        self._executor.submit(_run)
+        return job
+
+    def get(self, job_id: str, owner: str = None):
+        """
+        Return the job if it exists and belongs to `owner` (when given).
+
+        Jobs running in this process are returned live; others are read from the
+        shared store as a snapshot (job.local is False).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        if job is None:
+            return None
+        if owner is not None and job.owner != owner:
+            return None
+        return job
+
+    def stream(self, job: Job, heartbeat: float = 15.0):
+        """
+        Yield Server-Sent Events for `job`: a `progress` event on every change and
+        a final `done` (or `error`) event with the full job state, then stop.
+        Comment lines are sent as heartbeats so proxies keep the connection open.
+
+        The generator blocks its request worker for the job's whole lifetime; only
+        serve it when JOB_EVENTS_ENABLED (async/gevent workers).
+        """
+        if not job.local:
+            yield from self._stream_stored(job, heartbeat)
+            return
+
+        version = -1
+        while True:
+            current = job.wait_for_change(version, timeout=heartbeat)
+            if current == version:
+                yield ": keep-alive\n\n"
+                continue
+            version = current
+            state = job.to_dict()
+            if job.finished:
+                yield f"event: {job.status}\ndata: {json.dumps(state)}\n\n"
+                return
+            yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+
+    def _load(self, job_id: str):
+        try:
+            doc = jobs_col.find_one({"_id": str(job_id)})
+        except PyMongoError as e:
+            print(f"⚠️ Could not read job {job_id}: {e}")
+            return None
+        return Job.from_doc(doc) if doc else None
+
+    def _stream_stored(self, job: Job, heartbeat: float):
+        # Job runs in another worker: re-read it from the store until it finishes
+        version = -1
+        quiet = 0.0
+        while True:
+            if job.version != version:
+                version = job.version
+                quiet = 0.0
+                state = job.to_dict()
+                if job.finished:
+                    yield f"event: {job.status}\ndata: {json.dumps(state)}\n\n"
+                    return
+                yield f"event: progress\ndata: {json.dumps(state)}\n\n"
+            elif quiet >= heartbeat:
+                quiet = 0.0
+                yield ": keep-alive\n\n"
+            time.sleep(JOB_STORE_POLL_SECONDS)
+            quiet += JOB_STORE_POLL_SECONDS
+            job = self._load(job.id) or job
+
+    def _prune(self):
+        # Drop finished jobs that nobody has asked about for a while
+        cutoff = time.time() - self._ttl
+        with self._lock:
+            stale = [jid for jid, j in self._jobs.items() if j.finished and j.updated_at < cutoff]
+            for jid in stale:
+                del self._jobs[jid]
+
+
+# Shared runner used by all routes in this process
+job_runner = JobRunner()
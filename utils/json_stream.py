@@ -0,0 +1,86 @@
+### Incremental extraction of array elements from a JSON document that is still arriving.
+## Used for streamed LLM completions: the model writes {"outfit": [{...}, {...}], "explanation": ...}
+## token by token, and we want each outfit entry as soon as its closing brace arrives
+## instead of waiting for the whole document to parse.
+
+import json
+
+
+class JsonArrayStream:
+    """
+    Feed text chunks with feed(); get back the elements of the top-level array `key`
+    that were completed by that chunk (parsed with json.loads).
+
+    Elements must be objects or arrays (outfit entries are objects). Bracket depth and
+    string/escape state are tracked across chunks, so partial tokens never break it.
+    Anything before the first '{' (e.g. a ```json fence) is ignored, and elements that
+    fail to parse are skipped.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = None
+        self._last_string = None
+        self._last_key = None
+        self._arr_depth = None  # depth inside the target array while it is open
+        self._arr_done = False
+        self._elem_start = None
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk or ""
+        out = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        self._last_string = text[self._str_start + 1:i]
+                continue
+
+            if c == '"':
+                self._in_str = True
+                self._str_start = i
+            elif c in "{[":
+                if self._arr_depth is not None and self._depth == self._arr_depth:
+                    self._elem_start = i
+                if c == "[" and self._depth == 1 and self._last_key == self.key and not self._arr_done:
+                    self._arr_depth = self._depth + 1
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._arr_depth is not None:
+                    if self._depth == self._arr_depth and self._elem_start is not None:
+                        out.extend(self._emit(text[self._elem_start:i + 1]))
+                        self._elem_start = None
+                    elif self._depth < self._arr_depth:
+                        # The target array just closed
+                        self._arr_depth = None
+                        self._arr_done = True
+            elif c == ":" and self._depth == 1:
+                self._last_key = self._last_string
+            elif c == "," and self._depth == 1:
+                self._last_key = None
+
+        self._pos = len(text)
+        return out
+
+    def _emit(self, raw: str) -> list:
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return []
+        self.emitted += 1
+        return [value]
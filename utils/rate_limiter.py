@@ -0,0 +1,258 @@
+### Token-bucket rate limiter for Groq calls, shared by all worker processes.
+## Groq reports its remaining request/token budget in `x-ratelimit-*` response
+## headers (and `Retry-After` on 429). We store that budget in a small JSON file
+## guarded by an OS file lock, so every gunicorn worker on the machine sees the
+## same numbers. Callers reserve a slot before calling Groq: they either wait
+## (queue) for a bounded time or fail fast with an accurate wait estimate.
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+# Where the shared budget lives; all workers on one machine must use the same path
+GROQ_RATE_STATE_FILE = os.getenv(
+    "GROQ_RATE_STATE_FILE",
+    os.path.join(tempfile.gettempdir(), "styleforecast_groq_ratelimit.json"),
+)
+# How long a request thread may queue for a slot before failing fast (seconds)
+GROQ_RATE_MAX_WAIT = float(os.getenv("GROQ_RATE_MAX_WAIT", "6"))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no slot is free within the allowed wait; `retry_after` is the estimate."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+_DURATION_RE = re.compile(r"([0-9]*\.?[0-9]+)(ms|h|m|s)")
+
+
+def parse_duration(value) -> float:
+    """
+    Parse Groq reset durations such as '7.66s', '2m59.56s', '1h2m' or '120ms' into seconds.
+    Plain numbers are treated as seconds. Returns None when unparseable.
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(text)
+    if not parts:
+        return None
+    factors = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(n) * factors[unit] for n, unit in parts)
+
+
+def _to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class SharedRateLimiter:
+    """
+    Request + token budgets stored in a lock-protected JSON file.
+
+    Each budget is a token bucket: after an observation we know `remaining`,
+    `limit` and when it will be full again (`reset_at`), so it refills linearly
+    from `remaining` to `limit` until then. Unknown budgets never block.
+    """
+
+    BUDGETS = ("requests", "tokens")
+
+    def __init__(self, path: str = GROQ_RATE_STATE_FILE):
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    # ---------------- file-backed state ----------------
+
+    @contextmanager
+    def _locked_state(self):
+        """Yield the shared state dict under an exclusive lock and write it back."""
+        with self._thread_lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                elif msvcrt is not None:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+                os.lseek(fd, 0, os.SEEK_SET)
+                raw = b""
+                while True:
+                    chunk = os.read(fd, 65536)
+                    if not chunk:
+                        break
+                    raw += chunk
+                try:
+                    state = json.loads(raw.decode("utf-8")) if raw else {}
+                except ValueError:
+                    state = {}
+
+                yield state
+
+                data = json.dumps(state).encode("utf-8")
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, data)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                os.close(fd)
+
+    # ---------------- bucket math ----------------
+
+    @staticmethod
+    def _available(budget: dict, now: float):
+        """Current estimate of the budget, or None if unknown (= unlimited)."""
+        if not budget or budget.get("remaining") is None:
+            return None
+        limit = budget.get("limit")
+        remaining = budget["remaining"]
+        reset_at = budget.get("reset_at") or now
+        if now >= reset_at:
+            return limit if limit is not None else None
+        if limit is None:
+            return remaining
+        observed_at = budget.get("observed_at") or now
+        span = max(reset_at - observed_at, 1e-6)
+        rate = max(limit - remaining, 0) / span
+        return min(limit, remaining + rate * (now - observed_at))
+
+    @classmethod
+    def _wait_for(cls, budget: dict, cost: float, now: float) -> float:
+        """Seconds until `cost` units are available in `budget` (0 if now)."""
+        available = cls._available(budget, now)
+        if available is None or available >= cost:
+            return 0.0
+        limit = budget.get("limit")
+        reset_at = budget.get("reset_at") or now
+        if limit is None or limit < cost:
+            # Can't refill beyond the limit; the best guess is the full reset
+            return max(0.0, reset_at - now)
+        observed_at = budget.get("observed_at") or now
+        span = max(reset_at - observed_at, 1e-6)
+        rate = max(limit - budget["remaining"], 0) / span
+        if rate <= 0:
+            return max(0.0, reset_at - now)
+        return max(0.0, min(reset_at - now, (cost - available) / rate))
+
+    # ---------------- public API ----------------
+
+    def try_acquire(self, tokens: float = 0) -> float:
+        """
+        Reserve one request and `tokens` tokens if available right now.
+        Returns 0.0 on success, otherwise the estimated seconds to wait (nothing reserved).
+        """
+        now = time.time()
+        with self._locked_state() as state:
+            wait = max(0.0, float(state.get("blocked_until", 0)) - now)
+            wait = max(wait, self._wait_for(state.get("requests"), 1, now))
+            wait = max(wait, self._wait_for(state.get("tokens"), tokens, now))
+            if wait > 0:
+                return wait
+
+            # Consume from each known budget (rebased to "now" so refill keeps working)
+            for name, cost in (("requests", 1), ("tokens", tokens)):
+                budget = state.get(name)
+                available = self._available(budget, now)
+                if available is None:
+                    continue
+                budget["remaining"] = max(0.0, available - cost)
+                budget["observed_at"] = now
+                if now >= (budget.get("reset_at") or now):
+                    budget["reset_at"] = now + float(budget.get("window") or 60.0)
+            return 0.0
+
+    def acquire(self, tokens: float = 0, max_wait: float = GROQ_RATE_MAX_WAIT):
+        """
+        Queue for a slot for up to `max_wait` seconds.
+
+        Raises RateLimitExceeded (with the wait estimate) if no slot frees up in time.
+        """
+        deadline = time.time() + max(0.0, max_wait)
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            if time.time() + wait > deadline:
+                raise RateLimitExceeded(wait)
+            time.sleep(wait + 0.05)
+
+    def observe(self, headers, status_code: int = None):
+        """Update the shared budget from a Groq response's rate-limit headers."""
+        if headers is None:
+            return
+        now = time.time()
+
+        def h(name):
+            try:
+                return headers.get(name)
+            except Exception:
+                return None
+
+        with self._locked_state() as state:
+            for name in self.BUDGETS:
+                remaining = _to_number(h(f"x-ratelimit-remaining-{name}"))
+                if remaining is None:
+                    continue
+                limit = _to_number(h(f"x-ratelimit-limit-{name}"))
+                reset_in = parse_duration(h(f"x-ratelimit-reset-{name}")) or 0.0
+                budget = state.get(name) or {}
+                budget.update({
+                    "limit": limit if limit is not None else budget.get("limit"),
+                    "remaining": remaining,
+                    "observed_at": now,
+                    "reset_at": now + reset_in,
+                })
+                if reset_in > 0:
+                    budget["window"] = max(float(budget.get("window") or 0.0), reset_in)
+                state[name] = budget
+
+            if status_code == 429:
+                retry_after = parse_duration(h("Retry-After"))
+                if retry_after is not None:
+                    state["blocked_until"] = max(float(state.get("blocked_until", 0)), now + retry_after)
+
+    def block_for(self, seconds: float):
+        """Block every worker for `seconds` (e.g. when the wait is only known from an error body)."""
+        now = time.time()
+        with self._locked_state() as state:
+            state["blocked_until"] = max(float(state.get("blocked_until", 0)), now + max(0.0, seconds))
+
+    def snapshot(self) -> dict:
+        """Current budget estimates (for diagnostics)."""
+        now = time.time()
+        with self._locked_state() as state:
+            return {
+                "requests_available": self._available(state.get("requests"), now),
+                "tokens_available": self._available(state.get("tokens"), now),
+                "blocked_for": max(0.0, float(state.get("blocked_until", 0)) - now),
+            }
+
+
+# Shared limiter for all Groq calls in this process (and, via the file, the machine)
+groq_rate_limiter = SharedRateLimiter()
@@ -0,0 +1,76 @@
+### Single-flight request coalescing.
+## When several threads ask for the same thing at the same time (double clicks,
+## slider regenerations, client retries), only the first one ("leader") does the
+## work; the others wait for it and get a copy of the same result.
+## Nothing is cached: once the leader finishes, the next call runs again.
+
+import copy
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    do(key, fn, *args, **kwargs) runs fn once per key while a call is in flight.
+
+    Followers receive their own deep copy of the leader's result (so every caller
+    can mutate its dict freely) or re-raise the leader's exception.
+    """
+
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+                self._stats["executions"] += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        except Exception as e:
+            call.exception = e
+            raise
+        finally:
+            # Remove before waking followers so a new request after this point starts fresh
+            with self._lock:
+                self._calls.pop(key, None)
+                waiters = call.waiters
+            # Followers copy from a private snapshot; the leader's caller owns `result`
+            if waiters and call.exception is None:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Total calls, upstream executions, coalesced calls and the coalesced share."""
+        with self._lock:
+            s = dict(self._stats)
+            s["in_flight"] = len(self._calls)
+        s["coalesced_rate"] = round(s["coalesced"] / s["calls"], 3) if s["calls"] else 0.0
+        return s
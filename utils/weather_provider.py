@@ -0,0 +1,337 @@
+### Weather and geocoding providers.
+## Models ask get_weather_provider() for data instead of calling OpenWeather URLs directly,
+## so the backend can be swapped without touching the caching/parsing code:
+##
+##   WEATHER_PROVIDER=openweather  (default) real OpenWeather API through the pooled http_client
+##   WEATHER_PROVIDER=local        deterministic offline provider: replays recorded responses
+##                                 from WEATHER_FIXTURE_DIR and synthesizes everything else,
+##                                 with optional artificial latency (for load tests/benchmarks)
+##
+## Every provider returns OpenWeather-shaped JSON (same keys as the real API), and raises on
+## transport failures just like http_client does, so callers keep their existing error handling.
+##
+## Recording: with WEATHER_RECORD=1 the OpenWeather provider also writes each response into
+## WEATHER_FIXTURE_DIR, which the local provider can replay later without network access.
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.geo_index import GEO_PLACES_TSV, _read_places, get_place_index, normalize
+from utils.http_client import http_client
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER", "openweather").lower()
+WEATHER_FIXTURE_DIR = os.getenv("WEATHER_FIXTURE_DIR", os.path.join(_DATA_DIR, "fixtures"))
+WEATHER_RECORD = os.getenv("WEATHER_RECORD", "0").lower() in ("1", "true", "yes")
+# Simulated upstream latency for the local provider: base + uniform(0, jitter) milliseconds
+LOCAL_PROVIDER_LATENCY_MS = float(os.getenv("LOCAL_PROVIDER_LATENCY_MS", "0"))
+LOCAL_PROVIDER_JITTER_MS = float(os.getenv("LOCAL_PROVIDER_JITTER_MS", "0"))
+
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+
+# Reverse lookups farther than this from any known place answer "nothing here"
+_REVERSE_MAX_KM = 100.0
+
+
+def _fixture_key(kind: str, *, lat=None, lon=None, query=None) -> str:
+    """File name (without extension) a response is recorded under."""
+    if query is not None:
+        return normalize(query).replace(" ", "_") or "_"
+    return f"{float(lat):.2f}_{float(lon):.2f}"
+
+
+class WeatherProvider:
+    """Interface: every method returns the JSON the matching OpenWeather endpoint would."""
+
+    name = "base"
+
+    def current(self, lat, lon) -> dict:
+        """/data/2.5/weather (metric units)."""
+        raise NotImplementedError
+
+    def forecast(self, lat, lon) -> dict:
+        """/data/2.5/forecast, 5 days in 3-hour slots (metric units)."""
+        raise NotImplementedError
+
+    def geocode(self, query: str, limit: int = 5) -> list:
+        """/geo/1.0/direct."""
+        raise NotImplementedError
+
+    def reverse_geocode(self, lat, lon, limit: int = 1) -> list:
+        """/geo/1.0/reverse."""
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------
+# OPENWEATHER
+# ---------------------------------------------------------
+class OpenWeatherProvider(WeatherProvider):
+    name = "openweather"
+
+    def __init__(self, api_key: str = None, record_dir: str = None):
+        self.api_key = api_key if api_key is not None else OPENWEATHER_API_KEY
+        self.record_dir = record_dir
+
+    def _get(self, url, params):
+        params = dict(params, appid=self.api_key)
+        return http_client.get(url, params=params).json()
+
+    def _record(self, kind, key, data):
+        if not self.record_dir:
+            return
+        try:
+            folder = os.path.join(self.record_dir, kind)
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, key + ".json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"⚠️ Could not record {kind} fixture {key}: {e}")
+
+    def current(self, lat, lon):
+        data = self._get("https://api.openweathermap.org/data/2.5/weather",
+                         {"lat": lat, "lon": lon, "units": "metric"})
+        self._record("current", _fixture_key("current", lat=lat, lon=lon), data)
+        return data
+
+    def forecast(self, lat, lon):
+        data = self._get("https://api.openweathermap.org/data/2.5/forecast",
+                         {"lat": lat, "lon": lon, "units": "metric"})
+        self._record("forecast", _fixture_key("forecast", lat=lat, lon=lon), data)
+        return data
+
+    def geocode(self, query, limit=5):
+        data = self._get("http://api.openweathermap.org/geo/1.0/direct", {"q": query, "limit": limit})
+        self._record("geocode", _fixture_key("geocode", query=query), data)
+        return data
+
+    def reverse_geocode(self, lat, lon, limit=1):
+        data = self._get("http://api.openweathermap.org/geo/1.0/reverse",
+                         {"lat": lat, "lon": lon, "limit": limit})
+        self._record("reverse", _fixture_key("reverse", lat=lat, lon=lon), data)
+        return data
+
+
+# ---------------------------------------------------------
+# LOCAL (fixtures + synthetic)
+# ---------------------------------------------------------
+_CONDITIONS = [
+    # (main, description, relative frequency)
+    ("Clear", "clear sky", 4),
+    ("Clouds", "scattered clouds", 3),
+    ("Clouds", "overcast clouds", 2),
+    ("Rain", "light rain", 2),
+    ("Drizzle", "light intensity drizzle", 1),
+    ("Rain", "moderate rain", 1),
+    ("Thunderstorm", "thunderstorm", 0.3),
+    ("Mist", "mist", 0.5),
+]
+
+
+class LocalProvider(WeatherProvider):
+    """
+    Offline provider. Recorded responses in `fixture_dir/<kind>/<key>.json` win; anything
+    else is synthesized from the coordinates (same input -> same output), so benchmarks
+    are reproducible and never touch the network.
+    """
+
+    name = "local"
+
+    def __init__(self, fixture_dir: str = WEATHER_FIXTURE_DIR,
+                 latency_ms: float = LOCAL_PROVIDER_LATENCY_MS, jitter_ms: float = LOCAL_PROVIDER_JITTER_MS):
+        self.fixture_dir = fixture_dir
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._places = None
+        self._places_lock = threading.Lock()
+
+    def _sleep(self):
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+    def _fixture(self, kind, key):
+        if not self.fixture_dir:
+            return None
+        path = os.path.join(self.fixture_dir, kind, key + ".json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # --- synthetic weather ---------------------------------------------------------
+    @staticmethod
+    def _rng(lat, lon, *extra):
+        # random.Random seeds strings via SHA-512, so this is stable across processes
+        return random.Random("|".join([f"{float(lat):.2f}", f"{float(lon):.2f}", *map(str, extra)]))
+
+    @staticmethod
+    def _tz_offset(lon) -> int:
+        return int(round(float(lon) / 15.0)) * 3600
+
+    def _day_condition(self, lat, lon, date_str):
+        rng = self._rng(lat, lon, date_str, "condition")
+        main, desc, _ = rng.choices(_CONDITIONS, weights=[c[2] for c in _CONDITIONS])[0]
+        return main, desc
+
+    def _temp_at(self, lat, lon, ts):
+        """Plausible temperature: latitude baseline + season + time of day + daily noise."""
+        lat = float(lat)
+        local = datetime.fromtimestamp(ts + self._tz_offset(lon), timezone.utc)
+        baseline = 30.0 - 0.4 * abs(lat)
+        # Peak of summer mid-July in the north, mid-January in the south
+        season = math.cos(2 * math.pi * (local.timetuple().tm_yday - 196) / 365.0)
+        if lat < 0:
+            season = -season
+        seasonal = season * 12.0 * min(abs(lat), 60.0) / 60.0
+        diurnal = 4.0 * math.cos(2 * math.pi * (local.hour - 15) / 24.0)
+        noise = self._rng(lat, lon, local.strftime("%Y-%m-%d"), "temp").uniform(-3.0, 3.0)
+        return round(baseline + seasonal + diurnal + noise, 2)
+
+    def _slot(self, lat, lon, ts):
+        local_date = datetime.fromtimestamp(ts + self._tz_offset(lon), timezone.utc).strftime("%Y-%m-%d")
+        main, desc = self._day_condition(lat, lon, local_date)
+        rng = self._rng(lat, lon, ts, "slot")
+        temp = self._temp_at(lat, lon, ts)
+        slot = {
+            "dt": ts,
+            "main": {"temp": temp, "feels_like": temp, "humidity": rng.randint(40, 95)},
+            "weather": [{"main": main, "description": desc}],
+            "wind": {"speed": round(rng.uniform(0.5, 9.0), 1)},
+            "pop": round(rng.uniform(0.4, 1.0), 2) if main in ("Rain", "Drizzle", "Thunderstorm") else 0.0,
+            "dt_txt": datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        if main in ("Rain", "Drizzle", "Thunderstorm"):
+            slot["rain"] = {"3h": round(rng.uniform(0.1, 4.0), 2)}
+        return slot
+
+    def current(self, lat, lon):
+        self._sleep()
+        recorded = self._fixture("current", _fixture_key("current", lat=lat, lon=lon))
+        if recorded is not None:
+            return recorded
+
+        slot = self._slot(lat, lon, int(time.time()))
+        return {
+            "cod": 200,
+            "coord": {"lat": float(lat), "lon": float(lon)},
+            "weather": slot["weather"],
+            "main": slot["main"],
+            "wind": slot["wind"],
+            "timezone": self._tz_offset(lon),
+        }
+
+    def forecast(self, lat, lon):
+        self._sleep()
+        window = 3 * 3600
+        now = int(time.time())
+        recorded = self._fixture("forecast", _fixture_key("forecast", lat=lat, lon=lon))
+        if recorded is not None and recorded.get("list"):
+            return self._replay_forecast(recorded, now)
+
+        first = (now // window + 1) * window
+        return {
+            "cod": "200",
+            "cnt": 40,
+            "list": [self._slot(lat, lon, first + i * window) for i in range(40)],
+            "city": {"coord": {"lat": float(lat), "lon": float(lon)}, "timezone": self._tz_offset(lon)},
+        }
+
+    @staticmethod
+    def _replay_forecast(recorded, now):
+        """Shift a recorded forecast by whole days so it starts within the last day (dates stay useful)."""
+        data = json.loads(json.dumps(recorded))
+        first_dt = int(data["list"][0].get("dt") or now)
+        shift = max(0, (now - first_dt) // 86400) * 86400
+        for slot in data["list"]:
+            slot["dt"] = int(slot.get("dt") or 0) + shift
+            slot["dt_txt"] = datetime.fromtimestamp(slot["dt"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        return data
+
+    # --- synthetic geocoding (bundled place dataset) -------------------------------
+    def geocode(self, query, limit=5):
+        self._sleep()
+        recorded = self._fixture("geocode", _fixture_key("geocode", query=query))
+        if recorded is not None:
+            return recorded[:limit]
+
+        index = get_place_index()
+        results = []
+        for place in (index.search(query, limit=limit) if index else []):
+            parts = [p.strip() for p in place["label"].split(",")]
+            loc = {"name": parts[0], "lat": place["lat"], "lon": place["lon"], "country": parts[-1]}
+            if len(parts) > 2:
+                loc["state"] = parts[1]
+            results.append(loc)
+        return results
+
+    def _load_places(self):
+        if self._places is None:
+            with self._places_lock:
+                if self._places is None:
+                    try:
+                        self._places = [
+                            (name, admin1, country, lat, lon)
+                            for name, _, admin1, country, lat, lon, _ in _read_places(GEO_PLACES_TSV)
+                        ]
+                    except OSError:
+                        self._places = []
+        return self._places
+
+    def reverse_geocode(self, lat, lon, limit=1):
+        self._sleep()
+        recorded = self._fixture("reverse", _fixture_key("reverse", lat=lat, lon=lon))
+        if recorded is not None:
+            return recorded[:limit]
+
+        lat, lon = float(lat), float(lon)
+
+        def km(p):
+            # Equirectangular approximation; plenty for "which city is closest"
+            x = math.radians(p[4] - lon) * math.cos(math.radians((p[3] + lat) / 2))
+            y = math.radians(p[3] - lat)
+            return 6371.0 * math.hypot(x, y)
+
+        ranked = sorted(self._load_places(), key=km)[:limit]
+        out = []
+        for p in ranked:
+            if km(p) > _REVERSE_MAX_KM:
+                break
+            loc = {"name": p[0], "lat": p[3], "lon": p[4], "country": p[2]}
+            if p[1]:
+                loc["state"] = p[1]
+            out.append(loc)
+        return out
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_weather_provider() -> WeatherProvider:
+    """Process-wide provider selected by WEATHER_PROVIDER (built on first use)."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if WEATHER_PROVIDER == "local":
+                    _provider = LocalProvider()
+                else:
+                    if WEATHER_PROVIDER != "openweather":
+                        print(f"⚠️ Unknown WEATHER_PROVIDER '{WEATHER_PROVIDER}', using openweather")
+                    _provider = OpenWeatherProvider(record_dir=WEATHER_FIXTURE_DIR if WEATHER_RECORD else None)
+                print(f"🌦️ Weather provider: {_provider.name}")
+    return _provider
+
+
+def set_weather_provider(provider: WeatherProvider):
+    """Swap the provider at runtime (benchmark scripts, load-test harnesses)."""
+    global _provider
+    with _provider_lock:
+        _provider = provider